@@ -0,0 +1,89 @@
+import threading
+from typing import Dict, List, Tuple
+from .models.gamification import Achievement, AchievementType, UserProgress, ACHIEVEMENTS
+
+# UserProgress.stats keys holding the running aggregate each achievement type is measured against
+AGGREGATES = {
+    AchievementType.EARNINGS: "earnings",
+    AchievementType.TASKS: "tasks_completed",
+    AchievementType.MARKETPLACE: "listings",
+    AchievementType.INNOVATION: "tools_created",
+}
+
+
+class AchievementTracker:
+    """Awards achievements from per-user running aggregates
+
+    Achievements are grouped by type and sorted by threshold. Each user keeps a
+    cursor per type at the first threshold not yet reached, so an event only
+    compares against the next unmet threshold instead of every achievement.
+    """
+
+    def __init__(self, achievements: Dict[str, Achievement] = ACHIEVEMENTS):
+        self._ladders: Dict[AchievementType, List[Achievement]] = {}
+        for achievement in sorted(achievements.values(), key=lambda a: a.threshold):
+            self._ladders.setdefault(achievement.type, []).append(achievement)
+        self._cursors: Dict[Tuple[str, AchievementType], int] = {}
+        self._lock = threading.Lock()
+
+    def record_task(self, progress: UserProgress) -> List[Achievement]:
+        return self._increment(progress, AchievementType.TASKS, 1)
+
+    def record_sale(self, progress: UserProgress, amount: float) -> List[Achievement]:
+        return self._increment(progress, AchievementType.EARNINGS, amount)
+
+    def record_listing(self, progress: UserProgress) -> List[Achievement]:
+        return self._increment(progress, AchievementType.MARKETPLACE, 1)
+
+    def record_tool(self, progress: UserProgress) -> List[Achievement]:
+        return self._increment(progress, AchievementType.INNOVATION, 1)
+
+    def record_rating(self, progress: UserProgress, rating: float) -> List[Achievement]:
+        """Fold one rating into the user's average rating"""
+        with self._lock:
+            stats = progress.stats
+            stats["rating_sum"] = stats.get("rating_sum", 0.0) + rating
+            stats["rating_count"] = stats.get("rating_count", 0) + 1
+            return self._advance(progress, AchievementType.RATING, self._average_rating(stats))
+
+    def evaluate(self, progress: UserProgress) -> List[Achievement]:
+        """Re-check every type against the current aggregates, e.g. after loading stats"""
+        awarded = []
+        with self._lock:
+            for achievement_type in self._ladders:
+                awarded.extend(self._advance(progress, achievement_type, self._value(progress, achievement_type)))
+        return awarded
+
+    def _increment(self, progress: UserProgress, achievement_type: AchievementType, amount: float) -> List[Achievement]:
+        key = AGGREGATES[achievement_type]
+        with self._lock:
+            progress.stats[key] = progress.stats.get(key, 0) + amount
+            return self._advance(progress, achievement_type, progress.stats[key])
+
+    def _advance(self, progress: UserProgress, achievement_type: AchievementType, value: float) -> List[Achievement]:
+        ladder = self._ladders.get(achievement_type, [])
+        cursor_key = (progress.user_id, achievement_type)
+        cursor = self._cursors.get(cursor_key, 0)
+        awarded = []
+        while cursor < len(ladder) and value >= ladder[cursor].threshold:
+            achievement = ladder[cursor]
+            if achievement.id not in progress.achievements:
+                progress.achievements.add(achievement.id)
+                progress.badges.append(achievement.badge)
+                progress.total_points += achievement.points
+                awarded.append(achievement)
+            cursor += 1
+        self._cursors[cursor_key] = cursor
+        if awarded:
+            progress.level = 1 + (progress.total_points // 1000)
+        return awarded
+
+    def _value(self, progress: UserProgress, achievement_type: AchievementType) -> float:
+        if achievement_type == AchievementType.RATING:
+            return self._average_rating(progress.stats)
+        return progress.stats.get(AGGREGATES[achievement_type], 0)
+
+    @staticmethod
+    def _average_rating(stats: Dict[str, float]) -> float:
+        count = stats.get("rating_count", 0)
+        return stats.get("rating_sum", 0.0) / count if count else 0.0
@@ -0,0 +1,264 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from .scheduler import DEFAULT_PRIORITY, FairScheduler, percentile
+
+logger = logging.getLogger(__name__)
+
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "2"))  # runs of one agent at once; 0 disables
+OWNER_MAX_CONCURRENCY = int(os.getenv("OWNER_MAX_CONCURRENCY", "4"))  # runs across one owner's agents; 0 disables
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "16"))  # waiting runs per agent before 429
+OWNER_QUEUE_SIZE = int(os.getenv("OWNER_QUEUE_SIZE", "32"))  # waiting runs per owner before 429
+RETRY_AFTER_MAX = int(os.getenv("ADMISSION_RETRY_AFTER_MAX", "60"))  # seconds
+# Recent queue waits kept for percentiles
+_WAIT_SAMPLES = 1000
+
+
+class AdmissionError(RuntimeError):
+    """Raised when a run is shed instead of queued
+
+    status_code is the HTTP status to answer with and retry_after the number
+    of seconds the client should wait before trying again.
+    """
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class EngineBusyError(AdmissionError):
+    """Raised when the engine has no room for another pending run"""
+
+
+class RateLimitedError(AdmissionError):
+    """Raised when one agent or owner already has a full wait queue"""
+    status_code = 429
+
+
+@dataclass
+class Ticket:
+    """
+    A run holding or waiting for a concurrency slot
+
+    Attributes:
+        key: Run id the ticket belongs to
+        agent_id: Agent the run executes
+        owner_id: Owner of that agent, if known
+        enqueued_at: Monotonic time the run was admitted
+        user_id: User who submitted the run, for fair sharing
+        priority: Scheduling class, see scheduler.PRIORITY_CLASSES
+        start_tag: Virtual start time assigned by the scheduler
+        granted_at: Monotonic time it got its slot, None while waiting
+    """
+    key: str
+    agent_id: str
+    owner_id: Optional[str]
+    enqueued_at: float
+    user_id: Optional[str] = None
+    priority: str = DEFAULT_PRIORITY
+    start_tag: float = 0.0
+    granted_at: Optional[float] = None
+
+
+class AdmissionController:
+    """Per-agent and per-owner concurrency limits with bounded wait queues
+
+    A run gets a slot when its agent, its owner and the engine as a whole are
+    all under their limits; otherwise it waits, and freed slots go to the
+    waiting run the fair-share scheduler picks among those that fit. Runs for an
+    agent or owner whose queue is full are rejected with RateLimitedError
+    (429), and once max_pending runs are queued or running everything is
+    rejected with EngineBusyError (503), so one hot agent cannot hold every
+    worker or grow the backlog without bound.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int,
+        max_pending: int,
+        agent_limit: int = AGENT_MAX_CONCURRENCY,
+        owner_limit: int = OWNER_MAX_CONCURRENCY,
+        agent_queue_size: int = AGENT_QUEUE_SIZE,
+        owner_queue_size: int = OWNER_QUEUE_SIZE,
+        retry_after_max: int = RETRY_AFTER_MAX,
+        scheduler: Optional[FairScheduler] = None
+    ):
+        self.max_inflight = max_inflight
+        self.max_pending = max_pending
+        self.agent_limit = agent_limit
+        self.owner_limit = owner_limit
+        self.agent_queue_size = agent_queue_size
+        self.owner_queue_size = owner_queue_size
+        self.retry_after_max = retry_after_max
+        self.scheduler = scheduler or FairScheduler()
+        self._active: Dict[str, Ticket] = {}
+        self._waiting: "OrderedDict[str, Ticket]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._queued: Dict[str, int] = {}
+        self._waits: "deque[float]" = deque(maxlen=_WAIT_SAMPLES)
+        self._service_time: Optional[float] = None
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    def admit(self, key: str, agent_id: str, owner_id: Optional[str] = None,
+              user_id: Optional[str] = None, priority: str = DEFAULT_PRIORITY) -> bool:
+        """Take a slot for a run, or queue it
+
+        Returns True if the run may start now and False if it was queued; a
+        queued run is handed back by a later release(). Raises an
+        AdmissionError if the run is shed.
+        """
+        ticket = Ticket(key, agent_id, owner_id, time.monotonic(), user_id=user_id, priority=priority)
+        with self._lock:
+            if len(self._active) + len(self._waiting) >= self.max_pending:
+                self.overloaded += 1
+                raise EngineBusyError("Too many pending agent runs", self._retry_after(len(self._waiting), self.max_inflight))
+            if self._fits(ticket):
+                self.scheduler.enqueue(ticket)
+                self._grant(ticket)
+                self.admitted += 1
+                return True
+            if self.agent_queue_size and self._queued.get(_agent_key(agent_id), 0) >= self.agent_queue_size:
+                self.rate_limited += 1
+                raise RateLimitedError(
+                    f"Too many queued runs for agent {agent_id}",
+                    self._retry_after(self._queued[_agent_key(agent_id)], self.agent_limit)
+                )
+            if owner_id is not None and self.owner_queue_size \
+                    and self._queued.get(_owner_key(owner_id), 0) >= self.owner_queue_size:
+                self.rate_limited += 1
+                raise RateLimitedError(
+                    "Too many queued runs for this owner's agents",
+                    self._retry_after(self._queued[_owner_key(owner_id)], self.owner_limit)
+                )
+            self.scheduler.enqueue(ticket)
+            self._waiting[key] = ticket
+            for name in _keys(ticket):
+                self._queued[name] = self._queued.get(name, 0) + 1
+            self.admitted += 1
+            return False
+
+    def release(self, key: str) -> List[str]:
+        """Free a finished run's slot and return the queued runs that may start now"""
+        with self._lock:
+            ticket = self._active.pop(key, None)
+            if ticket is None:
+                return []
+            for name in _keys(ticket):
+                self._decrement(self._running, name)
+            held = time.monotonic() - ticket.granted_at
+            # Smoothed run duration, for Retry-After estimates
+            self._service_time = held if self._service_time is None else 0.8 * self._service_time + 0.2 * held
+            return self._drain()
+
+    def discard(self, key: str) -> bool:
+        """Drop a run that is still waiting; False if it already has a slot or is unknown"""
+        with self._lock:
+            ticket = self._waiting.pop(key, None)
+            if ticket is None:
+                return False
+            for name in _keys(ticket):
+                self._decrement(self._queued, name)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of slots, queues and queue-time percentiles"""
+        with self._lock:
+            waits = sorted(self._waits)
+            busiest = sorted(
+                ((name[len("agent:"):], count) for name, count in self._queued.items() if name.startswith("agent:")),
+                key=lambda item: item[1],
+                reverse=True
+            )[:5]
+            return {
+                "inflight": len(self._active),
+                "queued": len(self._waiting),
+                "max_inflight": self.max_inflight,
+                "max_pending": self.max_pending,
+                "agent_limit": self.agent_limit,
+                "owner_limit": self.owner_limit,
+                "admitted": self.admitted,
+                "rate_limited": self.rate_limited,
+                "overloaded": self.overloaded,
+                "busiest_queues": dict(busiest),
+                "queue_wait_ms": {
+                    "samples": len(waits),
+                    "p50": round(percentile(waits, 0.5) * 1000, 1),
+                    "p95": round(percentile(waits, 0.95) * 1000, 1),
+                    "p99": round(percentile(waits, 0.99) * 1000, 1),
+                    "max": round(waits[-1] * 1000, 1) if waits else 0.0
+                },
+                "scheduler": self.scheduler.stats()
+            }
+
+    def _fits(self, ticket: Ticket) -> bool:
+        if self.max_inflight and len(self._active) >= self.max_inflight:
+            return False
+        if self.agent_limit and self._running.get(_agent_key(ticket.agent_id), 0) >= self.agent_limit:
+            return False
+        if ticket.owner_id is not None and self.owner_limit \
+                and self._running.get(_owner_key(ticket.owner_id), 0) >= self.owner_limit:
+            return False
+        return True
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted_at = time.monotonic()
+        self._active[ticket.key] = ticket
+        for name in _keys(ticket):
+            self._running[name] = self._running.get(name, 0) + 1
+        self._waits.append(ticket.granted_at - ticket.enqueued_at)
+        self.scheduler.started(ticket, ticket.granted_at)
+
+    def _drain(self) -> List[str]:
+        """Grant free slots to waiting runs in the scheduler's order, skipping any still over a limit"""
+        started = []
+        while self._waiting and not (self.max_inflight and len(self._active) >= self.max_inflight):
+            ticket = self.scheduler.pick(
+                (ticket for ticket in self._waiting.values() if self._fits(ticket)),
+                time.monotonic()
+            )
+            if ticket is None:
+                break
+            del self._waiting[ticket.key]
+            for name in _keys(ticket):
+                self._decrement(self._queued, name)
+            self._grant(ticket)
+            started.append(ticket.key)
+        return started
+
+    def _retry_after(self, queued: int, slots: int) -> int:
+        """Seconds until a slot is likely free, from queue depth and recent run times"""
+        service_time = self._service_time or 1.0
+        estimate = math.ceil(service_time * (queued + 1) / max(slots, 1))
+        return max(1, min(estimate, self.retry_after_max))
+
+    @staticmethod
+    def _decrement(counts: Dict[str, int], name: str) -> None:
+        remaining = counts.get(name, 0) - 1
+        if remaining > 0:
+            counts[name] = remaining
+        else:
+            counts.pop(name, None)
+
+
+def _agent_key(agent_id: str) -> str:
+    return f"agent:{agent_id}"
+
+
+def _owner_key(owner_id: str) -> str:
+    return f"owner:{owner_id}"
+
+
+def _keys(ticket: Ticket) -> List[str]:
+    keys = [_agent_key(ticket.agent_id)]
+    if ticket.owner_id is not None:
+        keys.append(_owner_key(ticket.owner_id))
+    return keys
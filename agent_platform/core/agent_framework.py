@@ -1,34 +1,76 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from smolagents import CodeAgent, HfApiModel, DuckDuckGoSearchTool
-from .models.agent import Agent, AgentConfig, AgentState, AgentStats
+from .models.agent import Agent, AgentConfig, AgentState, AgentStats, DBAgent
 from .tools.duckduckgo import DuckDuckGoTool
 from .tools.voice_tools import TextToSpeechTool, SpeechToTextTool
 from .models.marketplace import MarketplaceListing as Listing, Rental, Transaction, ListingType, PricingModel
-from .models.gamification import Achievement, Badge, LeaderboardEntry, UserProgress, ACHIEVEMENTS, AchievementType
+from .models.gamification import UserProgress
 from .utils import generate_agent_id, validate_config, log_agent_activity
 from .tools.base import BaseTool
-from .db_operations import DBOperations
-from .models.database import get_db
+from .db_operations import DBOperations, AsyncDBOperations
+from .models.database import session_scope
+from .agent_pool import AgentInstancePool, config_version
+from .execution import DEFAULT_MAX_STEPS, ExecutionEngine, RunCancelledError, RunControl, stream_steps
+from .process_pool import AgentProcessPool
+from .run_queue import RunQueue
+from .leaderboard import LeaderboardRegistry
+from .achievements import AchievementTracker
+from .marketplace_store import MarketplaceStore
+from .search import AgentSearch
+from .response_cache import ResponseCache
+from .stats_buffer import StatsBuffer
+from .entity_cache import EntityCache
+from .status_registry import StatusRegistry
+from .events import EventBus
+import asyncio
 import logging
+import os
+import uuid
 from datetime import datetime
 from contextlib import contextmanager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Agent fields that feed the search index
+SEARCH_FIELDS = {"name", "description", "tools", "is_listed"}
+
+# "thread" runs CodeAgents in the API process, "process" in a pre-forked worker pool
+EXECUTION_BACKEND = os.getenv("AGENT_EXECUTION_BACKEND", "thread")
+# "local" executes runs submitted to the API in its own engine; "queue" stores them
+# in the durable run queue for standalone workers (python -m agent_platform.worker)
+RUN_DISPATCH = os.getenv("RUN_DISPATCH", "local")
+
 class AgentFramework:
     """Core framework for managing agents and marketplace functionality"""
     
     def __init__(self):
         self.available_tools: Dict[str, BaseTool] = {}
-        self.listings: Dict[str, Listing] = {}
-        self.rentals: Dict[str, Rental] = {}
-        self.transactions: List[Transaction] = []
+        self.response_cache = ResponseCache()
+        self.events = EventBus()
+        # Marketplace collections are backed by their tables through a write-behind store
+        self.marketplace = MarketplaceStore(self._session, on_flush=self._on_marketplace_flush)
+        self.listings = self.marketplace.listings
+        self.rentals = self.marketplace.rentals
+        self.transactions = self.marketplace.transactions
+        # Agent rows for read paths; invalidated on every agent write and stats flush
+        self.entities = EntityCache(events=self.events)
+        # Stats counters are written behind the run path as batched increments
+        self.stats_buffer = StatsBuffer(self._session, on_flush=self._on_stats_flush)
+        # Live busy/idle/error state; only error transitions reach the database
+        self.status = StatusRegistry(self._session, self.events)
+        # agent_id -> {rental_id: rental} for rentals still active, oldest first
+        self._active_rentals: Dict[str, Dict[str, Rental]] = {}
         self.user_progress: Dict[str, UserProgress] = {}
-        self.leaderboard: Dict[str, List[LeaderboardEntry]] = {}
-        
-        # Initialize database session
-        self.db = next(get_db())
+        self.achievements = AchievementTracker()
+        self.leaderboard = LeaderboardRegistry()
+        self.search = AgentSearch()
+        self.agent_pool = AgentInstancePool()
+        self.process_pool = AgentProcessPool() if EXECUTION_BACKEND == "process" else None
+        self.engine = ExecutionEngine(self.run_agent)
+        self.run_queue = RunQueue() if RUN_DISPATCH == "queue" else None
         
         # Register default tools
         self.register_tool(DuckDuckGoTool())
@@ -36,6 +78,15 @@ class AgentFramework:
         self.register_tool(SpeechToTextTool())
         # Use our custom DuckDuckGoTool wrapper instead of raw search tool
 
+    @contextmanager
+    def _session(self, db: Optional[Session] = None):
+        """Use the caller's session, or open one scoped to this unit of work"""
+        if db is not None:
+            yield db
+        else:
+            with session_scope() as session:
+                yield session
+
     def register_tool(self, tool: BaseTool):
         """Register a new tool with the framework"""
         if tool.config.name in self.available_tools:
@@ -47,24 +98,44 @@ class AgentFramework:
             "version": tool.config.version
         })
         
-    def create_agent(self, config: Dict[str, Any]) -> Agent:
+    def create_agent(self, config: Dict[str, Any], db: Optional[Session] = None) -> DBAgent:
         """Create a new agent instance"""
+        agent_id, agent_data = self._prepare_agent(config)
+        
+        # Create agent in database
+        with self._session(db) as db:
+            agent = DBOperations.create_agent(db, agent_data)
+        self.entities.invalidate("agent", agent_id)
+        self.search.refresh(agent_id)
+        
+        # Build an instance up front and keep it warm for the first run
+        self.agent_pool.put(agent.id, config_version(agent.config), self._build_instance(agent.config))
+        
+        self._init_user_progress(config["owner_id"])
+        log_agent_activity(agent_id, "agent_created")
+        return agent
+        
+    async def create_agent_async(self, config: Dict[str, Any], db: AsyncSession) -> DBAgent:
+        """Create a new agent without blocking the event loop
+        
+        The CodeAgent instance is built lazily by the pool on the agent's first run.
+        """
+        agent_id, agent_data = self._prepare_agent(config)
+        agent = await AsyncDBOperations.create_agent(db, agent_data)
+        self.entities.invalidate("agent", agent_id)
+        await asyncio.to_thread(self.search.refresh, agent_id)
+        
+        self._init_user_progress(config["owner_id"])
+        log_agent_activity(agent_id, "agent_created")
+        return agent
+        
+    def _prepare_agent(self, config: Dict[str, Any]):
+        """Validate a creation request and build the agent's database record"""
         if not validate_config(config):
             raise ValueError("Invalid agent configuration")
             
         agent_id = generate_agent_id(config["name"])
-        tools = [self.available_tools[tool_name].tool_instance 
-                for tool_name in config.get("tools", [])]
-                
-        # Initialize with smolagents
-        agent_instance = CodeAgent(
-            tools=tools,
-            model=HfApiModel(),
-            additional_authorized_imports=config.get("allowed_imports", [])
-        )
-        
-        # Create agent in database
-        agent = DBOperations.create_agent(self.db, {
+        return agent_id, {
             "id": agent_id,
             "name": config["name"],
             "description": config["description"],
@@ -72,232 +143,312 @@ class AgentFramework:
             "tools": config.get("tools", []),
             "model": config["model"],
             "allowed_imports": config.get("allowed_imports", []),
-            "agent_metadata": config.get("agent_metadata", {})
-        })
-        
-        # Add instance reference
-        agent.instance = agent_instance
-        
-        # Initialize user progress if needed
-        if config["owner_id"] not in self.user_progress:
-            self.user_progress[config["owner_id"]] = UserProgress(
-                user_id=config["owner_id"],
-                achievements=[],
+            "agent_metadata": config.get("agent_metadata", {}),
+            "max_run_seconds": config.get("max_run_seconds"),
+            "max_steps": config.get("max_steps"),
+            "max_tool_calls": config.get("max_tool_calls")
+        }
+        
+    def _init_user_progress(self, user_id: str) -> UserProgress:
+        """Initialize user progress if needed"""
+        if user_id not in self.user_progress:
+            self.user_progress[user_id] = UserProgress(
+                user_id=user_id,
+                achievements=set(),
                 badges=[],
                 total_points=0,
                 level=1,
                 stats={}
             )
-        
-        log_agent_activity(agent_id, "agent_created")
-        return agent
-        
-    def run_agent(self, agent_id: str, task: str) -> str:
-        """Run an agent on a specific task"""
-        agent = self._get_agent(agent_id)
-        
-        # Check rental status if applicable
-        rental = self._get_active_rental(agent_id)
-        if rental:
-            rental.usage_count += 1
-            
-        try:
-            # Update state directly for testing
-            agent.state.status = "busy"
-            self.db.commit()
-            
-            # Run synchronously for testing
-            result = agent.instance.run(task)
-            
-            # Update stats directly
-            agent.stats.tasks_completed += 1
-            self.db.commit()
-            
-            self._check_achievements(agent.owner_id)
-            self._update_leaderboard(agent_id)
-            
-            return result
+        return self.user_progress[user_id]
+        
+    def run_agent(self, agent_id: str, task: str, db: Optional[Session] = None,
+                  control: Optional[RunControl] = None) -> str:
+        """Run an agent on a specific task within its deadline and step budgets"""
+        with self._session(db) as db:
+            agent = self._get_agent(agent_id, db)
+            control = control or RunControl()
+            control.limit(
+                timeout=agent.config.max_run_seconds,
+                max_steps=agent.config.max_steps,
+                max_tool_calls=agent.config.max_tool_calls
+            )
             
-        except Exception as e:
-            agent.state.status = "error"
-            self.db.commit()
-            logger.error(f"Error running agent {agent_id}: {str(e)}")
-            raise
+            # Check rental status if applicable
+            rental = self._get_active_rental(agent_id, db)
+            if rental:
+                rental.usage_count += 1
+                self.rentals.save(rental)
+                
+            self.stats_buffer.record(agent_id, usage_count=1, last_active=datetime.now())
+            self.status.run_started(agent_id, agent.owner_id)
+            try:
+                result = self._execute(agent, task, control)
+                
+                self.stats_buffer.record(agent_id, tasks_completed=1, last_active=datetime.now())
+                
+                self.achievements.record_task(self._init_user_progress(agent.owner_id))
+                self._update_leaderboard(agent_id, db)
+                
+                return result
+                
+            except RunCancelledError:
+                logger.info(f"Run of agent {agent_id} cancelled")
+                raise
+                
+            except Exception as e:
+                self._set_status(agent, "error")
+                logger.error(f"Error running agent {agent_id}: {str(e)}")
+                raise
+                
+            finally:
+                # Idle only once no worker is running the agent
+                self.status.run_finished(agent_id, agent.owner_id)
+
+    def _set_status(self, agent: Agent, status: str) -> None:
+        """Record an agent's state in the registry, which pushes the transition to subscribers"""
+        self.status.set(agent.id, status, agent.owner_id)
+
+    def _execute(self, agent: Agent, task: str, control: RunControl) -> Any:
+        """Run a task on the configured execution backend
+        
+        Threads can only be stopped between steps; the process backend kills
+        the worker as soon as the run is cancelled or passes its deadline.
+        """
+        if self.process_pool is None:
+            # CodeAgents keep per-run memory, so each run needs an instance to itself
+            version = config_version(agent.config)
+            with self.agent_pool.lease(agent.id, version, lambda: self._build_instance(agent.config),
+                                       control) as instance:
+                return stream_steps(instance, task, control.report)
             
-        finally:
-            agent.state.status = "idle"
-            self.db.commit()
+        return self.process_pool.run(
+            agent.id,
+            config_version(agent.config),
+            agent.config.tools,
+            agent.config.allowed_imports,
+            task,
+            control=control,
+            max_steps=agent.config.max_steps or DEFAULT_MAX_STEPS
+        )
 
-    def stop_agent(self, agent_id: str) -> None:
-        """Stop a running agent"""
-        agent = self._get_agent(agent_id)
-        
-        if agent.state.status == "idle":
-            return
+    def stop_agent(self, agent_id: str, db: Optional[Session] = None) -> None:
+        """Stop a running agent, cancelling its runs"""
+        with self._session(db) as db:
+            agent = self._get_agent(agent_id, db)
             
-        try:
-            # Stop any running operations
-            if hasattr(agent.instance, 'stop'):
-                agent.instance.stop()
+            if self.status.get(agent_id).status == "idle":
+                return
                 
-            agent.state.status = "idle"
-            self.db.commit()
-            logger.info(f"Agent {agent_id} stopped successfully")
-            
-        except Exception as e:
-            agent.state.status = "error"
-            self.db.commit()
-            logger.error(f"Error stopping agent {agent_id}: {str(e)}")
-            raise
+            try:
+                cancelled = self.engine.cancel_agent(agent_id, "Agent stopped")
+                if cancelled:
+                    logger.info(f"Cancelled {cancelled} runs of agent {agent_id}")
+                    
+                self._set_status(agent, "idle")
+                logger.info(f"Agent {agent_id} stopped successfully")
+                
+            except Exception as e:
+                self._set_status(agent, "error")
+                logger.error(f"Error stopping agent {agent_id}: {str(e)}")
+                raise
 
-    def delete_agent(self, agent_id: str) -> None:
+    def delete_agent(self, agent_id: str, db: Optional[Session] = None) -> None:
         """Permanently delete an agent"""
-        agent = self._get_agent(agent_id)
-        
-        try:
-            # Stop agent if running
-            if agent.state.status != "idle":
-                self.stop_agent(agent_id)
-                
-            # Remove from database
-            DBOperations.delete_agent(self.db, agent_id)
+        with self._session(db) as db:
+            agent = self._get_agent(agent_id, db)
             
-            # Clean up any related resources
-            if hasattr(agent, 'instance'):
-                del agent.instance
+            try:
+                # Stop agent if running
+                if self.status.get(agent_id).status != "idle":
+                    self.stop_agent(agent_id, db)
+                    
+                # Remove from database
+                DBOperations.delete_agent(db, agent_id)
+                self.entities.invalidate("agent", agent_id)
                 
-            logger.info(f"Agent {agent_id} deleted successfully")
-            
-        except Exception as e:
-            logger.error(f"Error deleting agent {agent_id}: {str(e)}")
-            raise
+                # Clean up any related resources
+                self.agent_pool.invalidate(agent_id)
+                self.status.forget(agent_id)
+                ranks = self.leaderboard.ranks(agent_id)
+                self.leaderboard.remove_agent(agent_id)
+                for category, rank in ranks.items():
+                    if rank is not None:
+                        self.events.publish("leaderboard", {
+                            "category": category,
+                            "agent_id": agent_id,
+                            "score": None,
+                            "rank": None,
+                            "previous_rank": rank
+                        })
+                self.response_cache.invalidate("leaderboard")
+                self.search.remove(agent_id)
+                    
+                logger.info(f"Agent {agent_id} deleted successfully")
+                
+            except Exception as e:
+                logger.error(f"Error deleting agent {agent_id}: {str(e)}")
+                raise
+        
+    def update_agent(self, agent_id: str, update_data: Dict[str, Any], db: Optional[Session] = None) -> DBAgent:
+        """Update an agent and drop its warm instance"""
+        with self._session(db) as db:
+            agent = DBOperations.update_agent(db, agent_id, update_data)
+        self.entities.invalidate("agent", agent_id)
+        self.agent_pool.invalidate(agent_id)
+        if SEARCH_FIELDS & set(update_data):
+            self.search.refresh(agent_id)
+        log_agent_activity(agent_id, "agent_updated", {"fields": sorted(update_data)})
+        return agent
+        
+    async def update_agent_async(self, agent_id: str, update_data: Dict[str, Any], db: AsyncSession) -> DBAgent:
+        """Update an agent without blocking the event loop and drop its warm instance"""
+        agent = await AsyncDBOperations.update_agent(db, agent_id, update_data)
+        self.entities.invalidate("agent", agent_id)
+        self.agent_pool.invalidate(agent_id)
+        if SEARCH_FIELDS & set(update_data):
+            await asyncio.to_thread(self.search.refresh, agent_id)
+        log_agent_activity(agent_id, "agent_updated", {"fields": sorted(update_data)})
+        return agent
         
-    def create_listing(self, agent_id: str, listing_type: ListingType, pricing: PricingModel) -> Listing:
+    def create_listing(self, agent_id: str, listing_type: ListingType, pricing: PricingModel,
+                       db: Optional[Session] = None) -> Listing:
         """Create a new marketplace listing"""
-        agent = self._get_agent(agent_id)
+        agent = self._get_agent(agent_id, db)
         
         listing = Listing(
-            id=f"listing_{len(self.listings)}",
+            id=f"listing_{uuid.uuid4().hex}",
             agent_id=agent_id,
             seller_id=agent.owner_id,
             type=listing_type,
             pricing=pricing
         )
         
-        self.listings[listing.id] = listing
+        self.listings.add(listing)
+        
+        self.response_cache.invalidate("marketplace")
         
         # Award marketplace achievement
-        self._check_achievement(agent.owner_id, "marketplace_pioneer")
+        self.achievements.record_listing(self._init_user_progress(agent.owner_id))
         
         return listing
         
-    def create_rental(self, listing_id: str, renter_id: str) -> Rental:
+    def create_rental(self, listing_id: str, renter_id: str, db: Optional[Session] = None) -> Rental:
         """Create a new rental agreement"""
         listing = self.listings.get(listing_id)
         if not listing or listing.type != ListingType.RENT:
             raise ValueError("Invalid listing for rental")
             
         rental = Rental(
-            id=f"rental_{len(self.rentals)}",
+            id=f"rental_{uuid.uuid4().hex}",
             listing_id=listing_id,
             renter_id=renter_id,
-            start_time=datetime.now()
+            start_time=datetime.now(),
+            agent_id=listing.agent_id
         )
         
-        self.rentals[rental.id] = rental
+        self.rentals.add(rental)
+        self._active_rentals.setdefault(rental.agent_id, {})[rental.id] = rental
         
         # Record transaction
         self._record_transaction(listing, renter_id)
         
         return rental
         
-    def _check_achievements(self, user_id: str):
-        """Check and award any newly earned achievements"""
-        progress = self.user_progress[user_id]
-        
-        for achievement_id, achievement in ACHIEVEMENTS.items():
-            if achievement_id not in progress.achievements:
-                if self._check_achievement_criteria(user_id, achievement):
-                    progress.achievements.append(achievement_id)
-                    progress.badges.append(achievement.badge)
-                    progress.total_points += achievement.points
-                    progress.level = 1 + (progress.total_points // 1000)
-        
-    def _check_achievement_criteria(self, user_id: str, achievement: Achievement) -> bool:
-        """Check if a user meets criteria for an achievement"""
-        progress = self.user_progress[user_id]
-        
-        if achievement.type == AchievementType.EARNINGS:
-            total_earnings = sum(t.amount for t in self.transactions 
-                               if t.seller_id == user_id)
-            return total_earnings >= achievement.threshold
-            
-        elif achievement.type == AchievementType.TASKS:
-            total_tasks = sum(a.stats.tasks_completed for a in self.agents.values()
-                            if a.owner_id == user_id)
-            return total_tasks >= achievement.threshold
-            
-        elif achievement.type == AchievementType.RATING:
-            agents = [a for a in self.agents.values() if a.owner_id == user_id]
-            if not agents:
-                return False
-            avg_rating = sum(a.stats.rating for a in agents) / len(agents)
-            return avg_rating >= achievement.threshold
+    def rate_agent(self, agent_id: str, user_id: str, rating: float, db: Optional[Session] = None) -> Tuple[float, int]:
+        """Rate an agent from 1 to 5, returning its new (average, count)"""
+        if not 1 <= rating <= 5:
+            raise ValueError("Rating must be between 1 and 5")
+        agent = self._get_agent(agent_id, db)
+        if agent.owner_id == user_id:
+            raise ValueError("Agents can't be rated by their owner")
             
-        return False
-        
-    def _update_leaderboard(self, agent_id: str):
-        """Update leaderboard entries for an agent"""
-        agent = self._get_agent(agent_id)
-        
-        # Update earnings leaderboard
-        earnings_entry = LeaderboardEntry(
-            agent_id=agent_id,
-            score=agent.stats.earnings,
-            category="earnings"
-        )
-        self._add_leaderboard_entry("earnings", earnings_entry)
-        
-        # Update rating leaderboard
-        rating_entry = LeaderboardEntry(
-            agent_id=agent_id,
-            score=agent.stats.rating,
-            category="rating"
-        )
-        self._add_leaderboard_entry("rating", rating_entry)
-        
-        # Update tasks leaderboard
-        tasks_entry = LeaderboardEntry(
-            agent_id=agent_id,
-            score=agent.stats.tasks_completed,
-            category="tasks"
-        )
-        self._add_leaderboard_entry("tasks", tasks_entry)
-        
-        # Update performance leaderboard
-        performance_entry = LeaderboardEntry(
-            agent_id=agent_id,
-            score=agent.stats.tasks_completed,
-            category="performance"
-        )
-        self._add_leaderboard_entry("performance", performance_entry)
+        with self._session(db) as session:
+            average, count = DBOperations.add_agent_rating(session, agent_id, rating)
+        self.entities.invalidate("agent", agent_id)
+        # Not in db: its identity map still holds the agent as it was before the rating
+        self._update_leaderboard(agent_id)
+        self.achievements.record_rating(self._init_user_progress(agent.owner_id), rating)
+        log_agent_activity(agent_id, "agent_rated", {"rating": rating})
+        return average, count
+        
+    def _update_leaderboard(self, agent_id: str, db: Optional[Session] = None):
+        """Upsert an agent's current stats into every leaderboard category
+
+        Subscribers get one diff per category the agent moved in; the ranks of
+        the agents it passed shift by one and are left for clients to infer.
+        """
+        agent = self._get_agent(agent_id, db)
+        # Counts still in the stats buffer aren't in the database yet
+        pending = self.stats_buffer.pending(agent_id)
+        tasks = (agent.stats.tasks_completed or 0) + pending.tasks_completed
+        scores = {
+            "earnings": (agent.stats.earnings or 0) + pending.earnings,
+            "rating": agent.stats.rating,
+            "tasks": tasks,
+            "performance": tasks
+        }
+        previous = {category: self.leaderboard[category].get(agent_id) for category in scores}
+        ranks = self.leaderboard.upsert(agent_id, scores)
+        self.response_cache.invalidate("leaderboard")
+        
+        for category, rank in ranks.items():
+            score = float(scores[category] or 0)
+            before = previous[category]
+            if before is None or before.rank != rank or before.score != score:
+                self.events.publish("leaderboard", {
+                    "category": category,
+                    "agent_id": agent_id,
+                    "score": score,
+                    "rank": rank,
+                    "previous_rank": before.rank if before else None
+                })
+        
+    def load_leaderboard(self, db: Optional[Session] = None) -> int:
+        """Seed the leaderboards from persisted agent stats, returning the agents loaded"""
+        with self._session(db) as db:
+            rows = DBOperations.get_agent_scores(db)
+        for agent_id, earnings, rating, tasks_completed in rows:
+            self.leaderboard.upsert(agent_id, {
+                "earnings": earnings,
+                "rating": rating,
+                "tasks": tasks_completed,
+                "performance": tasks_completed
+            })
+        self.response_cache.invalidate("leaderboard")
+        return len(rows)
+        
+    def load_achievements(self, db: Optional[Session] = None) -> int:
+        """Seed users' achievement aggregates from persisted stats and award what they reach, returning the users loaded"""
+        with self._session(db) as db:
+            totals = DBOperations.get_achievement_totals(db)
+        for user_id, stats in totals.items():
+            progress = self._init_user_progress(user_id)
+            progress.stats.update(stats)
+            self.achievements.evaluate(progress)
+        return len(totals)
+        
+    def _on_marketplace_flush(self, collections: List[str]):
+        # Listing pages read the table, so they change when the buffered rows land
+        if "listings" in collections:
+            self.response_cache.invalidate("marketplace")
     
-    def _add_leaderboard_entry(self, category: str, entry: LeaderboardEntry):
-        """Add an entry to a specific leaderboard category"""
-        if category not in self.leaderboard:
-            self.leaderboard[category] = []
-            
-        self.leaderboard[category].append(entry)
-        self.leaderboard[category].sort(key=lambda x: x.score, reverse=True)
-        
-        # Keep only top 100 entries
-        if len(self.leaderboard[category]) > 100:
-            self.leaderboard[category] = self.leaderboard[category][:100]
+    def _on_stats_flush(self, agent_ids: List[str]):
+        # Cached agents carry their stats rows, which the flush just changed
+        for agent_id in agent_ids:
+            self.entities.invalidate("agent", agent_id)
+    
+    def load_active_rentals(self) -> int:
+        """Seed the active-rental index from persisted rentals, returning the rentals loaded"""
+        rentals = self.marketplace.active_rentals()
+        for rental in rentals:
+            self._active_rentals.setdefault(rental.agent_id, {})[rental.id] = rental
+        return len(rentals)
     
     def _record_transaction(self, listing: Listing, buyer_id: str):
         """Record a marketplace transaction"""
         transaction = Transaction(
-            id=f"tx_{len(self.transactions)}",
+            id=f"tx_{uuid.uuid4().hex}",
             listing_id=listing.id,
             buyer_id=buyer_id,
             seller_id=listing.seller_id,
@@ -305,37 +456,109 @@ class AgentFramework:
             type=listing.type
         )
         
-        self.transactions.append(transaction)
+        self.transactions.add(transaction)
         
         # Update seller stats
-        seller_agent = self._get_agent(listing.agent_id)
-        seller_agent.stats.earnings += transaction.amount
+        self.stats_buffer.record(listing.agent_id, earnings=transaction.amount)
         
         # Check seller achievements
-        self._check_achievements(listing.seller_id)
+        self.achievements.record_sale(self._init_user_progress(listing.seller_id), transaction.amount)
     
-    def _get_active_rental(self, agent_id: str) -> Optional[Rental]:
+    def end_rental(self, rental_id: str, status: str = "cancelled") -> Rental:
+        """Close a rental as cancelled, expired or completed"""
+        rental = self.rentals.get(rental_id)
+        if not rental:
+            raise ValueError(f"Rental {rental_id} not found")
+        if rental.status != "active":
+            raise ValueError(f"Rental {rental_id} is already {rental.status}")
+            
+        rental.status = status
+        rental.end_time = rental.end_time or datetime.now()
+        self.rentals.save(rental)
+        self._deindex_rental(rental)
+        return rental
+        
+    def _deindex_rental(self, rental: Rental):
+        active = self._active_rentals.get(rental.agent_id)
+        if active is not None:
+            active.pop(rental.id, None)
+            if not active:
+                del self._active_rentals[rental.agent_id]
+    
+    def _get_active_rental(self, agent_id: str, db: Optional[Session] = None) -> Optional[Rental]:
         """Get active rental for an agent if it exists"""
-        for rental in self.rentals.values():
-            listing = self.listings.get(rental.listing_id)
-            if listing and listing.agent_id == agent_id and rental.status == "active":
+        active = self._active_rentals.get(agent_id) or self._load_active_rental(agent_id, db)
+        if not active:
+            return None
+            
+        # Rentals past their end time expire lazily on the next lookup
+        now = datetime.now()
+        for rental in list(active.values()):
+            if rental.end_time is None or rental.end_time > now:
                 return rental
+            rental.status = "expired"
+            self.rentals.save(rental)
+            self._deindex_rental(rental)
         return None
+
+    def _load_active_rental(self, agent_id: str, db: Optional[Session] = None) -> Optional[Dict[str, Rental]]:
+        """Index an active rental the index missed, e.g. one another process created, from the database"""
+        with self._session(db) as db:
+            row = DBOperations.get_active_rental(db, agent_id)
+        if row is None:
+            return None
+        # This process may have ended it already without the write being flushed
+        rental = self.rentals.get(row.id)
+        if rental is None or rental.status != "active":
+            return None
+        active = self._active_rentals.setdefault(agent_id, {})
+        active[rental.id] = rental
+        return active
+
+    def run_priority(self, agent_id: str, owner_id: Optional[str], user_id: Optional[str]) -> str:
+        """Scheduling class for a user's run: owner, subscriber, renter or public"""
+        if user_id is not None and user_id == owner_id:
+            return "owner"
+        now = datetime.now()
+        for rental in list(self._active_rentals.get(agent_id, {}).values()):
+            if rental.renter_id != user_id or (rental.end_time is not None and rental.end_time <= now):
+                continue
+            listing = self.listings.get(rental.listing_id)
+            if listing is not None and listing.type == ListingType.SUBSCRIPTION:
+                return "subscriber"
+            return "renter"
+        return "public"
+
+    def get_agent(self, agent_id: str, db: Optional[Session] = None) -> Optional[Agent]:
+        """Get an agent by ID, or None if it does not exist"""
+        try:
+            return self._get_agent(agent_id, db)
+        except ValueError:
+            return None
     
-    def _get_agent(self, agent_id: str) -> Agent:
-        """Internal method to get agent with error handling"""
-        agent = DBOperations.get_agent(self.db, agent_id)
+    async def get_agent_async(self, agent_id: str, db: AsyncSession) -> Optional[Agent]:
+        """Get an agent by ID for a read-only request path, from the entity cache when warm"""
+        return await self.entities.load_async(db, "agent", agent_id, lambda: AsyncDBOperations.get_agent(db, agent_id))
+    
+    def _get_agent(self, agent_id: str, db: Optional[Session] = None) -> Agent:
+        """Internal method to get agent with error handling
+        
+        The agent may be shared through the entity cache, so it is read-only;
+        runs lease their CodeAgent from the pool instead of attaching one.
+        """
+        with self._session(db) as db:
+            agent = self.entities.load(db, "agent", agent_id, lambda: DBOperations.get_agent(db, agent_id))
         if not agent:
             raise ValueError(f"Agent {agent_id} not found")
-            
-        # Load instance if needed
-        if not hasattr(agent, 'instance'):
-            tools = [self.available_tools[tool_name].tool_instance 
-                    for tool_name in agent.config.tools]
-            agent.instance = CodeAgent(
-                tools=tools,
-                model=HfApiModel(),
-                additional_authorized_imports=agent.config.allowed_imports
-            )
-            
         return agent
+    
+    def _build_instance(self, config: AgentConfig) -> CodeAgent:
+        """Build a smolagents CodeAgent for an agent configuration"""
+        tools = [self.available_tools[tool_name].tool_instance 
+                for tool_name in config.tools]
+        return CodeAgent(
+            tools=tools,
+            model=HfApiModel(),
+            additional_authorized_imports=config.allowed_imports,
+            max_iterations=config.max_steps or DEFAULT_MAX_STEPS
+        )
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .execution import RunControl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "64"))
+DEFAULT_POOL_TTL = float(os.getenv("AGENT_POOL_TTL", "900"))  # seconds
+# Instances of one agent alive at once; matches AGENT_MAX_CONCURRENCY so admitted runs never wait
+DEFAULT_POOL_MAX_PER_AGENT = int(os.getenv("AGENT_POOL_MAX_PER_AGENT", "2"))
+# How often a run waiting for an instance checks whether it was cancelled or ran out of time
+POOL_WAIT_SLICE = 0.5  # seconds
+
+
+def config_version(config: Any) -> str:
+    """Fingerprint the parts of an agent config that shape its CodeAgent instance"""
+    payload = json.dumps({
+        "tools": list(getattr(config, "tools", None) or []),
+        "allowed_imports": list(getattr(config, "allowed_imports", None) or []),
+        "model": getattr(config, "model", None),
+        "max_steps": getattr(config, "max_steps", None),
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+class AgentInstancePool:
+    """Bounded LRU/TTL pool of warm agent instances keyed by agent id and config version
+
+    CodeAgents keep per-run memory (logs, task, state), so each run takes
+    an instance for its exclusive use with acquire() and hands it back with
+    release(). Concurrent runs of one agent get separate instances, built
+    on demand up to max_per_agent; past that, acquire() waits for one to
+    come back, or for the run's control to cancel or expire it. max_size
+    bounds the idle instances kept across all agents.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE, ttl: Optional[float] = DEFAULT_POOL_TTL,
+                 max_per_agent: int = DEFAULT_POOL_MAX_PER_AGENT):
+        if max_size < 1:
+            raise ValueError("Pool size must be at least 1")
+        if max_per_agent < 1:
+            raise ValueError("Instances per agent must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_per_agent = max_per_agent
+        # agent_id -> (version, idle [(instance, created_at)]), least recently used agent first
+        self._idle: "OrderedDict[str, Tuple[str, List[Tuple[Any, float]]]]" = OrderedDict()
+        # agent_id -> instances leased out or being built
+        self._active: Dict[str, int] = {}
+        # id(instance) -> (agent_id, version, generation) for leased instances
+        self._leases: Dict[int, Tuple[str, str, int]] = {}
+        # agent_id -> bumped on invalidate, so instances leased before it aren't kept;
+        # only tracked while the agent has instances out
+        self._generations: Dict[str, int] = {}
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.waits = 0
+
+    def acquire(self, agent_id: str, version: str, factory: Callable[[], Any],
+                control: Optional[RunControl] = None) -> Any:
+        """Take an idle instance for exclusive use, building one if none is idle
+
+        While waiting for an instance, raises as soon as control is
+        cancelled or past its deadline.
+        """
+        waited = False
+        with self._returned:
+            while True:
+                generation = self._generations.get(agent_id, 0)
+                instance = self._take_idle(agent_id, version)
+                if instance is not None:
+                    self.hits += 1
+                    self._active[agent_id] = self._active.get(agent_id, 0) + 1
+                    self._leases[id(instance)] = (agent_id, version, generation)
+                    return instance
+                if self._active.get(agent_id, 0) < self.max_per_agent:
+                    self.misses += 1
+                    self._active[agent_id] = self._active.get(agent_id, 0) + 1
+                    break
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self._returned.wait(POOL_WAIT_SLICE)
+                if control is not None:
+                    control.check()
+
+        try:
+            # Built outside the lock so other agents aren't held up
+            instance = factory()
+        except BaseException:
+            with self._returned:
+                self._deactivate(agent_id)
+            raise
+        with self._returned:
+            self._leases[id(instance)] = (agent_id, version, generation)
+        return instance
+
+    def release(self, instance: Any) -> None:
+        """Hand a leased instance back; kept warm unless its agent was invalidated meanwhile"""
+        with self._returned:
+            lease = self._leases.pop(id(instance), None)
+            if lease is None:
+                return
+            agent_id, version, generation = lease
+            current = generation == self._generations.get(agent_id, 0)
+            self._deactivate(agent_id)
+            if current:
+                self._keep(agent_id, version, instance, time.monotonic())
+
+    @contextmanager
+    def lease(self, agent_id: str, version: str, factory: Callable[[], Any],
+              control: Optional[RunControl] = None) -> Iterator[Any]:
+        """acquire() and release() around a block"""
+        instance = self.acquire(agent_id, version, factory, control)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def put(self, agent_id: str, version: str, instance: Any) -> None:
+        """Add an idle instance, e.g. one built ahead of an agent's first run"""
+        with self._returned:
+            self._keep(agent_id, version, instance, time.monotonic())
+            self._returned.notify_all()
+
+    def invalidate(self, agent_id: str) -> None:
+        """Drop an agent's idle instances; leased ones are dropped when released"""
+        with self._returned:
+            if agent_id in self._active:
+                self._generations[agent_id] = self._generations.get(agent_id, 0) + 1
+            if agent_id in self._idle:
+                self._drop(agent_id)
+
+    def clear(self) -> None:
+        """Drop every instance, idle now and leased once released"""
+        with self._returned:
+            for agent_id in self._active:
+                self._generations[agent_id] = self._generations.get(agent_id, 0) + 1
+            for agent_id in list(self._idle):
+                self._drop(agent_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._idle_count,
+                "leased": len(self._leases),
+                "max_size": self.max_size,
+                "max_per_agent": self.max_per_agent,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "waits": self.waits,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _take_idle(self, agent_id: str, version: str) -> Optional[Any]:
+        entry = self._idle.get(agent_id)
+        if entry is None:
+            return None
+        if entry[0] != version:
+            self._drop(agent_id)
+            return None
+        idle = entry[1]
+        while idle:
+            instance, created_at = idle.pop()
+            self._idle_count -= 1
+            if not self._expired(created_at):
+                self._idle.move_to_end(agent_id)
+                return instance
+            self.evictions += 1
+        del self._idle[agent_id]
+        return None
+
+    def _keep(self, agent_id: str, version: str, instance: Any, created_at: float) -> None:
+        entry = self._idle.get(agent_id)
+        if entry is not None and entry[0] != version:
+            self._drop(agent_id)
+            entry = None
+        if entry is None:
+            entry = self._idle[agent_id] = (version, [])
+        entry[1].append((instance, created_at))
+        self._idle_count += 1
+        self._idle.move_to_end(agent_id)
+        while self._idle_count > self.max_size:
+            evicted_id, (_, idle) = next(iter(self._idle.items()))
+            idle.pop(0)
+            self._idle_count -= 1
+            self.evictions += 1
+            if not idle:
+                del self._idle[evicted_id]
+            logger.debug(f"Evicted agent instance {evicted_id} from pool")
+
+    def _drop(self, agent_id: str) -> None:
+        _, idle = self._idle.pop(agent_id)
+        self._idle_count -= len(idle)
+        self.evictions += len(idle)
+
+    def _deactivate(self, agent_id: str) -> None:
+        remaining = self._active.get(agent_id, 1) - 1
+        if remaining:
+            self._active[agent_id] = remaining
+        else:
+            self._active.pop(agent_id, None)
+            # Nothing leased is left to compare against
+            self._generations.pop(agent_id, None)
+        self._returned.notify_all()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - created_at > self.ttl
+
+    def __len__(self) -> int:
+        return self._idle_count
@@ -6,6 +6,8 @@ import os
 from supabase import create_client, Client
 from pydantic import BaseModel
 from datetime import datetime
+from .token_cache import VerifiedTokenCache
+from .supabase_client import SupabaseExecutor, SupabaseTimeoutError
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -14,8 +16,17 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
+# Trust a valid signature and exp without asking Supabase whether the session is still live
+AUTH_LOCAL_VERIFICATION_ONLY = os.getenv("AUTH_LOCAL_VERIFICATION_ONLY", "false").lower() in ("1", "true", "yes")
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+token_cache = VerifiedTokenCache(max_entries=AUTH_TOKEN_CACHE_SIZE)
+
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# All blocking supabase calls go through this pool so auth bursts can't starve other handlers
+supabase_calls = SupabaseExecutor()
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 class User(BaseModel):
@@ -24,6 +35,12 @@ class User(BaseModel):
     role: str
     metadata: dict
 
+def _supabase_error(error: Exception, status_code: int) -> HTTPException:
+    """Map a failed Supabase call to an HTTP error, surfacing timeouts as 504"""
+    if isinstance(error, SupabaseTimeoutError):
+        return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(error))
+    return HTTPException(status_code=status_code, detail=str(error))
+
 class LoginRequest(BaseModel):
     email: str
     password: str
@@ -47,7 +64,7 @@ class Enable2FARequest(BaseModel):
 @router.post("/login")
 async def login(credentials: LoginRequest):
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await supabase_calls.call("sign_in", supabase.auth.sign_in_with_password, {
             "email": credentials.email,
             "password": credentials.password
         })
@@ -56,15 +73,12 @@ async def login(credentials: LoginRequest):
             "session": response.session
         }
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=str(e)
-        )
+        raise _supabase_error(e, status.HTTP_401_UNAUTHORIZED)
 
 @router.post("/register")
 async def register(credentials: RegisterRequest):
     try:
-        response = supabase.auth.sign_up({
+        response = await supabase_calls.call("sign_up", supabase.auth.sign_up, {
             "email": credentials.email,
             "password": credentials.password,
             "options": {
@@ -73,26 +87,39 @@ async def register(credentials: RegisterRequest):
         })
         return response
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+        raise _supabase_error(e, status.HTTP_400_BAD_REQUEST)
+
+def _decode_token(token: str) -> dict:
+    """Verify a Supabase JWT's signature, audience and exp, returning its claims"""
+    return jwt.decode(
+        token,
+        SUPABASE_JWT_SECRET,
+        algorithms=["HS256"],
+        audience="authenticated"
+    )
 
 @router.post("/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
+    # Only tokens we issued are remembered as revoked, so arbitrary strings can't fill the revocation list
     try:
-        supabase.auth.sign_out()
-        return {"message": "Logged out successfully"}
-    except Exception as e:
+        payload = _decode_token(token)
+    except JWTError:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
         )
+    try:
+        token_cache.revoke(token, payload.get("exp"))
+        await supabase_calls.call("sign_out", supabase.auth.sign_out)
+        return {"message": "Logged out successfully"}
+    except Exception as e:
+        raise _supabase_error(e, status.HTTP_400_BAD_REQUEST)
 
 @router.get("/session")
 async def get_session(token: str = Depends(oauth2_scheme)):
     try:
-        response = supabase.auth.get_user(token)
+        response = await supabase_calls.call("get_user", supabase.auth.get_user, token)
         return {
             "user": response.user,
             "session": {
@@ -101,49 +128,41 @@ async def get_session(token: str = Depends(oauth2_scheme)):
             }
         }
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=str(e)
-        )
+        raise _supabase_error(e, status.HTTP_401_UNAUTHORIZED)
 
 @router.post("/reset-password")
 async def reset_password(request: ResetPasswordRequest):
     try:
-        response = supabase.auth.reset_password_for_email(request.email)
+        response = await supabase_calls.call(
+            "reset_password", supabase.auth.reset_password_for_email, request.email
+        )
         return {"message": "Password reset email sent"}
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+        raise _supabase_error(e, status.HTTP_400_BAD_REQUEST)
 
 @router.get("/2fa/secret")
 async def generate_2fa_secret(token: str = Depends(oauth2_scheme)):
     try:
-        response = supabase.rpc('generate_2fa_secret').execute()
+        response = await supabase_calls.call(
+            "rpc.generate_2fa_secret", lambda: supabase.rpc('generate_2fa_secret').execute()
+        )
         return TwoFASecretResponse(
             secret=response.data.get('secret'),
             uri=response.data.get('uri')
         )
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+        raise _supabase_error(e, status.HTTP_400_BAD_REQUEST)
 
 @router.post("/2fa/enable")
 async def enable_2fa(request: Enable2FARequest, token: str = Depends(oauth2_scheme)):
     try:
-        response = supabase.rpc('enable_2fa', {
+        response = await supabase_calls.call("rpc.enable_2fa", lambda: supabase.rpc('enable_2fa', {
             "totp_secret": request.totp_secret,
             "code": request.code
-        }).execute()
+        }).execute())
         return {"message": "2FA enabled successfully"}
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
-        )
+        raise _supabase_error(e, status.HTTP_400_BAD_REQUEST)
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
@@ -152,30 +171,36 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    if token_cache.is_revoked(token):
+        raise credentials_exception
+    
     try:
         # Verify and decode the Supabase JWT
-        payload = jwt.decode(
-            token,
-            SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience="authenticated"
-        )
+        payload = _decode_token(token)
         
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
             
-        # Get user from Supabase
-        user = supabase.auth.get_user(token)
-        if not user:
-            raise credentials_exception
+        # Confirm the session with Supabase off the event loop
+        if not AUTH_LOCAL_VERIFICATION_ONLY:
+            user = await supabase_calls.call("get_user", supabase.auth.get_user, token)
+            if not user:
+                raise credentials_exception
             
-        return User(
+        current_user = User(
             id=user_id,
             email=payload.get("email"),
             role=payload.get("role"),
             metadata=payload.get("user_metadata", {})
         )
+        token_cache.put(token, current_user, user_id, payload.get("exp"))
+        return current_user
         
     except JWTError:
         raise credentials_exception
+    except SupabaseTimeoutError as e:
+        raise _supabase_error(e, status.HTTP_401_UNAUTHORIZED)
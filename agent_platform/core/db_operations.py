@@ -1,86 +1,243 @@
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import defer, joinedload, raiseload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from .models.database import get_db
-from .models.agent import Agent, AgentConfig, AgentState, AgentStats
+from .models.agent import DBAgent, DBAgentState, DBAgentStats
 from .models.user import DBUser as User
-from typing import Optional
+from .models.marketplace import DBListing, DBRental, ListingType
+from .pagination import decode_cursor, keyset_page, split_page
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Stats column backing each leaderboard category
+LEADERBOARD_COLUMNS = {
+    "earnings": DBAgentStats.earnings,
+    "rating": DBAgentStats.rating,
+    "tasks": DBAgentStats.tasks_completed,
+    "performance": DBAgentStats.tasks_completed,
+}
+
+# Sort options for the paginated lists: name -> (column, descending)
+AGENT_SORTS = {
+    "id": (DBAgent.id, False),
+    "newest": (DBAgent.created_at, True),
+    "price_asc": (DBAgent.price, False),
+    "price_desc": (DBAgent.price, True),
+}
+
+LISTING_SORTS = {
+    "newest": (DBListing.created_at, True),
+    "price_asc": (DBListing.base_price, False),
+    "price_desc": (DBListing.base_price, True),
+}
+
+# Loader options for agent lists, so a page costs the same number of queries
+# whatever its size. Relationships a profile doesn't load raise instead of
+# lazily issuing one query per row.
+AGENT_LOAD_PROFILES = {
+    # to_summary_dict: narrow rows, stats joined in the same query
+    "summary": (
+        defer(DBAgent.tools),
+        defer(DBAgent.allowed_imports),
+        defer(DBAgent.agent_metadata),
+        joinedload(DBAgent.stats),
+        raiseload("*"),
+    ),
+    # to_dict: every column, no relationships
+    "full": (raiseload("*"),),
+    # to_detail_dict: one-to-one joins, plus an IN query per collection for every 500 agents
+    "detail": (
+        joinedload(DBAgent.stats),
+        joinedload(DBAgent.owner),
+        selectinload(DBAgent.listings),
+        selectinload(DBAgent.rentals),
+        raiseload("*"),
+    ),
+}
+
+def agent_load_options(profile: str):
+    if profile not in AGENT_LOAD_PROFILES:
+        raise ValueError(f"Unknown agent view: {profile}")
+    return AGENT_LOAD_PROFILES[profile]
+
+def _build_agent(agent_data: dict) -> Tuple[DBAgent, DBAgentState]:
+    """Validate agent data and build the agent row with its stats and state rows"""
+    required_fields = ['id', 'name', 'model', 'owner_id']
+    if not all(field in agent_data for field in required_fields):
+        raise ValueError(f"Missing required fields: {required_fields}")
+
+    now = datetime.now()
+    agent = DBAgent(
+        id=agent_data["id"],
+        name=agent_data["name"],
+        description=agent_data.get("description", ""),
+        owner_id=agent_data["owner_id"],
+        tools=agent_data.get("tools", []),
+        model=agent_data["model"],
+        allowed_imports=agent_data.get("allowed_imports", []),
+        agent_metadata=agent_data.get("agent_metadata", {}),
+        max_run_seconds=agent_data.get("max_run_seconds"),
+        max_steps=agent_data.get("max_steps"),
+        max_tool_calls=agent_data.get("max_tool_calls"),
+        created_at=now,
+        updated_at=now
+    )
+    agent.stats = DBAgentStats(tasks_completed=0, earnings=0.0, rating=0.0, rating_count=0)
+    state = DBAgentState(agent=agent, status="idle", last_updated=now)
+    return agent, state
+
+def _leaderboard_column(category: str):
+    if category not in LEADERBOARD_COLUMNS:
+        raise ValueError(f"Unknown leaderboard category: {category}")
+    return LEADERBOARD_COLUMNS[category]
 
 class DBOperations:
     """Handles all database operations for agent persistence"""
     
     @staticmethod
-    def create_agent(db: Session, agent_data: dict) -> Agent:
+    def create_agent(db: Session, agent_data: dict) -> DBAgent:
         """Create a new agent with validation and related records"""
-        required_fields = ['name', 'model', 'owner_id']
-        if not all(field in agent_data for field in required_fields):
-            raise ValueError(f"Missing required fields: {required_fields}")
-
-        agent_config = AgentConfig(
-            name=agent_data["name"],
-            description=agent_data.get("description", ""),
-            tools=agent_data.get("tools", []),
-            model=agent_data["model"],
-            allowed_imports=agent_data.get("allowed_imports", [])
-        )
-        
-        agent_state = AgentState(status="idle")
-        agent_stats = AgentStats()
-        
-        agent = Agent(
-            config=agent_config,
-            state=agent_state,
-            stats=agent_stats,
-            owner_id=agent_data["owner_id"]
-        )
+        agent, state = _build_agent(agent_data)
         
-        db.add(agent)
+        db.add_all([agent, state])
         db.commit()
         db.refresh(agent)
         return agent
         
     @staticmethod
-    def get_agent(db: Session, agent_id: int) -> Optional[Agent]:
-        """Retrieve an agent by ID"""
-        return db.query(Agent).filter(Agent.id == agent_id).first()
+    def get_agent(db: Session, agent_id: str) -> Optional[DBAgent]:
+        """Retrieve an agent by ID with its stats, so it stays usable once detached"""
+        return db.query(DBAgent).options(joinedload(DBAgent.stats)).filter(DBAgent.id == agent_id).first()
+        
+    @staticmethod
+    def list_agents(db: Session, owner_id: Optional[str] = None, limit: int = 100, offset: int = 0,
+                    profile: str = "full") -> List[DBAgent]:
+        """List agents, optionally restricted to one owner, loaded per AGENT_LOAD_PROFILES"""
+        query = db.query(DBAgent).options(*agent_load_options(profile))
+        if owner_id is not None:
+            query = query.filter(DBAgent.owner_id == owner_id)
+        return query.order_by(DBAgent.id).offset(offset).limit(limit).all()
+        
+    @staticmethod
+    def get_leaderboard(db: Session, category: str, limit: int = 100) -> List[Tuple[str, float]]:
+        """Top (agent_id, score) pairs for a leaderboard category"""
+        column = _leaderboard_column(category)
+        return db.query(DBAgentStats.agent_id, column)\
+            .order_by(column.desc())\
+            .limit(limit)\
+            .all()
         
     @staticmethod
-    def update_agent_state(db: Session, agent_id: int, state: str) -> None:
-        """Update an agent's state"""
-        db.query(AgentState)\
-            .filter(AgentState.id == agent_id)\
-            .update({"status": state})
+    def get_agent_scores(db: Session) -> List[Tuple[str, float, float, int]]:
+        """(agent_id, earnings, rating, tasks_completed) for every agent with stats"""
+        return db.query(
+            DBAgentStats.agent_id,
+            DBAgentStats.earnings,
+            DBAgentStats.rating,
+            DBAgentStats.tasks_completed
+        ).all()
+        
+    @staticmethod
+    def add_agent_rating(db: Session, agent_id: str, rating: float) -> Tuple[float, int]:
+        """Fold a rating into an agent's average in one statement, returning (average, count)"""
+        count = func.coalesce(DBAgentStats.rating_count, 0)
+        result = db.execute(
+            update(DBAgentStats)
+            .where(DBAgentStats.agent_id == agent_id)
+            .values(
+                rating=(func.coalesce(DBAgentStats.rating, 0) * count + rating) / (count + 1),
+                rating_count=count + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise ValueError("Agent not found")
+        db.commit()
+        return db.query(DBAgentStats.rating, DBAgentStats.rating_count)\
+            .filter(DBAgentStats.agent_id == agent_id)\
+            .one()
+        
+    @staticmethod
+    def get_achievement_totals(db: Session) -> Dict[str, Dict[str, float]]:
+        """Per-user aggregates that achievements are measured against, keyed like UserProgress.stats"""
+        totals: Dict[str, Dict[str, float]] = {}
+        rows = db.query(
+            DBAgent.owner_id,
+            func.sum(func.coalesce(DBAgentStats.earnings, 0)),
+            func.sum(func.coalesce(DBAgentStats.tasks_completed, 0)),
+            func.sum(func.coalesce(DBAgentStats.rating, 0) * func.coalesce(DBAgentStats.rating_count, 0)),
+            func.sum(func.coalesce(DBAgentStats.rating_count, 0))
+        ).join(DBAgentStats, DBAgentStats.agent_id == DBAgent.id).group_by(DBAgent.owner_id).all()
+        for owner_id, earnings, tasks_completed, rating_sum, rating_count in rows:
+            totals[owner_id] = {
+                "earnings": float(earnings or 0),
+                "tasks_completed": int(tasks_completed or 0),
+                "rating_sum": float(rating_sum or 0),
+                "rating_count": int(rating_count or 0)
+            }
+        listings = db.query(DBListing.seller_id, func.count(DBListing.id)).group_by(DBListing.seller_id).all()
+        for seller_id, count in listings:
+            totals.setdefault(seller_id, {})["listings"] = count
+        return totals
+        
+    @staticmethod
+    def get_active_rental(db: Session, agent_id: str) -> Optional[DBRental]:
+        """Active rental for an agent, served by the (agent_id, status) index"""
+        return db.query(DBRental)\
+            .filter(DBRental.agent_id == agent_id, DBRental.status == "active")\
+            .first()
+        
+    @staticmethod
+    def update_agent_state(db: Session, agent_id: str, status: str) -> None:
+        """Update an agent's persisted status, creating its row on first use"""
+        row = db.query(DBAgentState).filter(DBAgentState.agent_id == agent_id).first()
+        if row is None:
+            row = DBAgentState(agent_id=agent_id)
+            db.add(row)
+        row.status = status
+        row.last_updated = datetime.now()
         db.commit()
         
     @staticmethod
-    def update_agent_stats(db: Session, agent_id: int, stats: dict) -> None:
+    def get_agent_states(db: Session, statuses: Iterable[str]) -> List[Tuple[str, str, str, datetime]]:
+        """(agent_id, owner_id, status, last_updated) for every agent persisted in one of statuses"""
+        return db.query(DBAgentState.agent_id, DBAgent.owner_id, DBAgentState.status, DBAgentState.last_updated)\
+            .join(DBAgent, DBAgent.id == DBAgentState.agent_id)\
+            .filter(DBAgentState.status.in_(list(statuses)))\
+            .all()
+        
+    @staticmethod
+    def update_agent_stats(db: Session, agent_id: str, stats: dict) -> None:
         """Update an agent's statistics"""
-        db.query(AgentStats)\
-            .filter(AgentStats.id == agent_id)\
-            .update(stats)
+        db.query(DBAgentStats)\
+            .filter(DBAgentStats.agent_id == agent_id)\
+            .update(stats, synchronize_session=False)
         db.commit()
         
     @staticmethod
-    def delete_agent(db: Session, agent_id: int) -> None:
+    def delete_agent(db: Session, agent_id: str) -> None:
         """Delete an agent and related records"""
-        agent = db.query(Agent).filter(Agent.id == agent_id).first()
+        agent = db.query(DBAgent).filter(DBAgent.id == agent_id).first()
         if not agent:
             raise ValueError("Agent not found")
             
-        db.delete(agent.config)
-        db.delete(agent.state)
-        db.delete(agent.stats)
+        db.query(DBAgentState).filter(DBAgentState.agent_id == agent_id).delete(synchronize_session=False)
+        db.query(DBAgentStats).filter(DBAgentStats.agent_id == agent_id).delete(synchronize_session=False)
         db.delete(agent)
         db.commit()
 
 
     @staticmethod
-    def update_agent(db: Session, agent_id: int, update_data: dict) -> Agent:
+    def update_agent(db: Session, agent_id: str, update_data: dict) -> DBAgent:
         """Update existing agent with partial data"""
-        agent = db.query(Agent).filter(Agent.id == agent_id).first()
+        agent = db.query(DBAgent).filter(DBAgent.id == agent_id).first()
         if not agent:
             raise ValueError("Agent not found")
 
         for key, value in update_data.items():
             setattr(agent, key, value)
+        agent.updated_at = datetime.now()
             
         db.commit()
         db.refresh(agent)
@@ -90,3 +247,125 @@ class DBOperations:
     def get_user_by_username(db: Session, username: str) -> Optional[User]:
         """Retrieve a user by their username"""
         return db.query(User).filter(User.username == username).first()
+
+class AsyncDBOperations:
+    """Asyncio counterparts of the DBOperations used on API hot paths"""
+    
+    @staticmethod
+    async def create_agent(db: AsyncSession, agent_data: dict) -> DBAgent:
+        """Create a new agent with validation and related records"""
+        agent, state = _build_agent(agent_data)
+        
+        db.add_all([agent, state])
+        await db.commit()
+        await db.refresh(agent)
+        return agent
+        
+    @staticmethod
+    async def get_agent(db: AsyncSession, agent_id: str) -> Optional[DBAgent]:
+        """Retrieve an agent by ID with its stats; asyncio sessions can't lazy-load them later"""
+        result = await db.execute(
+            select(DBAgent).options(joinedload(DBAgent.stats)).where(DBAgent.id == agent_id)
+        )
+        return result.scalars().first()
+        
+    @staticmethod
+    async def list_agents(db: AsyncSession, owner_id: Optional[str] = None, limit: int = 100,
+                          offset: int = 0, profile: str = "full") -> List[DBAgent]:
+        """List agents, optionally restricted to one owner, loaded per AGENT_LOAD_PROFILES"""
+        query = select(DBAgent).options(*agent_load_options(profile))
+        if owner_id is not None:
+            query = query.where(DBAgent.owner_id == owner_id)
+        result = await db.execute(query.order_by(DBAgent.id).offset(offset).limit(limit))
+        return result.scalars().all()
+        
+    @staticmethod
+    async def get_agents_by_ids(db: AsyncSession, agent_ids: List[str], profile: str = "full") -> List[DBAgent]:
+        """Agents with the given ids, in no particular order, loaded per AGENT_LOAD_PROFILES"""
+        options = agent_load_options(profile)
+        if not agent_ids:
+            return []
+        result = await db.execute(select(DBAgent).options(*options).where(DBAgent.id.in_(agent_ids)))
+        return result.scalars().all()
+        
+    @staticmethod
+    async def page_agents(db: AsyncSession, owner_id: Optional[str] = None, listed: Optional[bool] = None,
+                          sort: str = "id", cursor: Optional[str] = None, limit: int = 50,
+                          profile: str = "full", visible_to: Optional[str] = None
+                          ) -> Tuple[List[DBAgent], Optional[str]]:
+        """One keyset page of agents, loaded per AGENT_LOAD_PROFILES, and the cursor for the next page
+
+        With visible_to, unlisted agents are left out unless that user owns them.
+        """
+        if sort not in AGENT_SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        column, descending = AGENT_SORTS[sort]
+        after = decode_cursor(cursor, sort) if cursor else None
+        
+        query = select(DBAgent).options(*agent_load_options(profile))
+        if owner_id is not None:
+            query = query.where(DBAgent.owner_id == owner_id)
+        if listed is not None:
+            query = query.where(DBAgent.is_listed == int(listed))
+        if visible_to is not None:
+            query = query.where(or_(DBAgent.is_listed == 1, DBAgent.owner_id == visible_to))
+        query = keyset_page(query, DBAgent.id, column, descending, after, limit)
+        
+        result = await db.execute(query)
+        return split_page(result.scalars().all(), sort, column.key, limit)
+        
+    @staticmethod
+    async def page_listings(db: AsyncSession, listing_type: Optional[ListingType] = None,
+                            status: Optional[str] = "active", seller_id: Optional[str] = None,
+                            min_price: Optional[float] = None, max_price: Optional[float] = None,
+                            sort: str = "newest", cursor: Optional[str] = None,
+                            limit: int = 50) -> Tuple[List[DBListing], Optional[str]]:
+        """One keyset page of marketplace listings and the cursor for the next page"""
+        if sort not in LISTING_SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        column, descending = LISTING_SORTS[sort]
+        after = decode_cursor(cursor, sort) if cursor else None
+        
+        query = select(DBListing)
+        if listing_type is not None:
+            query = query.where(DBListing.type == listing_type)
+        if status is not None:
+            query = query.where(DBListing.status == status)
+        if seller_id is not None:
+            query = query.where(DBListing.seller_id == seller_id)
+        if min_price is not None:
+            query = query.where(DBListing.base_price >= min_price)
+        if max_price is not None:
+            query = query.where(DBListing.base_price <= max_price)
+        query = keyset_page(query, DBListing.id, column, descending, after, limit)
+        
+        result = await db.execute(query)
+        return split_page(result.scalars().all(), sort, column.key, limit)
+        
+    @staticmethod
+    async def get_leaderboard(db: AsyncSession, category: str, limit: int = 100,
+                              offset: int = 0) -> List[Tuple[str, float]]:
+        """Ranked (agent_id, score) pairs for a leaderboard category"""
+        column = _leaderboard_column(category)
+        result = await db.execute(
+            select(DBAgentStats.agent_id, column)
+            .order_by(column.desc(), DBAgentStats.agent_id)
+            .offset(offset)
+            .limit(limit)
+        )
+        return result.all()
+        
+    @staticmethod
+    async def update_agent(db: AsyncSession, agent_id: str, update_data: dict) -> DBAgent:
+        """Update existing agent with partial data"""
+        agent = await AsyncDBOperations.get_agent(db, agent_id)
+        if not agent:
+            raise ValueError("Agent not found")
+
+        for key, value in update_data.items():
+            setattr(agent, key, value)
+        agent.updated_at = datetime.now()
+            
+        await db.commit()
+        await db.refresh(agent)
+        return agent
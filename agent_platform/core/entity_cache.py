@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy import inspect
+from .events import Event, EventBus
+
+logger = logging.getLogger(__name__)
+
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "2048"))  # entities kept per process, 0 disables
+# Upper bound on staleness when another worker changes an entity and no relay reaches this one
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "60"))  # seconds
+
+# Internal bus topic carrying invalidations between workers; not exposed to clients
+INVALIDATE_TOPIC = "entity_invalidated"
+
+_SESSION_KEY = "entity_cache"
+
+
+def session_identity_map(db: Any) -> Optional[Dict[Tuple[str, str], Any]]:
+    """Entities already looked up in this session, or None if the session can't hold them"""
+    info = getattr(getattr(db, "sync_session", db), "info", None)
+    return info.setdefault(_SESSION_KEY, {}) if isinstance(info, dict) else None
+
+
+class EntityCache:
+    """Read-through cache of read-mostly rows, keyed by kind and id
+
+    Lookups check the session's identity map first, so one request sees one
+    object per entity, then a process-wide LRU/TTL map, and only then the
+    database. Rows are detached from their session before they are shared
+    and must be treated as read-only; writes load their own rows.
+
+    Every invalidation bumps the entity's version. A load that raced an
+    invalidation is returned to its caller but not cached, so a stale read
+    can't outlive the write that made it stale. With an event bus,
+    invalidations are also relayed to the other workers.
+    """
+
+    def __init__(self, max_size: int = ENTITY_CACHE_SIZE, ttl: Optional[float] = ENTITY_CACHE_TTL,
+                 events: Optional[EventBus] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.events = events
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.session_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_loads = 0
+        if events is not None:
+            events.listen(INVALIDATE_TOPIC, self._on_relayed)
+
+    def load(self, db: Any, kind: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Cached entity, or the loader's result, cached unless it is None"""
+        identity = session_identity_map(db)
+        if identity is not None and (kind, key) in identity:
+            self.session_hits += 1
+            return identity[(kind, key)]
+
+        value, version = self._lookup(kind, key)
+        if version is not None:
+            value = loader()
+            self._store(db, kind, key, value, version)
+        if identity is not None:
+            identity[(kind, key)] = value
+        return value
+
+    async def load_async(self, db: Any, kind: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """load() for an asyncio session"""
+        identity = session_identity_map(db)
+        if identity is not None and (kind, key) in identity:
+            self.session_hits += 1
+            return identity[(kind, key)]
+
+        value, version = self._lookup(kind, key)
+        if version is not None:
+            value = await loader()
+            self._store(db, kind, key, value, version)
+        if identity is not None:
+            identity[(kind, key)] = value
+        return value
+
+    def invalidate(self, kind: str, key: str, relay: bool = True) -> None:
+        """Drop an entity after it was written, here and, if relay, in other workers"""
+        with self._lock:
+            self._versions[(kind, key)] = self._versions.get((kind, key), 0) + 1
+            self._entries.pop((kind, key), None)
+            self.invalidations += 1
+        if relay and self.events is not None:
+            self.events.publish(INVALIDATE_TOPIC, {"kind": kind, "key": key})
+
+    def clear(self) -> None:
+        with self._lock:
+            for entity in self._entries:
+                self._versions[entity] = self._versions.get(entity, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "session_hits": self.session_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "stale_loads": self.stale_loads,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _lookup(self, kind: str, key: str) -> Tuple[Any, Optional[int]]:
+        """(value, None) on a hit, (None, version to store under) on a miss"""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None and not self._expired(entry[1]):
+                self._entries.move_to_end((kind, key))
+                self.hits += 1
+                return entry[0], None
+            if entry is not None:
+                del self._entries[(kind, key)]
+            self.misses += 1
+            return None, self._versions.get((kind, key), 0)
+
+    def _store(self, db: Any, kind: str, key: str, value: Any, version: int) -> None:
+        if value is None or self.max_size <= 0:
+            return
+        state = inspect(value, raiseerr=False)
+        if state is not None and state.session is not None:
+            # Keeps its loaded attributes; the session can't expire or refresh it anymore
+            db.expunge(value)
+        with self._lock:
+            if self._versions.get((kind, key), 0) != version:
+                self.stale_loads += 1
+                return
+            self._entries[(kind, key)] = (value, time.monotonic())
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _expired(self, cached_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - cached_at > self.ttl
+
+    def _on_relayed(self, event: Event) -> None:
+        kind, key = event.data.get("kind"), event.data.get("key")
+        if kind and key:
+            self.invalidate(kind, key, relay=False)
@@ -0,0 +1,409 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, delete, func, select
+from .models import database
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "auto")  # auto | memory | postgres | database
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "agent_platform_events")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))  # per subscriber
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))  # seconds
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1"))  # seconds between polls of the database relay
+EVENTS_RETENTION = float(os.getenv("EVENTS_RETENTION", "60"))  # seconds relayed events are kept in the database
+
+# Topics published by the framework
+TOPICS = ("leaderboard", "agent_status")
+
+# Sent in place of the backlog when a subscriber falls too far behind
+RESYNC = "resync"
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+_NOTIFY_LIMIT = 7900
+
+# Events relayed by DatabaseEventBridge; only ever read back by other workers
+bus_events = Table(
+    "bus_events", MetaData(),
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("topic", String, nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("origin", String, nullable=False),
+    Column("timestamp", Float, nullable=False, index=True),
+)
+
+
+@dataclass
+class Event:
+    """
+    One message on the bus
+
+    Attributes:
+        topic: What changed, e.g. "leaderboard" or "agent_status"
+        data: JSON-serializable details of the change
+        origin: Id of the bus that published it, used to drop LISTEN/NOTIFY echoes
+        timestamp: Unix time it was published
+    """
+    topic: str
+    data: Dict[str, Any]
+    origin: str = ""
+    timestamp: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"topic": self.topic, "data": self.data, "timestamp": self.timestamp}
+
+    def to_sse(self) -> str:
+        return f"event: {self.topic}\ndata: {json.dumps(self.to_dict(), separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """A subscriber's bounded queue of matching events
+
+    filters maps each wanted topic to field constraints on the event data; a
+    constraint is either a value the field must equal or a collection it must
+    be in. A subscriber that lets its queue fill up loses the backlog and gets
+    a single resync event telling it to refetch.
+    """
+
+    def __init__(self, filters: Dict[str, Dict[str, Any]], queue_size: int = EVENTS_QUEUE_SIZE):
+        self.filters = filters
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def matches(self, event: Event) -> bool:
+        constraints = self.filters.get(event.topic)
+        if constraints is None:
+            return False
+        for key, wanted in constraints.items():
+            value = event.data.get(key)
+            if isinstance(wanted, (set, frozenset, list, tuple)):
+                if value not in wanted:
+                    return False
+            elif value != wanted:
+                return False
+        return True
+
+    def offer(self, event: Event) -> None:
+        """Queue an event; only called on the bus's event loop"""
+        if not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.resyncs += 1
+            self.queue.put_nowait(Event(RESYNC, {}))
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event, or None if none arrives within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """In-process pub/sub for pushing state changes to connected clients
+
+    publish() may be called from any thread; delivery happens on the event loop
+    the bus was started on. Events published before start() or with nobody
+    subscribed are dropped. The bus also relays events so subscribers on
+    every worker see them: through LISTEN/NOTIFY on Postgres, otherwise
+    through a table each worker polls. An in-memory SQLite database can't
+    be shared, so there events stay in the worker.
+    """
+
+    def __init__(self, backend: str = EVENTS_BACKEND, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.origin = uuid.uuid4().hex
+        self._subscriptions: Set[Subscription] = set()
+        # topic -> callbacks for events relayed from other workers
+        self._listeners: Dict[str, List[Callable[[Event], None]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bridge: Optional[Union["PostgresEventBridge", "DatabaseEventBridge"]] = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.relayed = 0
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        bridge_class = self._bridge_class()
+        if bridge_class is not None:
+            bridge = bridge_class(self)
+            try:
+                await bridge.start()
+                self._bridge = bridge
+                logger.info(f"Event bus relaying through {bridge.name}")
+            except Exception as e:
+                # Still works within this worker
+                logger.warning(f"Could not start {bridge_class.name} event bridge: {str(e)}")
+
+    async def stop(self) -> None:
+        if self._bridge is not None:
+            await self._bridge.stop()
+            self._bridge = None
+        self._loop = None
+
+    def subscribe(self, filters: Dict[str, Dict[str, Any]]) -> Subscription:
+        subscription = Subscription(filters, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def listen(self, topic: str, callback: Callable[[Event], None]) -> None:
+        """Call back on events relayed from other workers, on the event loop; keep callbacks cheap"""
+        with self._lock:
+            self._listeners.setdefault(topic, []).append(callback)
+
+    def publish(self, topic: str, data: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        self.published += 1
+        event = Event(topic, data, origin=self.origin)
+        try:
+            loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            # Loop closed between the check and the call during shutdown
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        return {
+            "backend": self._bridge.name if self._bridge is not None else "memory",
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "relayed": self.relayed,
+            "resyncs": sum(subscription.resyncs for subscription in subscriptions)
+        }
+
+    def _dispatch(self, event: Event) -> None:
+        """Deliver to local subscribers; runs on the event loop"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+        self.delivered += 1
+        if self._bridge is not None and event.origin == self.origin:
+            self._bridge.send(event)
+
+    def _receive(self, event: Event) -> None:
+        """An event relayed from another worker"""
+        if event.origin == self.origin:
+            return
+        self.relayed += 1
+        with self._lock:
+            listeners = list(self._listeners.get(event.topic, ()))
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Listener for {event.topic} failed: {str(e)}")
+        self._dispatch(event)
+
+    def _bridge_class(self):
+        if self.backend == "memory":
+            return None
+        if self.backend == "postgres" or (self.backend == "auto" and database.engine.dialect.name == "postgresql"):
+            return PostgresEventBridge
+        if self.backend == "auto" and database.engine.url.database in (None, "", ":memory:"):
+            return None
+        return DatabaseEventBridge
+
+
+class PostgresEventBridge:
+    """Relays bus events between workers with LISTEN/NOTIFY on one asyncpg connection"""
+
+    name = "postgres"
+
+    def __init__(self, bus: EventBus, channel: str = EVENTS_CHANNEL):
+        self.bus = bus
+        self.channel = channel
+        self._connection = None
+        self._outbox: "asyncio.Queue[Event]" = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        import asyncpg
+
+        url = database.engine.url.set(drivername="postgresql")
+        self._connection = await asyncpg.connect(url.render_as_string(hide_password=False))
+        await self._connection.add_listener(self.channel, self._on_notify)
+        self._sender = asyncio.create_task(self._send_loop())
+
+    async def stop(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def send(self, event: Event) -> None:
+        self._outbox.put_nowait(event)
+
+    async def _send_loop(self) -> None:
+        while True:
+            event = await self._outbox.get()
+            payload = json.dumps({
+                "topic": event.topic,
+                "data": event.data,
+                "origin": event.origin,
+                "timestamp": event.timestamp
+            }, separators=(",", ":"))
+            if len(payload.encode("utf-8")) > _NOTIFY_LIMIT:
+                logger.warning(f"Event on {event.topic} too large to relay ({len(payload)} bytes)")
+                continue
+            try:
+                await self._connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            except Exception as e:
+                logger.error(f"Could not relay event on {event.topic}: {str(e)}")
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+            event = Event(message["topic"], message["data"], message["origin"], message["timestamp"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed event on {channel}")
+            return
+        self.bus._receive(event)
+
+
+class DatabaseEventBridge:
+    """Relays bus events between workers through the bus_events table
+
+    The fallback for databases without LISTEN/NOTIFY, such as a SQLite file
+    shared by the API and standalone workers. Each worker appends what it
+    publishes and polls for rows past the last id it saw, so relayed events
+    arrive up to one poll interval late. Rows older than the retention
+    window are pruned.
+    """
+
+    name = "database"
+
+    def __init__(self, bus: EventBus, poll_interval: float = EVENTS_POLL_INTERVAL,
+                 retention: float = EVENTS_RETENTION):
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._outbox: "asyncio.Queue[Event]" = asyncio.Queue()
+        self._last_id = 0
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        # Only events published from now on are relayed
+        self._last_id = await asyncio.to_thread(self._setup)
+        self._tasks = [asyncio.create_task(self._send_loop()), asyncio.create_task(self._poll_loop())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        events = self._drain()
+        if events:
+            await asyncio.to_thread(self._insert, events)
+
+    def send(self, event: Event) -> None:
+        self._outbox.put_nowait(event)
+
+    async def _send_loop(self) -> None:
+        while True:
+            events = [await self._outbox.get()]
+            events.extend(self._drain())
+            try:
+                await asyncio.to_thread(self._insert, events)
+            except Exception as e:
+                logger.error(f"Could not relay {len(events)} events: {str(e)}")
+
+    async def _poll_loop(self) -> None:
+        pruned_at = time.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await asyncio.to_thread(self._fetch, self._last_id)
+                if time.time() - pruned_at > self.retention:
+                    await asyncio.to_thread(self._prune)
+                    pruned_at = time.time()
+            except Exception as e:
+                logger.error(f"Could not poll relayed events: {str(e)}")
+                continue
+            for row in rows:
+                self._last_id = row.id
+                try:
+                    event = Event(row.topic, json.loads(row.payload), row.origin, row.timestamp)
+                except ValueError:
+                    logger.warning(f"Ignoring malformed relayed event {row.id}")
+                    continue
+                self.bus._receive(event)
+
+    def _drain(self) -> List[Event]:
+        events = []
+        while not self._outbox.empty():
+            events.append(self._outbox.get_nowait())
+        return events
+
+    @staticmethod
+    def _setup() -> int:
+        bus_events.create(database.engine, checkfirst=True)
+        with database.engine.connect() as conn:
+            return conn.execute(select(func.max(bus_events.c.id))).scalar() or 0
+
+    @staticmethod
+    def _insert(events: List[Event]) -> None:
+        with database.engine.begin() as conn:
+            conn.execute(bus_events.insert(), [
+                {
+                    "topic": event.topic,
+                    "payload": json.dumps(event.data, separators=(",", ":"), default=str),
+                    "origin": event.origin,
+                    "timestamp": event.timestamp
+                }
+                for event in events
+            ])
+
+    @staticmethod
+    def _fetch(after_id: int):
+        with database.engine.connect() as conn:
+            return conn.execute(
+                select(bus_events).where(bus_events.c.id > after_id).order_by(bus_events.c.id).limit(500)
+            ).fetchall()
+
+    def _prune(self) -> None:
+        with database.engine.begin() as conn:
+            conn.execute(delete(bus_events).where(bus_events.c.timestamp < time.time() - self.retention))
+
+
+def event_filters(topics: Iterable[str], agent_ids: Optional[Iterable[str]] = None,
+                  owner_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Subscription filters for the public streams
+
+    Agent status is only streamed for agents the subscriber owns; leaderboard
+    changes are public. Unknown topics raise ValueError.
+    """
+    filters: Dict[str, Dict[str, Any]] = {}
+    for topic in topics:
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown topic: {topic}")
+        constraints: Dict[str, Any] = {}
+        if agent_ids:
+            constraints["agent_id"] = frozenset(agent_ids)
+        if topic == "agent_status":
+            if owner_id is None:
+                raise ValueError("agent_status requires authentication")
+            constraints["owner_id"] = owner_id
+        filters[topic] = constraints
+    return filters
@@ -0,0 +1,464 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from .admission import AdmissionController, AdmissionError, EngineBusyError
+from .models.run import AgentRun, RunStatus
+from .scheduler import DEFAULT_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("AGENT_RUN_WORKERS", "8"))
+DEFAULT_MAX_PENDING = int(os.getenv("AGENT_RUN_MAX_PENDING", "256"))
+DEFAULT_HISTORY_SIZE = int(os.getenv("AGENT_RUN_HISTORY", "1000"))
+# Upper bound on any run's wall-clock time, from submission; 0 disables it
+DEFAULT_RUN_TIMEOUT = float(os.getenv("AGENT_RUN_TIMEOUT", "600"))  # seconds
+# Steps an agent may take when its config doesn't set max_steps
+DEFAULT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "6"))
+WATCHDOG_INTERVAL = float(os.getenv("AGENT_RUN_WATCHDOG_INTERVAL", "1"))  # seconds
+
+
+class RunCancelledError(RuntimeError):
+    """Raised to stop a run whose result is no longer wanted"""
+
+
+class RunTimeoutError(RunCancelledError):
+    """Raised once a run passes its deadline"""
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a run uses more steps or tool calls than it was allowed"""
+
+
+class RunControl:
+    """Deadline, step budgets and cancellation for one run
+
+    Checked cooperatively between agent steps. Backends that can stop a step in
+    progress, such as the process pool, register a kill hook that runs as soon
+    as the run is cancelled or the engine's watchdog sees it pass its deadline.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, max_steps: Optional[int] = None,
+                 max_tool_calls: Optional[int] = None,
+                 on_step: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.timeout = None
+        self.deadline = None
+        self.max_steps = None
+        self.max_tool_calls = None
+        self.on_step = on_step
+        self.steps = 0
+        self.tool_calls = 0
+        self._error: Optional[RunCancelledError] = None
+        self._kill_hooks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self.limit(timeout, max_steps, max_tool_calls)
+
+    def limit(self, timeout: Optional[float] = None, max_steps: Optional[int] = None,
+              max_tool_calls: Optional[int] = None) -> None:
+        """Tighten the limits; a looser or missing value leaves the current one"""
+        if timeout:
+            deadline = time.monotonic() + timeout
+            if self.deadline is None or deadline < self.deadline:
+                self.timeout, self.deadline = timeout, deadline
+        if max_steps and (self.max_steps is None or max_steps < self.max_steps):
+            self.max_steps = max_steps
+        if max_tool_calls and (self.max_tool_calls is None or max_tool_calls < self.max_tool_calls):
+            self.max_tool_calls = max_tool_calls
+
+    @property
+    def cancelled(self) -> bool:
+        return self._error is not None
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def cancel(self, error: Optional[RunCancelledError] = None) -> bool:
+        """Stop the run, killing any step in progress; False if it was already stopped"""
+        with self._lock:
+            if self._error is not None:
+                return False
+            self._error = error or RunCancelledError("Run cancelled")
+            # Under the lock so a hook can't fire after its backend unregistered it
+            for hook in self._kill_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    logger.warning(f"Kill hook failed: {str(e)}")
+        return True
+
+    def expire(self) -> bool:
+        return self.cancel(RunTimeoutError(f"Run exceeded its {self.timeout:g}s deadline"))
+
+    def error(self) -> RunCancelledError:
+        return type(self._error)(str(self._error))
+
+    def check(self) -> None:
+        """Raise if the run has been cancelled or is past its deadline"""
+        if self._error is None and self.expired():
+            self.expire()
+        if self._error is not None:
+            raise self.error()
+
+    def report(self, event: Dict[str, Any]) -> None:
+        """Count a finished step against the budgets, then pass it to on_step"""
+        if event["type"] == "step":
+            # The wrap-up step smolagents adds at max_iterations has no number
+            if event.get("step") is not None:
+                self.steps += 1
+            self.tool_calls += event.get("tool_calls", 0)
+            if self.max_steps and self.steps > self.max_steps:
+                raise BudgetExceededError(f"Run exceeded its budget of {self.max_steps} steps")
+            if self.max_tool_calls and self.tool_calls > self.max_tool_calls:
+                raise BudgetExceededError(f"Run exceeded its budget of {self.max_tool_calls} tool calls")
+            self.check()
+        if self.on_step is not None:
+            self.on_step(event)
+
+    @contextmanager
+    def kill_hook(self, hook: Callable[[], None]):
+        """Register hook to run on cancellation for the duration of the block"""
+        with self._lock:
+            if self._error is not None:
+                hook()
+            self._kill_hooks.append(hook)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._kill_hooks.remove(hook)
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    return str(value)
+
+
+def _tool_names(instance) -> List[str]:
+    tools = getattr(getattr(instance, "toolbox", None), "tools", None) or {}
+    return [name for name in tools if name != "final_answer"]
+
+
+def count_tool_calls(tool_call, tool_names: Iterable[str]) -> int:
+    """Tool invocations made by one step
+
+    A CodeAgent step is a single python_interpreter call whose code may call
+    several tools, so those are counted by name in the code.
+    """
+    if tool_call is None:
+        return 0
+    if tool_call.name != "python_interpreter":
+        return 1
+    code = str(tool_call.arguments)
+    return sum(len(re.findall(rf"\b{re.escape(name)}\s*\(", code)) for name in tool_names)
+
+
+def step_event(step, tool_names: Iterable[str] = ()) -> Dict[str, Any]:
+    """JSON-ready summary of one smolagents ActionStep"""
+    tool_call = getattr(step, "tool_call", None)
+    code = None
+    if tool_call is not None and tool_call.name == "python_interpreter":
+        code = tool_call.arguments
+    error = getattr(step, "error", None)
+    return {
+        "type": "step",
+        "step": getattr(step, "iteration", None),
+        "thought": getattr(step, "llm_output", None),
+        "code": _jsonable(code),
+        "tool_call": {"name": tool_call.name, "arguments": _jsonable(tool_call.arguments)} if tool_call else None,
+        "tool_calls": count_tool_calls(tool_call, tool_names),
+        "observation": getattr(step, "observations", None),
+        "error": str(error) if error is not None else None,
+        "duration": getattr(step, "duration", None)
+    }
+
+
+def final_answer_event(answer: Any) -> Dict[str, Any]:
+    return {"type": "final_answer", "answer": _jsonable(answer)}
+
+
+def stream_steps(instance, task: str, report: Callable[[Dict[str, Any]], None]) -> Any:
+    """Run a CodeAgent step by step, reporting each step, and return its final answer
+
+    report is usually RunControl.report; an exception from it stops the agent
+    before its next step.
+    """
+    from smolagents.agents import AgentStep
+
+    tool_names = _tool_names(instance)
+    steps = instance.run(task, stream=True)
+    answer = None
+    try:
+        for item in steps:
+            if isinstance(item, AgentStep):
+                report(step_event(item, tool_names))
+            else:
+                answer = item
+    finally:
+        steps.close()
+    report(final_answer_event(answer))
+    return answer
+
+
+class ExecutionEngine:
+    """Runs agent tasks on a bounded worker pool and tracks them by run id
+
+    The runner is called as runner(agent_id, task, control=RunControl). A
+    watchdog thread cancels runs that pass their deadline, which kills them
+    outright on backends that register a kill hook. Runs only reach the worker
+    pool once the admission controller grants them a slot, so runs waiting on
+    a busy agent never tie up a worker thread.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[..., Any],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+        default_timeout: Optional[float] = DEFAULT_RUN_TIMEOUT,
+        watchdog_interval: float = WATCHDOG_INTERVAL,
+        admission: Optional[AdmissionController] = None
+    ):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self.default_timeout = default_timeout
+        self.watchdog_interval = watchdog_interval
+        self.admission = admission or AdmissionController(max_inflight=max_workers, max_pending=max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-run")
+        self._runs: "OrderedDict[str, AgentRun]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._controls: Dict[str, RunControl] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self.timed_out = 0
+
+    def submit(self, agent_id: str, task: str, user_id: Optional[str] = None,
+               on_step: Optional[Callable[[Dict[str, Any]], None]] = None,
+               timeout: Optional[float] = None, owner_id: Optional[str] = None,
+               priority: str = DEFAULT_PRIORITY) -> AgentRun:
+        """Accept a run and return immediately; the task executes on a worker
+
+        on_step, if given, streams the run: it is called from the worker thread
+        with each step as it completes. timeout caps the run's wall-clock time
+        from now, and can only tighten the engine's default. owner_id is the
+        agent's owner, for per-owner limits, and priority the scheduling class
+        the run competes for slots in. Raises an AdmissionError
+        (EngineBusyError or RateLimitedError) if the run is shed.
+        """
+        timeouts = [t for t in (timeout, self.default_timeout) if t]
+        control = RunControl(timeout=min(timeouts) if timeouts else None, on_step=on_step)
+        run = AgentRun(
+            id=f"run_{uuid.uuid4().hex}",
+            agent_id=agent_id,
+            task=task,
+            user_id=user_id,
+            owner_id=owner_id,
+            timeout=control.timeout,
+            priority=priority
+        )
+
+        with self._lock:
+            start = self.admission.admit(run.id, agent_id, owner_id, user_id=user_id, priority=priority)
+            self._pending += 1
+            self._runs[run.id] = run
+            self._controls[run.id] = control
+            self._futures[run.id] = Future()
+            self._prune()
+        if start:
+            self._dispatch(run.id)
+        self._start_watchdog()
+
+        logger.info(f"Run {run.id} queued for agent {agent_id}")
+        return run
+
+    def cancel(self, run_id: str, reason: str = "Run cancelled") -> bool:
+        """Cancel a queued or running run; False if it already finished"""
+        with self._lock:
+            control = self._controls.get(run_id)
+        if control is None:
+            return False
+        cancelled = control.cancel(RunCancelledError(reason))
+        self._drop_waiting(run_id)
+        return cancelled
+
+    def cancel_agent(self, agent_id: str, reason: str = "Agent stopped") -> int:
+        """Cancel every unfinished run of an agent, returning how many were cancelled"""
+        with self._lock:
+            run_ids = [run_id for run_id, run in self._runs.items()
+                       if run.agent_id == agent_id and run_id in self._controls]
+        return sum(self.cancel(run_id, reason) for run_id in run_ids)
+
+    def add_done_callback(self, run: Union[str, AgentRun], callback: Callable[[AgentRun], None]) -> None:
+        """Call callback with the run once it finishes, from the thread that finished it"""
+        run, future = self._lookup(run)
+        if future is None:
+            callback(run)
+            return
+        future.add_done_callback(lambda _: callback(run))
+
+    def get(self, run_id: str) -> Optional[AgentRun]:
+        """Look up a run by id"""
+        return self._runs.get(run_id)
+
+    def wait(self, run: Union[str, AgentRun], timeout: Optional[float] = None) -> AgentRun:
+        """Block until the run finishes or the timeout elapses, then return it
+
+        Pass the AgentRun itself where it is at hand: a finished run can drop
+        out of history before it is looked up again by id.
+        """
+        run, future = self._lookup(run)
+        if future is None:
+            return run
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            pass
+        return run
+
+    async def wait_async(self, run: Union[str, AgentRun], timeout: Optional[float] = None) -> AgentRun:
+        """Await the run without blocking the event loop; a timeout leaves the run going"""
+        run, future = self._lookup(run)
+        if future is None:
+            return run
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return run
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of engine load"""
+        with self._lock:
+            counts = {status.value: 0 for status in RunStatus}
+            for run in self._runs.values():
+                counts[run.status.value] += 1
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "default_timeout": self.default_timeout,
+                "timed_out": self.timed_out,
+                "runs": counts,
+                "admission": self.admission.stats()
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting runs and release the worker pool"""
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+
+    def _dispatch(self, run_id: str) -> None:
+        """Hand a run that holds an admission slot to the worker pool"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            control = self._controls.get(run_id)
+        if self._stopped.is_set():
+            return
+        if run is None or control is None:
+            # Finished elsewhere; pass the slot on
+            for next_id in self.admission.release(run_id):
+                self._dispatch(next_id)
+            return
+        self._executor.submit(self._execute, run, control)
+
+    def _drop_waiting(self, run_id: str) -> None:
+        """Finish a cancelled or expired run that never left the admission queue"""
+        if not self.admission.discard(run_id):
+            return
+        with self._lock:
+            run = self._runs.get(run_id)
+            control = self._controls.get(run_id)
+        if run is not None and control is not None:
+            self._execute(run, control, admitted=False)
+
+    def _execute(self, run: AgentRun, control: RunControl, admitted: bool = True) -> AgentRun:
+        run.status = RunStatus.RUNNING
+        run.started_at = datetime.now()
+        try:
+            # Cancelled or out of time while still queued
+            control.check()
+            run.result = self.runner(run.agent_id, run.task, control=control)
+            run.status = RunStatus.SUCCEEDED
+        except RunTimeoutError as e:
+            run.error = str(e)
+            run.status = RunStatus.TIMED_OUT
+            logger.warning(f"Run {run.id} timed out: {str(e)}")
+        except RunCancelledError as e:
+            run.error = str(e)
+            run.status = RunStatus.CANCELLED
+            logger.info(f"Run {run.id} cancelled: {str(e)}")
+        except Exception as e:
+            run.error = str(e)
+            run.status = RunStatus.FAILED
+            logger.error(f"Run {run.id} failed: {str(e)}")
+        finally:
+            run.steps = control.steps
+            run.tool_calls = control.tool_calls
+            run.finished_at = datetime.now()
+            with self._lock:
+                self._pending -= 1
+                self._controls.pop(run.id, None)
+                future = self._futures.get(run.id)
+                if run.status == RunStatus.TIMED_OUT:
+                    self.timed_out += 1
+            if future is not None and not future.done():
+                future.set_result(run)
+            if admitted:
+                for next_id in self.admission.release(run.id):
+                    self._dispatch(next_id)
+        return run
+
+    def _start_watchdog(self) -> None:
+        with self._lock:
+            if self._watchdog is None and not self._stopped.is_set():
+                self._watchdog = threading.Thread(target=self._watch, name="agent-run-watchdog", daemon=True)
+                self._watchdog.start()
+
+    def _watch(self) -> None:
+        """Expire runs past their deadline even while a step is still executing"""
+        while not self._stopped.wait(self.watchdog_interval):
+            with self._lock:
+                controls = list(self._controls.items())
+            for run_id, control in controls:
+                if control.expired():
+                    control.expire()
+                    self._drop_waiting(run_id)
+
+    def _lookup(self, run: Union[str, AgentRun]):
+        """(run, future) for a run; the future is None for a given run that finished and was pruned"""
+        run_id = run if isinstance(run, str) else run.id
+        with self._lock:
+            known = self._runs.get(run_id)
+            future = self._futures.get(run_id)
+        if known is not None and future is not None:
+            return known, future
+        # Only finished runs are pruned, so a given run missing from history is done
+        if not isinstance(run, str) and run.status.is_terminal:
+            return run, None
+        raise ValueError(f"Run {run_id} not found")
+
+    def _prune(self) -> None:
+        """Forget the oldest finished runs once history exceeds its bound"""
+        excess = len(self._runs) - self.history_size
+        if excess <= 0:
+            return
+        for run_id in [rid for rid, run in self._runs.items() if run.status.is_terminal][:excess]:
+            del self._runs[run_id]
+            self._futures.pop(run_id, None)
@@ -0,0 +1,215 @@
+import random
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from .models.gamification import LeaderboardEntry
+
+# Categories tracked for every agent; "performance" currently mirrors tasks completed
+LEADERBOARD_CATEGORIES = ("earnings", "rating", "tasks", "performance")
+
+# Enough levels for ~16M entries at p=0.5
+MAX_LEVELS = 24
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * levels
+        # Positions skipped when following next[level]
+        self.width: List[int] = [1] * levels
+
+
+class _IndexableSkiplist:
+    """Sorted keys with O(log n) insert, remove, rank and positional lookup"""
+
+    def __init__(self):
+        self.size = 0
+        self.head = _Node(None, MAX_LEVELS)
+
+    def insert(self, key) -> None:
+        chain = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key) -> None:
+        chain = [None] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> int:
+        """Zero-based position of key; the key must be present"""
+        position = 0
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.key != key:
+            raise KeyError(key)
+        return position - 1
+
+    def iter_from(self, index: int) -> Iterator:
+        """Keys in order starting at a zero-based position"""
+        if index >= self.size:
+            return
+        remaining = index + 1
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    @staticmethod
+    def _random_levels() -> int:
+        levels = 1
+        while levels < MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+
+class Leaderboard:
+    """One agent per entry, ordered by score descending with agent id as tie-breaker"""
+
+    def __init__(self, category: str):
+        self.category = category
+        self._scores: Dict[str, Tuple[float, datetime]] = {}
+        self._index = _IndexableSkiplist()
+        self._lock = threading.Lock()
+
+    def upsert(self, agent_id: str, score: float) -> int:
+        """Set an agent's score and return its 1-based rank"""
+        score = float(score or 0)
+        with self._lock:
+            current = self._scores.get(agent_id)
+            if current is None or current[0] != score:
+                if current is not None:
+                    self._index.remove(self._key(agent_id, current[0]))
+                self._index.insert(self._key(agent_id, score))
+            self._scores[agent_id] = (score, datetime.now())
+            return self._index.rank(self._key(agent_id, score)) + 1
+
+    def remove(self, agent_id: str) -> bool:
+        with self._lock:
+            current = self._scores.pop(agent_id, None)
+            if current is None:
+                return False
+            self._index.remove(self._key(agent_id, current[0]))
+            return True
+
+    def rank(self, agent_id: str) -> Optional[int]:
+        """1-based rank of an agent, or None if it has no entry"""
+        with self._lock:
+            current = self._scores.get(agent_id)
+            if current is None:
+                return None
+            return self._index.rank(self._key(agent_id, current[0])) + 1
+
+    def get(self, agent_id: str) -> Optional[LeaderboardEntry]:
+        with self._lock:
+            current = self._scores.get(agent_id)
+            if current is None:
+                return None
+            rank = self._index.rank(self._key(agent_id, current[0])) + 1
+            return self._entry(agent_id, rank)
+
+    def page(self, offset: int = 0, limit: int = 100) -> List[LeaderboardEntry]:
+        """Entries ranked offset+1 .. offset+limit"""
+        entries = []
+        with self._lock:
+            for position, (_, agent_id) in enumerate(self._index.iter_from(offset)):
+                if position >= limit:
+                    break
+                entries.append(self._entry(agent_id, offset + position + 1))
+        return entries
+
+    def __len__(self) -> int:
+        return self._index.size
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self._scores
+
+    def __iter__(self) -> Iterator[LeaderboardEntry]:
+        return iter(self.page(0, len(self)))
+
+    def _entry(self, agent_id: str, rank: int) -> LeaderboardEntry:
+        score, timestamp = self._scores[agent_id]
+        return LeaderboardEntry(
+            agent_id=agent_id,
+            score=score,
+            category=self.category,
+            timestamp=timestamp,
+            rank=rank
+        )
+
+    @staticmethod
+    def _key(agent_id: str, score: float):
+        return (-score, agent_id)
+
+
+class LeaderboardRegistry:
+    """The per-category leaderboards kept by the framework"""
+
+    def __init__(self, categories=LEADERBOARD_CATEGORIES):
+        self._boards: Dict[str, Leaderboard] = {category: Leaderboard(category) for category in categories}
+
+    def upsert(self, agent_id: str, scores: Dict[str, float]) -> Dict[str, int]:
+        """Update an agent across categories, returning its new rank in each"""
+        return {category: self._boards[category].upsert(agent_id, score) for category, score in scores.items()}
+
+    def remove_agent(self, agent_id: str) -> None:
+        for board in self._boards.values():
+            board.remove(agent_id)
+
+    def ranks(self, agent_id: str) -> Dict[str, Optional[int]]:
+        return {category: board.rank(agent_id) for category, board in self._boards.items()}
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._boards)
+
+    def get(self, category: str) -> Optional[Leaderboard]:
+        return self._boards.get(category)
+
+    def __getitem__(self, category: str) -> Leaderboard:
+        return self._boards[category]
+
+    def __contains__(self, category: str) -> bool:
+        return category in self._boards
@@ -0,0 +1,443 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from .metrics import LatencyHistogram
+from .models.marketplace import (
+    MarketplaceListing as Listing, Rental, Transaction, PricingModel,
+    DBListing, DBRental, DBTransaction
+)
+
+logger = logging.getLogger(__name__)
+
+MARKETPLACE_FLUSH_INTERVAL = float(os.getenv("MARKETPLACE_FLUSH_INTERVAL", "0.5"))  # seconds
+MARKETPLACE_FLUSH_BATCH = int(os.getenv("MARKETPLACE_FLUSH_BATCH", "500"))
+MARKETPLACE_CACHE_SIZE = int(os.getenv("MARKETPLACE_CACHE_SIZE", "10000"))
+MARKETPLACE_CACHE_TTL = float(os.getenv("MARKETPLACE_CACHE_TTL", "30"))  # seconds
+# Flushes a requeued row may fail before it is abandoned
+MARKETPLACE_MAX_RETRIES = int(os.getenv("MARKETPLACE_MAX_RETRIES", "5"))
+
+
+def _listing_row(listing: Listing) -> dict:
+    return {
+        "id": listing.id,
+        "agent_id": listing.agent_id,
+        "seller_id": listing.seller_id,
+        "type": listing.type,
+        "base_price": listing.pricing.base_price,
+        "usage_fee": listing.pricing.usage_fee,
+        "subscription_fee": listing.pricing.subscription_fee,
+        "duration": listing.pricing.duration,
+        "created_at": listing.created_at,
+        "status": listing.status
+    }
+
+def listing_from_row(row: DBListing) -> Listing:
+    return Listing(
+        id=row.id,
+        agent_id=row.agent_id,
+        seller_id=row.seller_id,
+        type=row.type,
+        pricing=PricingModel(
+            base_price=row.base_price,
+            usage_fee=row.usage_fee,
+            subscription_fee=row.subscription_fee,
+            duration=row.duration
+        ),
+        created_at=row.created_at,
+        status=row.status
+    )
+
+def _rental_row(rental: Rental) -> dict:
+    return {
+        "id": rental.id,
+        "listing_id": rental.listing_id,
+        "agent_id": rental.agent_id,
+        "renter_id": rental.renter_id,
+        "start_time": rental.start_time,
+        "end_time": rental.end_time,
+        "usage_count": rental.usage_count,
+        "status": rental.status
+    }
+
+def rental_from_row(row: DBRental) -> Rental:
+    return Rental(
+        id=row.id,
+        listing_id=row.listing_id,
+        renter_id=row.renter_id,
+        start_time=row.start_time,
+        end_time=row.end_time,
+        usage_count=row.usage_count or 0,
+        status=row.status,
+        agent_id=row.agent_id
+    )
+
+def _transaction_row(transaction: Transaction) -> dict:
+    return {
+        "id": transaction.id,
+        "listing_id": transaction.listing_id,
+        "buyer_id": transaction.buyer_id,
+        "seller_id": transaction.seller_id,
+        "amount": transaction.amount,
+        "type": transaction.type,
+        "timestamp": transaction.timestamp
+    }
+
+def transaction_from_row(row: DBTransaction) -> Transaction:
+    return Transaction(
+        id=row.id,
+        listing_id=row.listing_id,
+        buyer_id=row.buyer_id,
+        seller_id=row.seller_id,
+        amount=row.amount,
+        type=row.type,
+        timestamp=row.timestamp
+    )
+
+
+class StoredCollection:
+    """Dict-like view of one marketplace table
+
+    Writes land in a pending buffer that the store flushes in batches; reads
+    check pending writes, then a TTL-bounded LRU cache, then the table.
+    """
+
+    def __init__(self, store: "MarketplaceStore", name: str, model, to_row: Callable, from_row: Callable,
+                 retry_failed: bool = False):
+        self.name = name
+        self.model = model
+        # Rows that fail to write go back in the buffer instead of being dropped
+        self.retry_failed = retry_failed
+        self._store = store
+        self._to_row = to_row
+        self._from_row = from_row
+        # id -> (is_insert, object), in write order
+        self._pending: "OrderedDict[str, Tuple[bool, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[bool, Any]] = {}
+        self._cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # id -> failed writes of a requeued row
+        self._attempts: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, obj) -> None:
+        """Buffer a new row"""
+        self._store._enqueue(self, obj, insert=True)
+
+    def save(self, obj) -> None:
+        """Buffer the current state of an existing row"""
+        self._store._enqueue(self, obj, insert=False)
+
+    def update(self, key: str, **changes):
+        """Apply changes to an existing row and buffer it, returning the row
+
+        Raises KeyError if there is no such row.
+        """
+        obj = self[key]
+        for field, value in changes.items():
+            if not hasattr(obj, field):
+                raise ValueError(f"Unknown {self.name} field: {field}")
+            setattr(obj, field, value)
+        self.save(obj)
+        return obj
+
+    def get(self, key: str, default=None):
+        with self._store._lock:
+            buffered = self._pending.get(key) or self._inflight.get(key)
+            if buffered is not None:
+                return buffered[1]
+            cached = self._cache.get(key)
+            if cached is not None and cached[1] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        with self._store._session() as db:
+            row = db.query(self.model).filter(self.model.id == key).first()
+        if row is None:
+            return default
+        obj = self._from_row(row)
+        with self._store._lock:
+            # A write that raced the read wins
+            buffered = self._pending.get(key) or self._inflight.get(key)
+            if buffered is not None:
+                return buffered[1]
+            self._remember(obj)
+        return obj
+
+    def values(self) -> List[Any]:
+        """Rows this process has buffered or still caches, not the whole table
+
+        Listing the table goes through a paginated query such as
+        AsyncDBOperations.page_listings.
+        """
+        now = time.monotonic()
+        with self._store._lock:
+            objects = {key: obj for key, (obj, expires) in self._cache.items() if expires > now}
+            for buffer in (self._inflight, self._pending):
+                for key, (_, obj) in buffer.items():
+                    objects[key] = obj
+        return list(objects.values())
+
+    def __getitem__(self, key: str):
+        obj = self.get(key)
+        if obj is None:
+            raise KeyError(key)
+        return obj
+
+    def __setitem__(self, key: str, obj) -> None:
+        if key != obj.id:
+            raise ValueError(f"Key {key} does not match id {obj.id}")
+        self.add(obj)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([obj.id for obj in self.values()])
+
+    def __len__(self) -> int:
+        return len(self.values())
+
+    def _remember(self, obj) -> None:
+        self._cache[obj.id] = (obj, time.monotonic() + self._store.cache_ttl)
+        self._cache.move_to_end(obj.id)
+        while len(self._cache) > self._store.cache_size:
+            self._cache.popitem(last=False)
+
+
+class MarketplaceStore:
+    """Write-behind persistence for listings, rentals and transactions
+
+    A background thread flushes buffered writes with bulk insert/update
+    mappings, one commit per batch instead of one per marketplace event.
+    """
+
+    def __init__(self, session_factory: Callable[[], ContextManager[Session]],
+                 flush_interval: float = MARKETPLACE_FLUSH_INTERVAL,
+                 batch_size: int = MARKETPLACE_FLUSH_BATCH,
+                 cache_size: int = MARKETPLACE_CACHE_SIZE,
+                 cache_ttl: float = MARKETPLACE_CACHE_TTL,
+                 max_retries: int = MARKETPLACE_MAX_RETRIES,
+                 on_flush: Optional[Callable[[List[str]], None]] = None):
+        self._session = session_factory
+        # Called with the names of the collections a flush wrote to
+        self._on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_retries = max_retries
+        # Flushed in this order so foreign keys resolve within a batch
+        self.listings = StoredCollection(self, "listings", DBListing, _listing_row, listing_from_row)
+        self.rentals = StoredCollection(self, "rentals", DBRental, _rental_row, rental_from_row)
+        # Money changed hands, so a transaction that fails to write is retried rather than lost
+        self.transactions = StoredCollection(self, "transactions", DBTransaction, _transaction_row, transaction_from_row,
+                                             retry_failed=True)
+        self._collections = (self.listings, self.rentals, self.transactions)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flush_latency = LatencyHistogram()
+        self.flushed = 0
+        self.dropped = 0
+        self.requeued = 0
+        self.abandoned = 0
+        self.flush_errors = 0
+
+    def active_rentals(self) -> List[Rental]:
+        """Every persisted rental still marked active"""
+        with self._session() as db:
+            rows = db.query(DBRental).filter(DBRental.status == "active").all()
+        rentals = [rental_from_row(row) for row in rows]
+        with self._lock:
+            for rental in rentals:
+                self.rentals._remember(rental)
+        return rentals
+
+    def sell_listing(self, listing_id: str) -> bool:
+        """Mark an active listing sold, returning False if it was no longer active
+
+        Decided by one conditional UPDATE in the database, so concurrent
+        buyers in this or another process can't both win. A buffered write
+        of the listing is flushed first so the row is there to update.
+        """
+        with self._lock:
+            buffered = listing_id in self.listings._pending or listing_id in self.listings._inflight
+        if buffered:
+            self.flush()
+        with self._session() as db:
+            result = db.execute(
+                update(DBListing)
+                .where(DBListing.id == listing_id, DBListing.status == "active")
+                .values(status="sold")
+            )
+            db.commit()
+        sold = result.rowcount == 1
+        with self._lock:
+            if not sold:
+                # The cached copy still reads as active; the next read goes to the table
+                self.listings._cache.pop(listing_id, None)
+                return False
+            # Keep a buffered or cached copy from writing or serving the old status
+            for buffer in (self.listings._pending, self.listings._inflight):
+                if listing_id in buffer:
+                    buffer[listing_id][1].status = "sold"
+            cached = self.listings._cache.get(listing_id)
+            if cached is not None:
+                cached[0].status = "sold"
+        return True
+
+    def flush(self) -> int:
+        """Write every buffered row, returning how many were persisted"""
+        with self._flush_lock:
+            with self._lock:
+                batches = []
+                for collection in self._collections:
+                    collection._inflight, collection._pending = collection._pending, OrderedDict()
+                    batches.append((collection, collection._inflight))
+            if not any(batch for _, batch in batches):
+                return 0
+
+            start = time.perf_counter()
+            failed = set()
+            try:
+                failed = self._write(batches)
+            finally:
+                with self._lock:
+                    for collection, batch in batches:
+                        for key, (is_insert, obj) in batch.items():
+                            if (collection.name, key) not in failed:
+                                collection._attempts.pop(key, None)
+                                collection._remember(obj)
+                            elif collection.retry_failed:
+                                self._requeue(collection, key, is_insert, obj)
+                            else:
+                                self.dropped += 1
+                                collection._cache.pop(key, None)
+                                logger.error(f"Dropping {collection.name} row {key}")
+                        collection._inflight = {}
+                self.flush_latency.observe(time.perf_counter() - start)
+            written = sum(len(batch) for _, batch in batches) - len(failed)
+            self.flushed += written
+            if self._on_flush is not None:
+                self._on_flush([collection.name for collection, batch in batches if batch])
+            return written
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = threading.Thread(target=self._run, name="marketplace-flush", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write anything still buffered"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            unwritten = sum(len(collection._pending) for collection in self._collections)
+        if unwritten:
+            logger.error(f"Marketplace store stopped with {unwritten} rows it could not write")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            collections = {
+                collection.name: {
+                    "pending": len(collection._pending),
+                    "cached": len(collection._cache),
+                    "cache_hits": collection.hits,
+                    "cache_misses": collection.misses
+                }
+                for collection in self._collections
+            }
+        return {
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "requeued": self.requeued,
+            "abandoned": self.abandoned,
+            "flush_errors": self.flush_errors,
+            "flush_latency": self.flush_latency.snapshot(),
+            "collections": collections
+        }
+
+    def _enqueue(self, collection: StoredCollection, obj, insert: bool) -> None:
+        with self._lock:
+            previous = collection._pending.get(obj.id)
+            # An update to a row whose insert hasn't been flushed is still an insert
+            collection._pending[obj.id] = (insert or (previous is not None and previous[0]), obj)
+            collection._remember(obj)
+            pending = sum(len(c._pending) for c in self._collections)
+        self.start()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def _requeue(self, collection: StoredCollection, key: str, is_insert: bool, obj) -> None:
+        """Put a failed row back for the next flush; a newer buffered write of it wins, as an insert if this was one
+
+        A row that has failed max_retries times is abandoned instead.
+        """
+        attempts = collection._attempts.get(key, 0) + 1
+        if attempts > self.max_retries:
+            collection._attempts.pop(key, None)
+            collection._cache.pop(key, None)
+            self.abandoned += 1
+            logger.error(f"Abandoning {collection.name} row {key} after {attempts} failed writes: {obj!r}")
+            return
+        collection._attempts[key] = attempts
+        newer = collection._pending.get(key)
+        collection._pending[key] = (is_insert or newer[0], newer[1]) if newer is not None else (is_insert, obj)
+        self.requeued += 1
+        logger.warning(f"Requeued {collection.name} row {key} for the next flush")
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Marketplace flush failed: {str(e)}")
+
+    def _write(self, batches) -> set:
+        """Persist the batches, returning (collection name, id) of rows that could not be written"""
+        try:
+            with self._session() as db:
+                for collection, batch in batches:
+                    self._write_batch(db, collection, list(batch.values()))
+                db.commit()
+                return set()
+        except Exception as e:
+            self.flush_errors += 1
+            logger.warning(f"Marketplace batch write failed, retrying rows individually: {str(e)}")
+
+        # Isolate bad rows so one constraint violation doesn't block the rest
+        failed = set()
+        for collection, batch in batches:
+            for key, entry in batch.items():
+                try:
+                    with self._session() as db:
+                        self._write_batch(db, collection, [entry])
+                        db.commit()
+                except Exception as e:
+                    failed.add((collection.name, key))
+                    logger.error(f"Could not write {collection.name} row {key}: {str(e)}")
+        return failed
+
+    @staticmethod
+    def _write_batch(db: Session, collection: StoredCollection, entries: List[Tuple[bool, Any]]) -> None:
+        inserts = [collection._to_row(obj) for is_insert, obj in entries if is_insert]
+        updates = [collection._to_row(obj) for is_insert, obj in entries if not is_insert]
+        if inserts:
+            db.bulk_insert_mappings(collection.model, inserts)
+        if updates:
+            db.bulk_update_mappings(collection.model, updates)
@@ -0,0 +1,62 @@
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence
+
+# Upper bounds in milliseconds; the last bucket catches everything above
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket latency histogram"""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(sorted(buckets_ms))
+        self._counts: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Record one duration given in seconds"""
+        ms = seconds * 1000
+        index = bisect.bisect_left(self.buckets_ms, ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum_ms += ms
+            if ms > self._max_ms:
+                self._max_ms = ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bucket bound (ms) below which p percent of observations fall"""
+        with self._lock:
+            if not self._count:
+                return None
+            target = self._count * p / 100
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= target:
+                    return self.buckets_ms[index] if index < len(self.buckets_ms) else self._max_ms
+            return self._max_ms
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> Dict[str, object]:
+        """Counts per bucket plus summary statistics"""
+        with self._lock:
+            buckets = {f"le_{bound:g}ms": count for bound, count in zip(self.buckets_ms, self._counts)}
+            buckets["inf"] = self._counts[-1]
+            count, sum_ms, max_ms = self._count, self._sum_ms, self._max_ms
+        return {
+            "count": count,
+            "avg_ms": sum_ms / count if count else 0.0,
+            "max_ms": max_ms,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": buckets
+        }
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from pydantic import BaseModel
-from sqlalchemy import Column, String, Integer, Float, JSON, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, Float, JSON, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -12,7 +12,11 @@ class AgentConfig(BaseModel):
     tools: List[str] = []
     model: str
     allowed_imports: List[str] = []
-    metadata: Dict[str, str] = {}
+    metadata: Dict[str, Any] = {}
+    # Run limits; None falls back to the engine defaults
+    max_run_seconds: Optional[float] = None
+    max_steps: Optional[int] = None
+    max_tool_calls: Optional[int] = None
 
 class AgentState(BaseModel):
     """Current state of an agent"""
@@ -39,6 +43,10 @@ class Agent(BaseModel):
 class DBAgent(Base):
     """Database model for agents"""
     __tablename__ = "agents"
+    __table_args__ = (
+        # Serves owner and visibility filters on the paginated agent list
+        Index("ix_agents_owner_id_is_listed", "owner_id", "is_listed"),
+    )
 
     id = Column(String, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -48,6 +56,9 @@ class DBAgent(Base):
     model = Column(String, nullable=False)
     allowed_imports = Column(JSON, default=list)
     agent_metadata = Column(JSON, default=dict)
+    max_run_seconds = Column(Float, nullable=True)
+    max_steps = Column(Integer, nullable=True)
+    max_tool_calls = Column(Integer, nullable=True)
     price_model = Column(String, nullable=False, default="free")  # free, rental, purchase
     price = Column(Float, default=0.0)
     is_listed = Column(Integer, default=0)  # 0=private, 1=public
@@ -62,6 +73,81 @@ class DBAgent(Base):
     rentals = relationship("DBRental", back_populates="agent")
     stats = relationship("DBAgentStats", uselist=False, back_populates="agent")
 
+    @property
+    def config(self) -> AgentConfig:
+        """The columns that configure the agent, as the framework consumes them"""
+        return AgentConfig(
+            name=self.name,
+            description=self.description,
+            tools=self.tools or [],
+            model=self.model,
+            allowed_imports=self.allowed_imports or [],
+            metadata=self.agent_metadata or {},
+            max_run_seconds=self.max_run_seconds,
+            max_steps=self.max_steps,
+            max_tool_calls=self.max_tool_calls
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "owner_id": self.owner_id,
+            "tools": self.tools,
+            "model": self.model,
+            "allowed_imports": self.allowed_imports,
+            "agent_metadata": self.agent_metadata,
+            "max_run_seconds": self.max_run_seconds,
+            "max_steps": self.max_steps,
+            "max_tool_calls": self.max_tool_calls,
+            "price_model": self.price_model,
+            "price": self.price,
+            "is_listed": bool(self.is_listed),
+            "trust_score": self.trust_score,
+            "usage_count": self.usage_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def to_summary_dict(self) -> dict:
+        """List view of the agent: no JSON columns, headline stats inlined
+
+        Expects the summary load profile, which defers the JSON columns and
+        joins the stats row.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "owner_id": self.owner_id,
+            "model": self.model,
+            "price_model": self.price_model,
+            "price": self.price,
+            "is_listed": bool(self.is_listed),
+            "trust_score": self.trust_score,
+            "usage_count": self.usage_count,
+            "tasks_completed": self.stats.tasks_completed if self.stats else 0,
+            "rating": self.stats.rating if self.stats else 0.0,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def to_detail_dict(self) -> dict:
+        """Full agent with its stats, owner and marketplace records; expects the detail load profile"""
+        return {
+            **self.to_dict(),
+            "owner": self.owner.username if self.owner else None,
+            "stats": {
+                "tasks_completed": self.stats.tasks_completed,
+                "earnings": self.stats.earnings,
+                "rating": self.stats.rating,
+                "last_active": self.stats.last_active.isoformat() if self.stats.last_active else None
+            } if self.stats else None,
+            "listing_ids": [listing.id for listing in self.listings],
+            "active_rentals": sum(1 for rental in self.rentals if rental.status == "active")
+        }
+
 class DBAgentStats(Base):
     """Database model for agent statistics"""
     __tablename__ = "agent_stats"
@@ -70,7 +156,8 @@ class DBAgentStats(Base):
     agent_id = Column(String, ForeignKey("agents.id"), unique=True)
     tasks_completed = Column(Integer, default=0)
     earnings = Column(Float, default=0.0)
-    rating = Column(Float, default=0.0)
+    rating = Column(Float, default=0.0)  # average of rating_count ratings
+    rating_count = Column(Integer, default=0)
     last_active = Column(DateTime)
 
     # Relationships
@@ -82,7 +169,8 @@ class DBAgentState(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     agent_id = Column(String, ForeignKey("agents.id"), unique=True)
-    state = Column(String, nullable=False)
+    # Named like AgentState.status; the column keeps its original name
+    status = Column("state", String, nullable=False)
     last_updated = Column(DateTime, nullable=False)
 
     # Relationships
@@ -1,8 +1,15 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from .base import Base
 from .user import DBUser
+from ..metrics import LatencyHistogram
 
 # Use Supabase URL from environment variables or fallback to SQLite
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -11,9 +18,129 @@ if not SUPABASE_URL:
 
 SQLALCHEMY_DATABASE_URL = SUPABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool settings (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+class PoolMetrics:
+    """Checkout wait times and saturation for the engine's connection pool"""
+
+    def __init__(self):
+        self.checkout_wait = LatencyHistogram()
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkout_timeouts = 0
+        self.capacity = None
+        self._lock = threading.Lock()
+
+    def on_checkout(self):
+        with self._lock:
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def on_timeout(self):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            checked_out, peak, timeouts = self.checked_out, self.peak_checked_out, self.checkout_timeouts
+        return {
+            "checked_out": checked_out,
+            "peak_checked_out": peak,
+            "capacity": self.capacity,
+            "saturation": checked_out / self.capacity if self.capacity else None,
+            "checkout_timeouts": timeouts,
+            "checkout_wait": self.checkout_wait.snapshot()
+        }
+
+pool_metrics = PoolMetrics()
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.on_timeout()
+            raise
+        finally:
+            pool_metrics.checkout_wait.observe(time.perf_counter() - start)
+
+def _create_engine(database_url):
+    """Create an engine with pool settings suited to its backend"""
+    if database_url.startswith("sqlite"):
+        return create_engine(database_url, connect_args={"check_same_thread": False})
+
+    pool_metrics.capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    return create_engine(
+        database_url,
+        poolclass=MeteredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+
+def _instrument(target_engine):
+    event.listen(target_engine, "checkout", lambda *args: pool_metrics.on_checkout())
+    event.listen(target_engine, "checkin", lambda *args: pool_metrics.on_checkin())
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+_instrument(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers used for the API hot paths, keyed by the sync URL's backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def _async_url(database_url):
+    """Translate a sync database URL to its asyncio driver equivalent"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def _create_async_engine(database_url):
+    """Create an asyncio engine mirroring the sync engine's pool settings"""
+    url = _async_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return create_async_engine(url)
+
+    return create_async_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING
+    )
+
+# Created on first use so scripts without an async driver installed still import
+async_engine = None
+AsyncSessionLocal = sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def get_async_engine():
+    global async_engine
+    if async_engine is None:
+        async_engine = _create_async_engine(engine.url)
+        AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
 class Database:
     def __init__(self):
         self.engine = engine
@@ -29,22 +156,42 @@ class Database:
 
 def init_db(database_url=None):
     """Initialize the database by creating all tables
-    
+
     Args:
         database_url: Optional database URL to use instead of default
     """
+    global engine, async_engine
     if database_url:
-        global engine
-        engine = create_engine(
-            database_url, connect_args={"check_same_thread": False}
-        )
+        engine = _create_engine(database_url)
+        _instrument(engine)
+        SessionLocal.configure(bind=engine)
+        async_engine = None
         Base.metadata.create_all(bind=engine)
     else:
         Base.metadata.create_all(bind=engine)
 
 def get_db():
+    """FastAPI dependency yielding a session scoped to one request"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+@contextmanager
+def session_scope():
+    """Session for one unit of work outside a request; rolled back on error"""
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def get_async_db():
+    """FastAPI dependency yielding an asyncio session scoped to one request"""
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -5,9 +5,9 @@ This module defines the gamification elements of the platform including
 achievements, badges, and leaderboard tracking.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Set
 from datetime import datetime
 
 class AchievementType(Enum):
@@ -102,18 +102,21 @@ class LeaderboardEntry:
         score: Numerical score/ranking value
         category: What this ranking is for
         timestamp: When this ranking was recorded
+        rank: 1-based position in the category, if known
     """
     agent_id: str
     score: float
     category: str
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = field(default_factory=datetime.now)
+    rank: Optional[int] = None
 
     def to_dict(self) -> dict:
         return {
             "agent_id": self.agent_id,
             "score": self.score,
             "category": self.category,
-            "timestamp": self.timestamp.isoformat()
+            "timestamp": self.timestamp.isoformat(),
+            "rank": self.rank
         }
 
 @dataclass
@@ -123,14 +126,14 @@ class UserProgress:
     
     Attributes:
         user_id: ID of the user
-        achievements: List of earned achievement IDs
+        achievements: Set of earned achievement IDs
         badges: List of earned badge IDs
         total_points: Cumulative points earned
         level: Current user level
         stats: Additional statistics tracking
     """
     user_id: str
-    achievements: List[str]
+    achievements: Set[str]
     badges: List[str]
     total_points: int
     level: int
@@ -139,7 +142,7 @@ class UserProgress:
     def to_dict(self) -> dict:
         return {
             "user_id": self.user_id,
-            "achievements": self.achievements,
+            "achievements": sorted(self.achievements),
             "badges": self.badges,
             "total_points": self.total_points,
             "level": self.level,
@@ -5,13 +5,13 @@ This module defines the data structures for the marketplace functionality,
 including listings, rentals, and transactions.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional, List
 from datetime import datetime
 from sqlalchemy import (
     Column, String, Float, DateTime, Enum as SQLEnum, ForeignKey, 
-    Integer, Boolean, Text
+    Integer, Boolean, Text, Index
 )
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -53,6 +53,11 @@ class PricingModel:
 class DBListing(Base):
     """SQLAlchemy model for marketplace listings"""
     __tablename__ = 'listings'
+    __table_args__ = (
+        # Type/status filters with price sorting, and the default newest-first listing
+        Index('ix_listings_type_status_base_price', 'type', 'status', 'base_price'),
+        Index('ix_listings_status_created_at', 'status', 'created_at'),
+    )
     
     id = Column(String, primary_key=True)
     agent_id = Column(String, ForeignKey('agents.id'))
@@ -90,7 +95,7 @@ class MarketplaceListing:
     seller_id: str
     type: ListingType
     pricing: PricingModel
-    created_at: datetime = datetime.now()
+    created_at: datetime = field(default_factory=datetime.now)
     status: str = "active"
 
     def to_dict(self) -> dict:
@@ -113,8 +118,14 @@ class DBRental(Base):
     """SQLAlchemy model for agent rentals"""
     __tablename__ = 'rentals'
     
+    __table_args__ = (
+        # Serves the active-rental lookup on every agent run
+        Index('ix_rentals_agent_id_status', 'agent_id', 'status'),
+    )
+    
     id = Column(String, primary_key=True)
     listing_id = Column(String, ForeignKey('listings.id'))
+    agent_id = Column(String, ForeignKey('agents.id'))
     renter_id = Column(String, ForeignKey('users.id'))
     start_time = Column(DateTime)
     end_time = Column(DateTime, nullable=True)
@@ -123,6 +134,7 @@ class DBRental(Base):
     
     # Relationships
     listing = relationship("DBListing", back_populates="rentals")
+    agent = relationship("DBAgent", back_populates="rentals")
     renter = relationship("DBUser", back_populates="rentals")
 
 @dataclass
@@ -138,6 +150,7 @@ class Rental:
         end_time: Optional end of rental period
         usage_count: Number of times agent was used
         status: Current status of the rental
+        agent_id: ID of the rented agent
     """
     id: str
     listing_id: str
@@ -146,11 +159,13 @@ class Rental:
     end_time: Optional[datetime] = None
     usage_count: int = 0
     status: str = "active"
+    agent_id: Optional[str] = None
 
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "listing_id": self.listing_id,
+            "agent_id": self.agent_id,
             "renter_id": self.renter_id,
             "start_time": self.start_time.isoformat(),
             "end_time": self.end_time.isoformat() if self.end_time else None,
@@ -195,7 +210,7 @@ class Transaction:
     seller_id: str
     amount: float
     type: ListingType
-    timestamp: datetime = datetime.now()
+    timestamp: datetime = field(default_factory=datetime.now)
 
     def to_dict(self) -> dict:
         return {
@@ -0,0 +1,142 @@
+"""
+Run Module
+
+This module defines the data structures for agent runs submitted to the
+execution engine, and the table backing the durable run queue.
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Optional
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, Float, JSON, ForeignKey, DateTime, Index, Text
+from .database import Base
+
+class RunStatus(Enum):
+    """
+    Lifecycle states of an agent run
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMED_OUT = "timed_out"
+
+    @property
+    def is_terminal(self) -> bool:
+        return self in (RunStatus.SUCCEEDED, RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.TIMED_OUT)
+
+@dataclass
+class AgentRun:
+    """
+    A single task submitted to an agent
+
+    Attributes:
+        id: Unique identifier for the run
+        agent_id: ID of the agent executing the task
+        task: Task prompt given to the agent
+        user_id: ID of the user who submitted the run
+        owner_id: ID of the agent's owner, for per-owner limits
+        status: Current lifecycle state
+        result: Agent output once the run succeeded
+        error: Error message once the run failed
+        timeout: Wall-clock limit in seconds, counted from submission
+        steps: Agent steps taken
+        tool_calls: Tool invocations made by those steps
+        priority: Scheduling class the run was queued under
+        attempts: Times a worker has claimed the run from the durable queue
+        submitted_at: When the run was accepted
+        started_at: When a worker picked the run up
+        finished_at: When the run reached a terminal state
+    """
+    id: str
+    agent_id: str
+    task: str
+    user_id: Optional[str] = None
+    owner_id: Optional[str] = None
+    status: RunStatus = RunStatus.QUEUED
+    result: Any = None
+    error: Optional[str] = None
+    timeout: Optional[float] = None
+    steps: int = 0
+    tool_calls: int = 0
+    priority: str = "public"
+    attempts: int = 0
+    submitted_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "agent_id": self.agent_id,
+            "task": self.task,
+            "user_id": self.user_id,
+            "status": self.status.value,
+            "result": self.result,
+            "error": self.error,
+            "timeout": self.timeout,
+            "steps": self.steps,
+            "tool_calls": self.tool_calls,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class DBRun(Base):
+    """SQLAlchemy model for runs in the durable run queue"""
+    __tablename__ = "runs"
+
+    __table_args__ = (
+        # Claiming scans for runs that are due
+        Index("ix_runs_status_available_at", "status", "available_at"),
+        # Reaping scans for leases that ran out
+        Index("ix_runs_status_lease_expires_at", "status", "lease_expires_at"),
+        # Per-agent queue depth checks on submit
+        Index("ix_runs_agent_id_status", "agent_id", "status"),
+    )
+
+    id = Column(String, primary_key=True)
+    agent_id = Column(String, ForeignKey("agents.id"), nullable=False)
+    owner_id = Column(String, nullable=True)
+    user_id = Column(String, nullable=True)
+    task = Column(Text, nullable=False)
+    priority = Column(String, nullable=False, default="public")
+    status = Column(String, nullable=False, default="queued")
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    timeout = Column(Float, nullable=True)
+    steps = Column(Integer, default=0)
+    tool_calls = Column(Integer, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    cancel_requested = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)  # not claimable before; pushed back by retry backoff
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    submitted_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def to_run(self) -> AgentRun:
+        return AgentRun(
+            id=self.id,
+            agent_id=self.agent_id,
+            task=self.task,
+            user_id=self.user_id,
+            owner_id=self.owner_id,
+            status=RunStatus(self.status),
+            result=self.result,
+            error=self.error,
+            timeout=self.timeout,
+            steps=self.steps or 0,
+            tool_calls=self.tool_calls or 0,
+            priority=self.priority,
+            attempts=self.attempts,
+            submitted_at=self.submitted_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at
+        )
@@ -20,6 +20,8 @@ class DBUser(Base):
 
     # Relationships
     agents = relationship("DBAgent", back_populates="owner")
+    listings = relationship("DBListing", back_populates="seller")
+    rentals = relationship("DBRental", back_populates="renter")
 
     def enable_2fa(self):
         """Enable 2FA for the user"""
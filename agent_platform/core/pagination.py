@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from sqlalchemy import and_, or_
+
+# Page size bounds shared by the list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort: str, value: Any, row_id: str) -> str:
+    """Opaque cursor pointing just past (value, row_id) in the given sort"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    payload = json.dumps({"s": sort, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    """Return the (value, row_id) a cursor points past; raises ValueError if it is unusable"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, row_id = payload["v"], payload["id"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, row_id
+
+
+def keyset_page(statement, id_column, sort_column, descending: bool, after: Optional[Tuple[Any, str]], limit: int):
+    """Order a select by (sort_column, id) and resume after a decoded cursor
+
+    Fetches one extra row so the caller can tell whether another page exists.
+    Rows whose sort value is NULL come last in either direction, ordered by
+    id, so a nullable sort column still pages through every row once.
+    """
+    if after is not None:
+        value, last_id = after
+        after_id = id_column < last_id if descending else id_column > last_id
+        if sort_column is id_column:
+            condition = after_id
+        elif value is None:
+            condition = and_(sort_column.is_(None), after_id)
+        else:
+            past = sort_column < value if descending else sort_column > value
+            condition = or_(past, and_(sort_column == value, after_id), sort_column.is_(None))
+        statement = statement.where(condition)
+
+    if descending:
+        statement = statement.order_by(sort_column.desc().nulls_last(), id_column.desc())
+    else:
+        statement = statement.order_by(sort_column.asc().nulls_last(), id_column.asc())
+    return statement.limit(limit + 1)
+
+
+def split_page(rows: List[Any], sort: str, sort_attr: str, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, getattr(last, sort_attr), last.id)
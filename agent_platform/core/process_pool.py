@@ -0,0 +1,271 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+from .execution import RunCancelledError, RunControl, stream_steps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_WORKERS = int(os.getenv("AGENT_PROCESS_WORKERS", str(os.cpu_count() or 2)))
+DEFAULT_MAX_RUNS_PER_WORKER = int(os.getenv("AGENT_WORKER_MAX_RUNS", "200"))
+DEFAULT_MAX_RSS_MB = float(os.getenv("AGENT_WORKER_MAX_RSS_MB", "1024"))
+DEFAULT_WORKER_CACHE_SIZE = int(os.getenv("AGENT_WORKER_CACHE_SIZE", "16"))
+DEFAULT_START_METHOD = os.getenv("AGENT_WORKER_START_METHOD", "spawn")
+
+
+def _current_rss_mb() -> float:
+    """Resident set size of the calling process in megabytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_tools() -> Dict[str, Any]:
+    """Tool registry for a worker process, mirroring AgentFramework's defaults"""
+    from .tools.duckduckgo import DuckDuckGoTool
+    from .tools.voice_tools import TextToSpeechTool, SpeechToTextTool
+
+    tools = [DuckDuckGoTool(), TextToSpeechTool(), SpeechToTextTool()]
+    return {tool.config.name: tool for tool in tools}
+
+
+def _worker_main(conn, cache_size: int) -> None:
+    """Worker loop: receive run specs, execute them and reply with the outcome
+
+    Controlled runs send a ("step", event, None) message per step and wait for
+    the parent to answer True to continue or False to stop.
+    """
+    from smolagents import CodeAgent, HfApiModel
+    from .agent_pool import AgentInstancePool
+
+    available_tools = _worker_tools()
+    instances = AgentInstancePool(max_size=cache_size, ttl=None)
+
+    def build(spec):
+        tools = [available_tools[tool_name].tool_instance for tool_name in spec["tools"]]
+        return CodeAgent(
+            tools=tools,
+            model=HfApiModel(),
+            additional_authorized_imports=spec["allowed_imports"],
+            max_iterations=spec["max_steps"]
+        )
+
+    def relay(event):
+        conn.send(("step", event, None))
+        if not conn.recv():
+            raise RunCancelledError("Run cancelled")
+
+    while True:
+        try:
+            spec = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if spec is None:
+            break
+
+        try:
+            with instances.lease(spec["agent_id"], spec["version"], lambda: build(spec)) as instance:
+                if spec.get("stream"):
+                    result = stream_steps(instance, spec["task"], relay)
+                else:
+                    result = instance.run(spec["task"])
+            reply = ("ok", result)
+        except RunCancelledError as e:
+            reply = ("cancelled", str(e))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {str(e)}")
+
+        try:
+            conn.send(reply + (_current_rss_mb(),))
+        except Exception:
+            # Unpicklable agent output; fall back to its text form
+            conn.send(("ok", str(reply[1]), _current_rss_mb()))
+
+
+class _Worker:
+    """Parent-side handle to one pre-forked worker process"""
+
+    def __init__(self, context, cache_size: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, cache_size),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.runs = 0
+        self.rss_mb = 0.0
+
+    def stop(self, timeout: float = 5.0) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class AgentProcessPool:
+    """Pre-forked worker processes that execute CodeAgent runs outside the API process
+
+    Each worker keeps its own cache of warm agent instances. Workers are
+    recycled after a fixed number of runs or once their RSS passes a limit,
+    so memory leaked by model-generated code stays bounded.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_POOL_WORKERS,
+        max_runs_per_worker: int = DEFAULT_MAX_RUNS_PER_WORKER,
+        max_rss_mb: Optional[float] = DEFAULT_MAX_RSS_MB,
+        cache_size: int = DEFAULT_WORKER_CACHE_SIZE,
+        start_method: str = DEFAULT_START_METHOD
+    ):
+        if workers < 1:
+            raise ValueError("Process pool needs at least one worker")
+        self.size = workers
+        self.max_runs_per_worker = max_runs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.cache_size = cache_size
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.runs = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.killed = 0
+
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+        logger.info(f"Started agent process pool with {workers} workers")
+
+    def run(self, agent_id: str, version: str, tools: List[str], allowed_imports: List[str], task: str,
+            control: Optional[RunControl] = None, max_steps: int = 6) -> Any:
+        """Execute a task on the next idle worker, blocking until it finishes
+
+        With a control the worker reports each step back for budget checks and
+        streaming, and cancelling the control kills the worker mid-step; it is
+        replaced by a fresh one so the pool keeps its size.
+        """
+        if self._closed:
+            raise RuntimeError("Process pool is shut down")
+
+        spec = {
+            "agent_id": agent_id,
+            "version": version,
+            "tools": list(tools),
+            "allowed_imports": list(allowed_imports),
+            "task": task,
+            "max_steps": max_steps,
+            "stream": control is not None
+        }
+        step_error = None
+        worker = self._acquire(control)
+        try:
+            with control.kill_hook(worker.process.kill) if control else nullcontext():
+                worker.conn.send(spec)
+                status, payload, rss_mb = worker.conn.recv()
+                while status == "step":
+                    try:
+                        control.report(payload)
+                    except Exception as e:
+                        step_error = e
+                    worker.conn.send(step_error is None)
+                    status, payload, rss_mb = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            killed = control is not None and control.cancelled
+            with self._lock:
+                if killed:
+                    self.killed += 1
+                else:
+                    self.crashed += 1
+            worker = self._replace(worker)
+            if killed:
+                raise control.error() from e
+            raise RuntimeError(f"Agent worker died while running agent {agent_id}") from e
+        else:
+            worker.runs += 1
+            worker.rss_mb = rss_mb
+            if control is not None and control.cancelled:
+                # Cancelled after the worker's last reply; the kill hook has still hit it
+                worker = self._replace(worker)
+            elif self._should_recycle(worker):
+                with self._lock:
+                    self.recycled += 1
+                worker = self._replace(worker)
+        finally:
+            with self._lock:
+                self.runs += 1
+            self._idle.put(worker)
+
+        if step_error is not None:
+            raise step_error
+        if status == "cancelled":
+            raise RunCancelledError(payload)
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool counters"""
+        with self._lock:
+            return {
+                "workers": self.size,
+                "idle": self._idle.qsize(),
+                "runs": self.runs,
+                "recycled": self.recycled,
+                "crashed": self.crashed,
+                "killed": self.killed,
+                "max_runs_per_worker": self.max_runs_per_worker,
+                "max_rss_mb": self.max_rss_mb,
+                "worker_rss_mb": [round(w.rss_mb, 1) for w in self._workers]
+            }
+
+    def shutdown(self) -> None:
+        """Stop every worker process"""
+        self._closed = True
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+    def _acquire(self, control: Optional[RunControl]) -> _Worker:
+        """Wait for an idle worker, giving up if the run is cancelled or times out meanwhile"""
+        while True:
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                if control is not None:
+                    control.check()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.cache_size)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.stop()
+        return self._spawn()
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        if self.max_runs_per_worker and worker.runs >= self.max_runs_per_worker:
+            return True
+        return bool(self.max_rss_mb) and worker.rss_mb > self.max_rss_mb
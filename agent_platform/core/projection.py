@@ -0,0 +1,60 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# Keys each agent view serializes; fields= may pick any of them
+AGENT_SUMMARY_FIELDS = frozenset({
+    "id", "name", "description", "owner_id", "model", "price_model", "price", "is_listed",
+    "trust_score", "usage_count", "tasks_completed", "rating", "created_at", "updated_at",
+})
+AGENT_FULL_FIELDS = frozenset({
+    "id", "name", "description", "owner_id", "tools", "model", "allowed_imports", "agent_metadata",
+    "max_run_seconds", "max_steps", "max_tool_calls", "price_model", "price", "is_listed",
+    "trust_score", "usage_count", "created_at", "updated_at",
+})
+AGENT_DETAIL_FIELDS = AGENT_FULL_FIELDS | {"owner", "stats", "listing_ids", "active_rentals"}
+
+# Narrowest first, so a field set is served by the cheapest view that has it all
+AGENT_VIEWS: Tuple[Tuple[str, FrozenSet[str]], ...] = (
+    ("summary", AGENT_SUMMARY_FIELDS),
+    ("full", AGENT_FULL_FIELDS),
+    ("detail", AGENT_DETAIL_FIELDS),
+)
+
+LISTING_FIELDS = frozenset({"id", "agent_id", "seller_id", "type", "pricing", "created_at", "status"})
+
+
+def parse_fields(fields: Optional[str], allowed: FrozenSet[str]) -> Optional[List[str]]:
+    """Field names from a comma-separated fields= parameter, None for all
+
+    Raises ValueError on an empty list or names outside allowed.
+    """
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    if not names:
+        raise ValueError("fields must name at least one field")
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def agent_view_for(fields: Optional[str], view: str = "full") -> Tuple[str, Optional[List[str]]]:
+    """Cheapest agent view that serves fields, and the parsed fields
+
+    Without fields the requested view is used as is.
+    """
+    if fields is None:
+        return view, None
+    names = parse_fields(fields, AGENT_DETAIL_FIELDS | AGENT_SUMMARY_FIELDS)
+    for name, available in AGENT_VIEWS:
+        if available.issuperset(names):
+            return name, names
+    # Mixes summary-only stats with detail fields; detail carries them under "stats"
+    raise ValueError("tasks_completed and rating can't be combined with full or detail fields; use stats")
+
+
+def project(data: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Only the requested keys of a serialized record, in the order asked"""
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields if name in data}
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+# Per-route TTLs in seconds; invalidation usually drops entries well before these
+LEADERBOARD_TTL = float(os.getenv("RESPONSE_CACHE_TTL_LEADERBOARD", "5"))
+MARKETPLACE_TTL = float(os.getenv("RESPONSE_CACHE_TTL_MARKETPLACE", "10"))
+ACHIEVEMENTS_TTL = float(os.getenv("RESPONSE_CACHE_TTL_ACHIEVEMENTS", "3600"))
+
+
+@dataclass
+class CachedResponse:
+    """
+    A serialized JSON body ready to be served again
+
+    Attributes:
+        body: Encoded JSON
+        etag: Strong validator derived from the body
+        expires_at: Monotonic time after which the entry is stale
+        tags: Invalidation tags the entry belongs to
+        headers: Extra response headers, e.g. pagination cursors
+    """
+    body: bytes
+    etag: str
+    expires_at: float
+    tags: Set[str]
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+class ResponseCache:
+    """LRU cache of serialized JSON responses with TTLs and tag invalidation"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, payload: Any, ttl: float, tags: Iterable[str] = (),
+            headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """Serialize a payload once and cache it under key"""
+        body = json.dumps(
+            jsonable_encoder(payload),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+        entry = CachedResponse(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            expires_at=time.monotonic() + ttl,
+            tags=set(tags),
+            headers=dict(headers or {})
+        )
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+
+    async def respond(self, request: Request, ttl: float, tags: Iterable[str],
+                      build: Callable[[Dict[str, str]], Awaitable[Any]]) -> Response:
+        """Serve a route from the cache, answering 304 when the client's ETag still matches
+
+        build is only awaited on a miss; it returns the payload and may add
+        response headers to the dict it is given.
+        """
+        key = f"{request.url.path}?{'&'.join(sorted(request.url.query.split('&')))}"
+        entry = self.get(key)
+        if entry is None:
+            extra_headers: Dict[str, str] = {}
+            payload = await build(extra_headers)
+            entry = self.put(key, payload, ttl, tags, extra_headers)
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations
+            }
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
@@ -0,0 +1,335 @@
+import logging
+import math
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import func
+from .admission import AGENT_QUEUE_SIZE, EngineBusyError, RateLimitedError
+from .execution import _jsonable
+from .models.database import session_scope
+from .models.run import AgentRun, DBRun, RunStatus
+from .scheduler import DEFAULT_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+RUN_QUEUE_LEASE = float(os.getenv("RUN_QUEUE_LEASE", "30"))  # seconds a claim lasts without a heartbeat
+RUN_QUEUE_MAX_ATTEMPTS = int(os.getenv("RUN_QUEUE_MAX_ATTEMPTS", "3"))
+RUN_QUEUE_BACKOFF = float(os.getenv("RUN_QUEUE_BACKOFF", "5"))  # seconds before the first retry, doubling after
+RUN_QUEUE_BACKOFF_MAX = float(os.getenv("RUN_QUEUE_BACKOFF_MAX", "300"))  # seconds
+RUN_QUEUE_MAX_PENDING = int(os.getenv("RUN_QUEUE_MAX_PENDING", "10000"))  # queued + running before 503
+
+_QUEUED = RunStatus.QUEUED.value
+_RUNNING = RunStatus.RUNNING.value
+
+
+class RunQueue:
+    """Durable run queue stored in the runs table
+
+    The API tier enqueues runs and any number of worker processes, on any
+    node, claim them. A claim is a lease: the worker must heartbeat before
+    it runs out, or the run is handed to another worker. Failed runs are
+    retried with exponential backoff until max_attempts.
+
+    On Postgres, claiming selects due rows FOR UPDATE SKIP LOCKED so workers
+    never wait on each other. SQLite has no row locks, so every claim also
+    compares the attempt count it read, which fails for all but one of any
+    workers racing for the same row.
+    """
+
+    def __init__(
+        self,
+        session_factory=session_scope,
+        lease: float = RUN_QUEUE_LEASE,
+        max_attempts: int = RUN_QUEUE_MAX_ATTEMPTS,
+        backoff: float = RUN_QUEUE_BACKOFF,
+        backoff_max: float = RUN_QUEUE_BACKOFF_MAX,
+        max_pending: int = RUN_QUEUE_MAX_PENDING,
+        agent_queue_size: int = AGENT_QUEUE_SIZE
+    ):
+        self._session = session_factory
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_pending = max_pending
+        self.agent_queue_size = agent_queue_size
+        self._lock = threading.Lock()
+        self.claimed = 0
+        self.retried = 0
+        self.reaped = 0
+        self.timed_out = 0
+
+    def enqueue(self, agent_id: str, task: str, user_id: Optional[str] = None, owner_id: Optional[str] = None,
+                priority: str = DEFAULT_PRIORITY, timeout: Optional[float] = None,
+                max_attempts: Optional[int] = None) -> AgentRun:
+        """Persist a run for a worker to pick up
+
+        Raises RateLimitedError if the agent already has a full queue and
+        EngineBusyError once the queue as a whole is over max_pending.
+        """
+        now = datetime.now()
+        with self._session() as db:
+            if self.agent_queue_size:
+                queued = db.query(func.count(DBRun.id)).filter(
+                    DBRun.agent_id == agent_id, DBRun.status == _QUEUED
+                ).scalar()
+                if queued >= self.agent_queue_size:
+                    raise RateLimitedError(f"Too many queued runs for agent {agent_id}", math.ceil(self.backoff))
+            if self.max_pending:
+                pending = db.query(func.count(DBRun.id)).filter(DBRun.status.in_((_QUEUED, _RUNNING))).scalar()
+                if pending >= self.max_pending:
+                    raise EngineBusyError("Too many pending agent runs", math.ceil(self.backoff))
+
+            row = DBRun(
+                id=f"run_{uuid.uuid4().hex}",
+                agent_id=agent_id,
+                owner_id=owner_id,
+                user_id=user_id,
+                task=task,
+                priority=priority,
+                status=_QUEUED,
+                timeout=timeout,
+                attempts=0,
+                max_attempts=max_attempts or self.max_attempts,
+                cancel_requested=0,
+                available_at=now,
+                submitted_at=now
+            )
+            db.add(row)
+            db.commit()
+            logger.info(f"Run {row.id} queued durably for agent {agent_id}")
+            return row.to_run()
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[AgentRun]:
+        """Lease up to limit due runs to a worker, oldest first"""
+        if limit <= 0:
+            return []
+        now = datetime.now()
+        self.reap(now)
+        with self._session() as db:
+            candidates = db.query(DBRun.id, DBRun.attempts).filter(
+                DBRun.status == _QUEUED,
+                DBRun.available_at <= now
+            ).order_by(DBRun.available_at, DBRun.submitted_at).limit(limit)
+            if db.get_bind().dialect.name == "postgresql":
+                candidates = candidates.with_for_update(skip_locked=True)
+
+            claimed = []
+            for run_id, attempts in candidates.all():
+                updated = db.query(DBRun).filter(
+                    DBRun.id == run_id,
+                    DBRun.status == _QUEUED,
+                    DBRun.attempts == attempts
+                ).update({
+                    DBRun.status: _RUNNING,
+                    DBRun.attempts: attempts + 1,
+                    DBRun.lease_owner: worker_id,
+                    DBRun.lease_expires_at: now + timedelta(seconds=self.lease),
+                    DBRun.started_at: now
+                }, synchronize_session=False)
+                if updated:
+                    claimed.append(run_id)
+            db.commit()
+            if not claimed:
+                return []
+
+            rows = {row.id: row for row in db.query(DBRun).filter(DBRun.id.in_(claimed))}
+            with self._lock:
+                self.claimed += len(claimed)
+            return [rows[run_id].to_run() for run_id in claimed if run_id in rows]
+
+    def heartbeat(self, worker_id: str, run_ids: Iterable[str]) -> List[str]:
+        """Extend the worker's leases, returning the runs it should stop
+
+        A run should stop if its lease was lost to another worker or the
+        client asked for it to be cancelled.
+        """
+        run_ids = list(run_ids)
+        if not run_ids:
+            return []
+        now = datetime.now()
+        with self._session() as db:
+            db.query(DBRun).filter(
+                DBRun.id.in_(run_ids),
+                DBRun.lease_owner == worker_id,
+                DBRun.status == _RUNNING
+            ).update({DBRun.lease_expires_at: now + timedelta(seconds=self.lease)}, synchronize_session=False)
+            db.commit()
+            keep = {run_id for (run_id,) in db.query(DBRun.id).filter(
+                DBRun.id.in_(run_ids),
+                DBRun.lease_owner == worker_id,
+                DBRun.status == _RUNNING,
+                DBRun.cancel_requested == 0
+            )}
+        return [run_id for run_id in run_ids if run_id not in keep]
+
+    def finish(self, run_id: str, worker_id: str, status: RunStatus, result: Any = None,
+               error: Optional[str] = None, steps: int = 0, tool_calls: int = 0) -> Optional[RunStatus]:
+        """Record a claimed run's outcome
+
+        A failed run with attempts left goes back in the queue after a
+        backoff. Returns the status stored, or None if the worker no longer
+        holds the lease and the outcome was discarded.
+        """
+        now = datetime.now()
+        with self._session() as db:
+            row = db.query(DBRun).filter(
+                DBRun.id == run_id,
+                DBRun.lease_owner == worker_id,
+                DBRun.status == _RUNNING
+            ).first()
+            if row is None:
+                logger.warning(f"Discarding outcome of run {run_id}: worker {worker_id} no longer holds its lease")
+                return None
+            attempts = row.attempts
+
+            values = {
+                DBRun.error: error,
+                DBRun.steps: steps,
+                DBRun.tool_calls: tool_calls,
+                DBRun.lease_owner: None,
+                DBRun.lease_expires_at: None
+            }
+            if status == RunStatus.FAILED and attempts < row.max_attempts and not row.cancel_requested:
+                stored = RunStatus.QUEUED
+                values[DBRun.available_at] = now + timedelta(seconds=self._backoff(attempts))
+            else:
+                stored = status
+                values[DBRun.result] = _jsonable(result)
+                values[DBRun.finished_at] = now
+            values[DBRun.status] = stored.value
+
+            updated = db.query(DBRun).filter(
+                DBRun.id == run_id,
+                DBRun.lease_owner == worker_id,
+                DBRun.status == _RUNNING
+            ).update(values, synchronize_session=False)
+            db.commit()
+            if not updated:
+                return None
+        if stored == RunStatus.QUEUED:
+            with self._lock:
+                self.retried += 1
+            logger.info(f"Run {run_id} failed on attempt {attempts}, retrying: {error}")
+        return stored
+
+    def release(self, run_ids: Iterable[str], worker_id: str, delay: float = 0) -> int:
+        """Hand claimed runs back without counting the attempt, e.g. on shutdown"""
+        run_ids = list(run_ids)
+        if not run_ids:
+            return 0
+        with self._session() as db:
+            released = db.query(DBRun).filter(
+                DBRun.id.in_(run_ids),
+                DBRun.lease_owner == worker_id,
+                DBRun.status == _RUNNING
+            ).update({
+                DBRun.status: _QUEUED,
+                DBRun.attempts: DBRun.attempts - 1,
+                DBRun.lease_owner: None,
+                DBRun.lease_expires_at: None,
+                DBRun.available_at: datetime.now() + timedelta(seconds=delay)
+            }, synchronize_session=False)
+            db.commit()
+        return released
+
+    def cancel(self, run_id: str, reason: str = "Run cancelled") -> bool:
+        """Cancel a queued run, or ask its worker to stop a running one
+
+        Running runs stop at the worker's next heartbeat. Returns False if
+        the run is unknown or already finished.
+        """
+        now = datetime.now()
+        with self._session() as db:
+            cancelled = db.query(DBRun).filter(DBRun.id == run_id, DBRun.status == _QUEUED).update({
+                DBRun.status: RunStatus.CANCELLED.value,
+                DBRun.error: reason,
+                DBRun.finished_at: now
+            }, synchronize_session=False)
+            if not cancelled:
+                cancelled = db.query(DBRun).filter(DBRun.id == run_id, DBRun.status == _RUNNING).update({
+                    DBRun.cancel_requested: 1
+                }, synchronize_session=False)
+            db.commit()
+        return bool(cancelled)
+
+    def get(self, run_id: str) -> Optional[AgentRun]:
+        with self._session() as db:
+            row = db.query(DBRun).filter(DBRun.id == run_id).first()
+            return row.to_run() if row else None
+
+    def reap(self, now: Optional[datetime] = None) -> int:
+        """Settle runs whose worker stopped heartbeating, and queued runs past their deadline
+
+        Abandoned runs are retried like failures, unless they were being
+        cancelled or have used up their attempts.
+        """
+        now = now or datetime.now()
+        overdue = self._time_out_queued(now)
+        expired = (DBRun.status == _RUNNING, DBRun.lease_expires_at < now)
+        done = {DBRun.lease_owner: None, DBRun.lease_expires_at: None, DBRun.finished_at: now}
+        with self._session() as db:
+            reaped = db.query(DBRun).filter(*expired, DBRun.cancel_requested == 1).update(
+                {**done, DBRun.status: RunStatus.CANCELLED.value, DBRun.error: "Run cancelled"},
+                synchronize_session=False
+            )
+            reaped += db.query(DBRun).filter(*expired, DBRun.attempts >= DBRun.max_attempts).update(
+                {**done, DBRun.status: RunStatus.FAILED.value, DBRun.error: "Worker stopped responding"},
+                synchronize_session=False
+            )
+            reaped += db.query(DBRun).filter(*expired).update({
+                DBRun.status: _QUEUED,
+                DBRun.lease_owner: None,
+                DBRun.lease_expires_at: None,
+                DBRun.available_at: now
+            }, synchronize_session=False)
+            db.commit()
+        if reaped:
+            with self._lock:
+                self.reaped += reaped
+            logger.warning(f"Reaped {reaped} runs with expired leases")
+        return reaped + overdue
+
+    def _time_out_queued(self, now: datetime) -> int:
+        """Mark queued runs whose deadline, counted from submission, has passed as timed out"""
+        with self._session() as db:
+            candidates = db.query(DBRun.id, DBRun.submitted_at, DBRun.timeout).filter(
+                DBRun.status == _QUEUED, DBRun.timeout.isnot(None)
+            ).all()
+            overdue = [run_id for run_id, submitted_at, timeout in candidates
+                       if submitted_at + timedelta(seconds=timeout) <= now]
+            if not overdue:
+                return 0
+            timed_out = db.query(DBRun).filter(DBRun.id.in_(overdue), DBRun.status == _QUEUED).update({
+                DBRun.status: RunStatus.TIMED_OUT.value,
+                DBRun.error: "Run exceeded its deadline while queued",
+                DBRun.finished_at: now
+            }, synchronize_session=False)
+            db.commit()
+        if timed_out:
+            with self._lock:
+                self.timed_out += timed_out
+            logger.warning(f"Timed out {timed_out} runs still queued past their deadline")
+        return timed_out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._session() as db:
+            counts = dict(db.query(DBRun.status, func.count(DBRun.id)).group_by(DBRun.status).all())
+        with self._lock:
+            return {
+                "runs": {status.value: counts.get(status.value, 0) for status in RunStatus},
+                "claimed": self.claimed,
+                "retried": self.retried,
+                "reaped": self.reaped,
+                "timed_out": self.timed_out,
+                "lease": self.lease,
+                "max_attempts": self.max_attempts
+            }
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential delay before retry number attempts, with jitter so retries spread out"""
+        delay = min(self.backoff * 2 ** max(attempts - 1, 0), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
@@ -0,0 +1,127 @@
+import logging
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most favoured first
+PRIORITY_CLASSES = ("owner", "subscriber", "renter", "public")
+DEFAULT_PRIORITY = "public"
+# Share of capacity each class gets relative to "public", e.g. "owner=4,subscriber=3,renter=2,public=1"
+SCHEDULER_WEIGHTS = os.getenv("SCHEDULER_WEIGHTS", "owner=4,subscriber=3,renter=2,public=1")
+# Seconds of waiting that earn a run the same credit as one unit of fair share; 0 disables aging
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "10"))
+# Recent queue waits kept per class for percentiles
+_WAIT_SAMPLES = 1000
+# Finish tags kept for users with nothing queued before old ones are dropped
+_MAX_TRACKED_USERS = 4096
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "class=weight,..." into a weight per priority class
+
+    Classes left out keep a weight of 1; unknown classes and non-positive
+    weights raise ValueError.
+    """
+    weights = {name: 1.0 for name in PRIORITY_CLASSES}
+    for part in filter(None, (piece.strip() for piece in spec.split(","))):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown priority class: {name}")
+        weight = float(value)
+        if weight <= 0:
+            raise ValueError(f"Weight for {name} must be positive")
+        weights[name] = weight
+    return weights
+
+
+class FairScheduler:
+    """Start-time fair queuing across users, weighted by priority class, with aging
+
+    Each queued run gets a virtual start tag: the later of the scheduler's
+    virtual clock and the finish tag of the same user's previous run. A run's
+    finish tag is its start plus 1/weight, so a user with many queued runs
+    has them spread out in virtual time while a user with one run slots in
+    near the front, and a class with twice the weight gets twice the share.
+    The runnable ticket with the lowest start tag goes first, less one unit of
+    credit for every aging_seconds it has waited, so nothing starves even
+    behind a steady stream of higher-weighted work.
+
+    Tickets need user_id, agent_id, priority and enqueued_at attributes; the
+    scheduler stores its start tag on the ticket. It is not thread-safe: the
+    admission controller only calls it under its own lock.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 aging_seconds: float = SCHEDULER_AGING_SECONDS):
+        self.weights = weights or parse_weights(SCHEDULER_WEIGHTS)
+        self.aging_seconds = aging_seconds
+        self._virtual_time = 0.0
+        self._finish: Dict[str, float] = {}
+        self._waits: Dict[str, "deque[float]"] = {name: deque(maxlen=_WAIT_SAMPLES) for name in self.weights}
+        self.scheduled: Dict[str, int] = {name: 0 for name in self.weights}
+
+    def enqueue(self, ticket) -> None:
+        """Tag a run entering the queue"""
+        if ticket.priority not in self.weights:
+            ticket.priority = DEFAULT_PRIORITY
+        user = _user(ticket)
+        start = max(self._virtual_time, self._finish.get(user, 0.0))
+        ticket.start_tag = start
+        self._finish[user] = start + 1.0 / self.weights[ticket.priority]
+
+    def pick(self, tickets: Iterable[Any], now: float) -> Optional[Any]:
+        """The ticket to run next among those that fit their limits"""
+        best, best_key = None, None
+        for ticket in tickets:
+            key = (self._effective_tag(ticket, now), ticket.enqueued_at)
+            if best_key is None or key < best_key:
+                best, best_key = ticket, key
+        return best
+
+    def started(self, ticket, now: float) -> None:
+        """Advance the virtual clock and record how long the run waited"""
+        self._virtual_time = max(self._virtual_time, getattr(ticket, "start_tag", self._virtual_time))
+        self._waits[ticket.priority].append(now - ticket.enqueued_at)
+        self.scheduled[ticket.priority] += 1
+        if len(self._finish) > _MAX_TRACKED_USERS:
+            # Users whose last run finished in virtual past start fresh anyway
+            self._finish = {user: tag for user, tag in self._finish.items() if tag > self._virtual_time}
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-class run counts and wait-time percentiles"""
+        classes = {}
+        for name, samples in self._waits.items():
+            waits = sorted(samples)
+            classes[name] = {
+                "weight": self.weights[name],
+                "scheduled": self.scheduled[name],
+                "wait_ms": {
+                    "samples": len(waits),
+                    "p50": round(percentile(waits, 0.5) * 1000, 1),
+                    "p95": round(percentile(waits, 0.95) * 1000, 1),
+                    "p99": round(percentile(waits, 0.99) * 1000, 1),
+                    "max": round(waits[-1] * 1000, 1) if waits else 0.0
+                }
+            }
+        return {"aging_seconds": self.aging_seconds, "virtual_time": round(self._virtual_time, 3), "classes": classes}
+
+    def _effective_tag(self, ticket, now: float) -> float:
+        tag = getattr(ticket, "start_tag", self._virtual_time)
+        if self.aging_seconds:
+            tag -= (now - ticket.enqueued_at) / self.aging_seconds
+        return tag
+
+
+def _user(ticket) -> str:
+    # Anonymous runs share a queue per agent
+    return ticket.user_id or f"agent:{ticket.agent_id}"
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values, 0 when empty"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
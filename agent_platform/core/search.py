@@ -0,0 +1,349 @@
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from .models import database
+
+logger = logging.getLogger(__name__)
+
+# auto picks FTS5 on SQLite and tsvector on Postgres; memory forces the in-process index
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+
+# Relative weight of each indexed field
+FIELD_WEIGHTS = {"name": 3.0, "tools": 2.0, "description": 1.0}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+_AGENT_FIELDS = "SELECT id, name, description, tools, is_listed, owner_id FROM agents"
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return _TOKEN.findall((value or "").lower())
+
+
+def _visibility_sql(listed_only: bool, owner_id: Optional[str]) -> Tuple[str, str]:
+    """JOIN and WHERE fragments restricting hits to listed agents, plus owner_id's own if given"""
+    if not listed_only:
+        return "", ""
+    join = "JOIN agents ON agents.id = agent_search.agent_id "
+    if owner_id is None:
+        return join, "AND agents.is_listed = 1 "
+    return join, "AND (agents.is_listed = 1 OR agents.owner_id = :owner_id) "
+
+
+def _tools_text(tools) -> str:
+    if isinstance(tools, (list, tuple)):
+        return " ".join(str(tool) for tool in tools)
+    return tools or ""
+
+
+@dataclass
+class SearchHit:
+    """
+    A ranked search result
+
+    Attributes:
+        agent_id: ID of the matching agent
+        score: Relevance, higher is better
+    """
+    agent_id: str
+    score: float
+
+    def to_dict(self) -> dict:
+        return {"agent_id": self.agent_id, "score": self.score}
+
+
+class InMemorySearchIndex:
+    """In-process inverted index with BM25-style ranking, used when the database has no full-text support"""
+
+    name = "memory"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # token -> {agent_id: field-weighted term frequency}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # agent_id -> (token weights, length, is_listed, owner_id)
+        self._docs: Dict[str, Tuple[Counter, float, bool, Optional[str]]] = {}
+        self._total_length = 0.0
+        self._lock = threading.Lock()
+
+    def setup(self) -> None:
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        with database.engine.connect() as conn:
+            rows = conn.execute(text(_AGENT_FIELDS)).fetchall()
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._total_length = 0.0
+            for row in rows:
+                self._add(*row)
+
+    def refresh(self, agent_id: str) -> None:
+        with database.engine.connect() as conn:
+            row = conn.execute(text(f"{_AGENT_FIELDS} WHERE id = :id"), {"id": agent_id}).fetchone()
+        with self._lock:
+            self._remove(agent_id)
+            if row is not None:
+                self._add(*row)
+
+    def remove(self, agent_id: str) -> None:
+        with self._lock:
+            self._remove(agent_id)
+
+    def search(self, query: str, limit: int, offset: int = 0, listed_only: bool = False,
+               owner_id: Optional[str] = None) -> List[SearchHit]:
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            # Every term must match; start from the rarest
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            if listed_only:
+                candidates = {
+                    agent_id for agent_id in candidates
+                    if self._docs[agent_id][2] or (owner_id is not None and self._docs[agent_id][3] == owner_id)
+                }
+
+            total = len(self._docs)
+            avg_length = self._total_length / total if total else 1.0
+            hits = []
+            for agent_id in candidates:
+                length = self._docs[agent_id][1]
+                score = 0.0
+                for posting in postings:
+                    frequency = posting[agent_id]
+                    idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+                hits.append(SearchHit(agent_id, score))
+        hits.sort(key=lambda hit: (-hit.score, hit.agent_id))
+        return hits[offset:offset + limit]
+
+    def _add(self, agent_id, name, description, tools, is_listed, owner_id) -> None:
+        weights = Counter()
+        for field, value in (("name", name), ("description", description), ("tools", _tools_text(tools))):
+            for token in tokenize(value):
+                weights[token] += FIELD_WEIGHTS[field]
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[agent_id] = weight
+        length = sum(weights.values())
+        self._docs[agent_id] = (weights, length, bool(is_listed), owner_id)
+        self._total_length += length
+
+    def _remove(self, agent_id: str) -> None:
+        doc = self._docs.pop(agent_id, None)
+        if doc is None:
+            return
+        for token in doc[0]:
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(agent_id, None)
+                if not posting:
+                    del self._postings[token]
+        self._total_length -= doc[1]
+
+
+class SQLiteSearchIndex:
+    """FTS5 virtual table kept beside the agents table
+
+    agent_search_docs maps agent ids to FTS rowids so an update replaces one
+    document by rowid instead of scanning the virtual table.
+    """
+
+    name = "sqlite_fts5"
+
+    _INSERT = (
+        "INSERT INTO agent_search (rowid, agent_id, name, description, tools) "
+        "SELECT agent_search_docs.doc_id, agents.id, agents.name, coalesce(agents.description, ''), "
+        "coalesce(agents.tools, '') FROM agents JOIN agent_search_docs ON agent_search_docs.agent_id = agents.id"
+    )
+
+    def setup(self) -> None:
+        with database.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS agent_search "
+                "USING fts5(agent_id UNINDEXED, name, description, tools)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS agent_search_docs ("
+                "doc_id INTEGER PRIMARY KEY, agent_id VARCHAR NOT NULL UNIQUE)"
+            ))
+            if conn.execute(text("SELECT count(*) FROM agent_search_docs")).scalar() == 0:
+                conn.execute(text("INSERT INTO agent_search_docs (agent_id) SELECT id FROM agents"))
+                conn.execute(text(self._INSERT))
+
+    def refresh(self, agent_id: str) -> None:
+        with database.engine.begin() as conn:
+            self._delete(conn, agent_id)
+            exists = conn.execute(text("SELECT 1 FROM agents WHERE id = :id"), {"id": agent_id}).scalar()
+            if exists:
+                conn.execute(text("INSERT INTO agent_search_docs (agent_id) VALUES (:id)"), {"id": agent_id})
+                conn.execute(text(f"{self._INSERT} WHERE agents.id = :id"), {"id": agent_id})
+
+    def remove(self, agent_id: str) -> None:
+        with database.engine.begin() as conn:
+            self._delete(conn, agent_id)
+
+    def search(self, query: str, limit: int, offset: int = 0, listed_only: bool = False,
+               owner_id: Optional[str] = None) -> List[SearchHit]:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # Quote each token so user input can't inject FTS5 query syntax
+        match = " ".join(f'"{term}"' for term in terms)
+        weights = ", ".join(str(FIELD_WEIGHTS[field]) for field in ("name", "description", "tools"))
+        join, visible = _visibility_sql(listed_only, owner_id)
+        statement = (
+            f"SELECT agent_search.agent_id, -bm25(agent_search, 0, {weights}) AS score FROM agent_search "
+            + join
+            + "WHERE agent_search MATCH :match "
+            + visible
+            + "ORDER BY score DESC, agent_search.agent_id LIMIT :limit OFFSET :offset"
+        )
+        params = {"match": match, "limit": limit, "offset": offset, "owner_id": owner_id}
+        with database.engine.connect() as conn:
+            rows = conn.execute(text(statement), params).fetchall()
+        return [SearchHit(agent_id, score) for agent_id, score in rows]
+
+    @staticmethod
+    def _delete(conn, agent_id: str) -> None:
+        doc_id = conn.execute(
+            text("SELECT doc_id FROM agent_search_docs WHERE agent_id = :id"), {"id": agent_id}
+        ).scalar()
+        if doc_id is not None:
+            conn.execute(text("DELETE FROM agent_search WHERE rowid = :doc_id"), {"doc_id": doc_id})
+            conn.execute(text("DELETE FROM agent_search_docs WHERE doc_id = :doc_id"), {"doc_id": doc_id})
+
+
+class PostgresSearchIndex:
+    """Weighted tsvector documents with a GIN index"""
+
+    name = "postgres_tsvector"
+
+    _DOCUMENT = (
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(tools::text, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+    )
+
+    def setup(self) -> None:
+        with database.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS agent_search ("
+                "agent_id VARCHAR PRIMARY KEY REFERENCES agents(id) ON DELETE CASCADE, "
+                "document TSVECTOR NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_agent_search_document ON agent_search USING GIN (document)"
+            ))
+            if conn.execute(text("SELECT count(*) FROM agent_search")).scalar() == 0:
+                conn.execute(text(f"INSERT INTO agent_search (agent_id, document) SELECT id, {self._DOCUMENT} FROM agents"))
+
+    def refresh(self, agent_id: str) -> None:
+        with database.engine.begin() as conn:
+            result = conn.execute(text(
+                f"INSERT INTO agent_search (agent_id, document) SELECT id, {self._DOCUMENT} FROM agents "
+                "WHERE id = :id ON CONFLICT (agent_id) DO UPDATE SET document = EXCLUDED.document"
+            ), {"id": agent_id})
+            if result.rowcount == 0:
+                conn.execute(text("DELETE FROM agent_search WHERE agent_id = :id"), {"id": agent_id})
+
+    def remove(self, agent_id: str) -> None:
+        with database.engine.begin() as conn:
+            conn.execute(text("DELETE FROM agent_search WHERE agent_id = :id"), {"id": agent_id})
+
+    def search(self, query: str, limit: int, offset: int = 0, listed_only: bool = False,
+               owner_id: Optional[str] = None) -> List[SearchHit]:
+        if not tokenize(query):
+            return []
+        join, visible = _visibility_sql(listed_only, owner_id)
+        statement = (
+            "SELECT agent_search.agent_id, ts_rank(agent_search.document, query) AS score "
+            "FROM agent_search "
+            + join
+            + ", websearch_to_tsquery('english', :query) query "
+            "WHERE agent_search.document @@ query "
+            + visible
+            + "ORDER BY score DESC, agent_search.agent_id LIMIT :limit OFFSET :offset"
+        )
+        params = {"query": query, "limit": limit, "offset": offset, "owner_id": owner_id}
+        with database.engine.connect() as conn:
+            rows = conn.execute(text(statement), params).fetchall()
+        return [SearchHit(agent_id, float(score)) for agent_id, score in rows]
+
+
+def _sqlite_has_fts5() -> bool:
+    try:
+        with database.engine.connect() as conn:
+            return bool(conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+    except Exception:
+        return False
+
+
+class AgentSearch:
+    """Agent search on the best backend the configured database supports
+
+    The backend is chosen on first use, after the engine is configured. Index
+    maintenance errors are logged rather than raised so they never fail the
+    agent write that triggered them.
+    """
+
+    def __init__(self, backend: str = SEARCH_BACKEND):
+        self.requested = backend
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = self._select_backend()
+                    # Published only once set up, so a failed setup is retried on next use
+                    index.setup()
+                    self._index = index
+                    logger.info(f"Agent search using {index.name} backend")
+        return self._index
+
+    def setup(self) -> str:
+        """Choose and prepare the backend now instead of on first use"""
+        return self.index.name
+
+    def search(self, query: str, limit: int = 20, offset: int = 0, listed_only: bool = False,
+               owner_id: Optional[str] = None) -> List[SearchHit]:
+        """Ranked hits; with listed_only, just listed agents and, if given, those owner_id owns"""
+        return self.index.search(query, limit, offset, listed_only, owner_id)
+
+    def refresh(self, agent_id: str) -> None:
+        try:
+            self.index.refresh(agent_id)
+        except Exception as e:
+            logger.warning(f"Could not update search index for {agent_id}: {str(e)}")
+
+    def remove(self, agent_id: str) -> None:
+        try:
+            self.index.remove(agent_id)
+        except Exception as e:
+            logger.warning(f"Could not remove {agent_id} from search index: {str(e)}")
+
+    def _select_backend(self):
+        if self.requested == "memory":
+            return InMemorySearchIndex()
+        dialect = database.engine.dialect.name
+        if dialect == "postgresql":
+            return PostgresSearchIndex()
+        if dialect == "sqlite" and _sqlite_has_fts5():
+            return SQLiteSearchIndex()
+        return InMemorySearchIndex()
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+from sqlalchemy import DateTime, bindparam, func, update
+from sqlalchemy.orm import Session
+from .metrics import LatencyHistogram
+from .models.agent import DBAgent, DBAgentStats
+
+logger = logging.getLogger(__name__)
+
+STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "2"))  # seconds
+STATS_FLUSH_BATCH = int(os.getenv("STATS_FLUSH_BATCH", "500"))  # agents with pending deltas before an early flush
+
+
+@dataclass
+class StatsDelta:
+    """
+    Unflushed changes to one agent's counters
+
+    Attributes:
+        tasks_completed: Tasks finished since the last flush
+        earnings: Earnings since the last flush
+        usage_count: Runs started since the last flush
+        last_active: Latest activity seen, None if there was none
+    """
+    tasks_completed: int = 0
+    earnings: float = 0.0
+    usage_count: int = 0
+    last_active: Optional[datetime] = None
+
+    def merge(self, other: "StatsDelta") -> None:
+        self.tasks_completed += other.tasks_completed
+        self.earnings += other.earnings
+        self.usage_count += other.usage_count
+        if other.last_active is not None and (self.last_active is None or other.last_active > self.last_active):
+            self.last_active = other.last_active
+
+
+class StatsBuffer:
+    """Write-coalescing counters for agent stats
+
+    Runs and sales record deltas in memory; a background thread flushes them
+    as relative SQL increments (tasks_completed = tasks_completed + n), one
+    transaction per batch. Increments commute, so several API processes and
+    workers can flush into the same rows without losing updates. Call stop()
+    on shutdown to write whatever is still buffered.
+    """
+
+    def __init__(self, session_factory: Callable[[], ContextManager[Session]],
+                 flush_interval: float = STATS_FLUSH_INTERVAL,
+                 batch_size: int = STATS_FLUSH_BATCH,
+                 on_flush: Optional[Callable[[List[str]], None]] = None):
+        self._session = session_factory
+        # Called with the ids of the agents a flush wrote to
+        self._on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[str, StatsDelta] = {}
+        self._inflight: Dict[str, StatsDelta] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flush_latency = LatencyHistogram()
+        self.recorded = 0
+        self.flushed = 0
+        self.flush_errors = 0
+
+    def record(self, agent_id: str, tasks_completed: int = 0, earnings: float = 0.0,
+               usage_count: int = 0, last_active: Optional[datetime] = None) -> None:
+        """Add to an agent's counters; never touches the database"""
+        with self._lock:
+            delta = self._pending.get(agent_id)
+            if delta is None:
+                delta = self._pending[agent_id] = StatsDelta()
+            delta.merge(StatsDelta(tasks_completed, earnings, usage_count, last_active))
+            self.recorded += 1
+            pending = len(self._pending)
+        self.start()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self, agent_id: str) -> StatsDelta:
+        """Deltas for an agent not yet committed, to overlay on values read from the database"""
+        delta = StatsDelta()
+        with self._lock:
+            for buffered in (self._inflight.get(agent_id), self._pending.get(agent_id)):
+                if buffered is not None:
+                    delta.merge(buffered)
+        return delta
+
+    def flush(self) -> int:
+        """Write every buffered delta, returning how many agents were updated"""
+        with self._flush_lock:
+            with self._lock:
+                self._inflight, self._pending = self._pending, {}
+                batch = self._inflight
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.flush_errors += 1
+                logger.error(f"Agent stats flush failed, keeping {len(batch)} deltas for the next one: {str(e)}")
+                with self._lock:
+                    # Deltas recorded meanwhile are merged in, not overwritten
+                    for agent_id, delta in batch.items():
+                        self._pending.setdefault(agent_id, StatsDelta()).merge(delta)
+                    self._inflight = {}
+                return 0
+            finally:
+                self.flush_latency.observe(time.perf_counter() - start)
+
+            try:
+                # Invalidate while pending() still counts the batch, so no reader
+                # sees the old row without these deltas on top of it
+                if self._on_flush is not None:
+                    self._on_flush(list(batch))
+            finally:
+                with self._lock:
+                    self._inflight = {}
+            self.flushed += len(batch)
+            return len(batch)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = threading.Thread(target=self._run, name="agent-stats-flush", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write anything still buffered"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_agents": pending,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+            "flush_latency": self.flush_latency.snapshot()
+        }
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Agent stats flush failed: {str(e)}")
+
+    def _write(self, batch: Dict[str, StatsDelta]) -> None:
+        """Apply the batch as increments with one executemany per table, in one transaction"""
+        stats = DBAgentStats.__table__
+        agents = DBAgent.__table__
+        stats_rows = [
+            {"b_agent_id": agent_id, "b_tasks": delta.tasks_completed,
+             "b_earnings": delta.earnings, "b_last_active": delta.last_active}
+            for agent_id, delta in batch.items()
+            if delta.tasks_completed or delta.earnings or delta.last_active is not None
+        ]
+        usage_rows = [
+            {"b_agent_id": agent_id, "b_usage": delta.usage_count}
+            for agent_id, delta in batch.items() if delta.usage_count
+        ]
+
+        with self._session() as db:
+            if stats_rows:
+                db.execute(
+                    update(stats)
+                    .where(stats.c.agent_id == bindparam("b_agent_id"))
+                    .values(
+                        tasks_completed=func.coalesce(stats.c.tasks_completed, 0) + bindparam("b_tasks"),
+                        earnings=func.coalesce(stats.c.earnings, 0) + bindparam("b_earnings"),
+                        last_active=func.coalesce(bindparam("b_last_active", type_=DateTime), stats.c.last_active)
+                    ),
+                    stats_rows
+                )
+            if usage_rows:
+                db.execute(
+                    update(agents)
+                    .where(agents.c.id == bindparam("b_agent_id"))
+                    .values(usage_count=func.coalesce(agents.c.usage_count, 0) + bindparam("b_usage")),
+                    usage_rows
+                )
+            db.commit()
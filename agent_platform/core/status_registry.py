@@ -0,0 +1,237 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, ContextManager, Dict, Iterable, Optional, Tuple
+from sqlalchemy.orm import Session
+from .db_operations import DBOperations
+from .events import Event, EventBus
+
+logger = logging.getLogger(__name__)
+
+# Most agents one bulk status request may ask about
+STATUS_BULK_MAX = int(os.getenv("STATUS_BULK_MAX", "500"))
+# How long another worker's reported run count is trusted without an update, so a crashed worker can't pin agents busy
+STATUS_RUN_TTL = float(os.getenv("STATUS_RUN_TTL", "900"))  # seconds
+
+# Internal bus topic carrying each worker's run counts; not exposed to clients
+RUNS_TOPIC = "agent_runs"
+
+STATUSES = ("idle", "busy", "error")
+# Only these outlive a restart; busy is reported as idle once nothing is running
+DURABLE_STATUSES = frozenset({"error"})
+DEFAULT_STATUS = "idle"
+
+
+@dataclass
+class AgentStatus:
+    """
+    Live status of one agent
+
+    Attributes:
+        agent_id: The agent
+        status: idle, busy or error
+        owner_id: Owner of the agent, None until the first transition is seen
+        updated_at: When the status last changed, None if it never has
+    """
+    agent_id: str
+    status: str = DEFAULT_STATUS
+    owner_id: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent_id": self.agent_id,
+            "status": self.status,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class StatusRegistry:
+    """In-memory agent status, shared across workers through the event bus
+
+    Reads and transitions never touch the database. Each local transition is
+    published as an agent_status event. Registries in other workers apply
+    those events when the bus relays them. Only durable transitions are
+    written to agent_states: into and out of error. They are loaded back on
+    startup. Unknown agents are idle.
+
+    Runs are counted per worker, and each worker publishes its counts. An
+    agent goes idle only when no worker is running it.
+    """
+
+    def __init__(self, session_factory: Callable[[], ContextManager[Session]], events: Optional[EventBus] = None,
+                 run_ttl: float = STATUS_RUN_TTL):
+        self._session = session_factory
+        self.events = events
+        self.run_ttl = run_ttl
+        self._statuses: Dict[str, AgentStatus] = {}
+        self._runs: Dict[str, int] = {}
+        # agent_id -> {origin: (runs, reported at)} for other workers
+        self._remote_runs: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        self._lock = threading.Lock()
+        self.transitions = 0
+        self.persisted = 0
+        self.relayed = 0
+        if events is not None:
+            events.listen("agent_status", self._on_relayed)
+            events.listen(RUNS_TOPIC, self._on_runs_relayed)
+
+    def get(self, agent_id: str) -> AgentStatus:
+        with self._lock:
+            current = self._statuses.get(agent_id)
+            return AgentStatus(**vars(current)) if current else AgentStatus(agent_id)
+
+    def get_many(self, agent_ids: Iterable[str]) -> Dict[str, AgentStatus]:
+        """Status of each agent, in the order asked"""
+        with self._lock:
+            return {
+                agent_id: AgentStatus(**vars(self._statuses[agent_id])) if agent_id in self._statuses
+                else AgentStatus(agent_id)
+                for agent_id in agent_ids
+            }
+
+    def set(self, agent_id: str, status: str, owner_id: Optional[str] = None) -> str:
+        """Record a transition and return the previous status
+
+        Publishes the change and, if it is durable, persists it. Setting
+        the current status again does nothing.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"Unknown agent status: {status}")
+        now = datetime.now()
+        with self._lock:
+            current = self._statuses.get(agent_id)
+            previous = current.status if current else DEFAULT_STATUS
+            if current is not None and owner_id is None:
+                owner_id = current.owner_id
+            if previous == status:
+                if current is not None and owner_id is not None:
+                    current.owner_id = owner_id
+                return previous
+            self._statuses[agent_id] = AgentStatus(agent_id, status, owner_id, now)
+            self.transitions += 1
+
+        if self._durable(previous) != self._durable(status):
+            self._persist(agent_id, self._durable(status))
+        if self.events is not None:
+            self.events.publish("agent_status", {
+                "agent_id": agent_id,
+                "owner_id": owner_id,
+                "status": status,
+                "previous_status": previous
+            })
+        return previous
+
+    def run_started(self, agent_id: str, owner_id: Optional[str] = None) -> None:
+        """Count a run of the agent in this worker and mark it busy"""
+        with self._lock:
+            runs = self._runs[agent_id] = self._runs.get(agent_id, 0) + 1
+        self._publish_runs(agent_id, runs)
+        self.set(agent_id, "busy", owner_id)
+
+    def run_finished(self, agent_id: str, owner_id: Optional[str] = None) -> None:
+        """Uncount a run; the agent goes idle unless a run of it is left in any worker"""
+        with self._lock:
+            runs = self._runs.pop(agent_id, 1) - 1
+            if runs:
+                self._runs[agent_id] = runs
+            running = runs + self._remote_running(agent_id)
+        self._publish_runs(agent_id, runs)
+        if not running:
+            self.set(agent_id, "idle", owner_id)
+
+    def running(self, agent_id: str) -> int:
+        """Runs of the agent in progress across workers, as far as this one knows"""
+        with self._lock:
+            return self._runs.get(agent_id, 0) + self._remote_running(agent_id)
+
+    def forget(self, agent_id: str) -> None:
+        """Drop a deleted agent"""
+        with self._lock:
+            self._statuses.pop(agent_id, None)
+            self._remote_runs.pop(agent_id, None)
+
+    def load(self) -> int:
+        """Load durable statuses persisted by earlier processes"""
+        with self._session() as db:
+            rows = DBOperations.get_agent_states(db, DURABLE_STATUSES)
+        with self._lock:
+            for agent_id, owner_id, status, updated_at in rows:
+                self._statuses.setdefault(agent_id, AgentStatus(agent_id, status, owner_id, updated_at))
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {status: 0 for status in STATUSES}
+            for current in self._statuses.values():
+                counts[current.status] += 1
+            running = sum(self._runs.values())
+        return {
+            "agents": counts,
+            "running": running,
+            "transitions": self.transitions,
+            "persisted": self.persisted,
+            "relayed": self.relayed
+        }
+
+    def _durable(self, status: str) -> str:
+        return status if status in DURABLE_STATUSES else DEFAULT_STATUS
+
+    def _persist(self, agent_id: str, status: str) -> None:
+        try:
+            with self._session() as db:
+                DBOperations.update_agent_state(db, agent_id, status)
+            self.persisted += 1
+        except Exception as e:
+            # The live status is still right; only a restart would lose it
+            logger.error(f"Could not persist status {status} of agent {agent_id}: {str(e)}")
+
+    def _remote_running(self, agent_id: str) -> int:
+        """Fresh run counts other workers reported; call with the lock held"""
+        reported = self._remote_runs.get(agent_id)
+        if not reported:
+            return 0
+        cutoff = time.time() - self.run_ttl
+        for origin in [origin for origin, (_, at) in reported.items() if at < cutoff]:
+            del reported[origin]
+        if not reported:
+            del self._remote_runs[agent_id]
+        return sum(runs for runs, _ in reported.values())
+
+    def _publish_runs(self, agent_id: str, runs: int) -> None:
+        if self.events is not None:
+            self.events.publish(RUNS_TOPIC, {"agent_id": agent_id, "runs": runs})
+
+    def _on_runs_relayed(self, event: Event) -> None:
+        """Record another worker's run count for an agent"""
+        agent_id, runs = event.data.get("agent_id"), event.data.get("runs")
+        if not agent_id or not isinstance(runs, int):
+            return
+        with self._lock:
+            reported = self._remote_runs.setdefault(agent_id, {})
+            if runs > 0:
+                reported[event.origin] = (runs, event.timestamp)
+            else:
+                reported.pop(event.origin, None)
+                if not reported:
+                    del self._remote_runs[agent_id]
+
+    def _on_relayed(self, event: Event) -> None:
+        """Apply a transition another worker published and persisted"""
+        data = event.data
+        status = data.get("status")
+        if status not in STATUSES or not data.get("agent_id"):
+            return
+        updated_at = datetime.fromtimestamp(event.timestamp)
+        with self._lock:
+            current = self._statuses.get(data["agent_id"])
+            if current is not None and current.updated_at is not None and current.updated_at > updated_at:
+                return
+            # That worker hadn't yet heard of a run still going here
+            if status == DEFAULT_STATUS and self._runs.get(data["agent_id"]):
+                return
+            self._statuses[data["agent_id"]] = AgentStatus(data["agent_id"], status, data.get("owner_id"), updated_at)
+            self.relayed += 1
@@ -0,0 +1,84 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "8"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))  # seconds
+
+
+class SupabaseTimeoutError(TimeoutError):
+    """Raised when a Supabase call exceeds its timeout"""
+
+
+class SupabaseExecutor:
+    """Runs blocking Supabase client calls on a dedicated, bounded thread pool
+
+    The sync supabase client keeps its HTTP connections alive between calls,
+    so reusing one client through this pool gives connection reuse while
+    keeping auth bursts off the default threadpool that serves agent traffic.
+    """
+
+    def __init__(self, max_workers: int = SUPABASE_MAX_WORKERS, timeout: float = SUPABASE_TIMEOUT):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="supabase")
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._timeouts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def call(self, operation: str, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Await fn(*args, **kwargs) on the pool, recording its latency under operation"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs)),
+                timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            self._count(self._timeouts, operation)
+            logger.warning(f"Supabase {operation} timed out")
+            raise SupabaseTimeoutError(f"Supabase {operation} timed out")
+        except Exception:
+            self._count(self._errors, operation)
+            raise
+        finally:
+            self._histogram(operation).observe(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = list(self._latency)
+        return {
+            "max_workers": self.max_workers,
+            "timeout": self.timeout,
+            "operations": {
+                operation: {
+                    "latency": self._latency[operation].snapshot(),
+                    "errors": self._errors.get(operation, 0),
+                    "timeouts": self._timeouts.get(operation, 0)
+                }
+                for operation in operations
+            }
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _histogram(self, operation: str) -> LatencyHistogram:
+        with self._lock:
+            if operation not in self._latency:
+                self._latency[operation] = LatencyHistogram()
+            return self._latency[operation]
+
+    def _count(self, counters: Dict[str, int], operation: str) -> None:
+        with self._lock:
+            counters[operation] = counters.get(operation, 0) + 1
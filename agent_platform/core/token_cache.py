@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def token_hash(token: str) -> str:
+    """Stable digest so raw bearer tokens are never kept in memory"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """Verified principals keyed by token hash, each kept no longer than its token's exp"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_revoked: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_revoked = max_revoked or max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float, str]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        # Revoked token hashes, remembered until the token would have expired anyway, oldest first
+        self._revoked: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Any]:
+        """Return the cached principal for a token that is still valid"""
+        key = token_hash(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or key in self._revoked:
+                self.misses += 1
+                return None
+
+            principal, expires_at, user_id = entry
+            if expires_at <= now:
+                self._drop(key, user_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, principal: Any, user_id: str, expires_at: Optional[float]) -> None:
+        """Cache a principal until the token's exp; tokens without exp are not cached"""
+        if expires_at is None or expires_at <= time.time():
+            return
+        key = token_hash(token)
+        with self._lock:
+            if key in self._revoked:
+                return
+            self._entries[key] = (principal, float(expires_at), user_id)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (_, _, old_user) = self._entries.popitem(last=False)
+                self._forget_user_key(old_key, old_user)
+
+    def is_revoked(self, token: str) -> bool:
+        key = token_hash(token)
+        with self._lock:
+            expires_at = self._revoked.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def revoke(self, token: str, expires_at: Optional[float] = None) -> None:
+        """Invalidate a verified token, e.g. on logout
+
+        At most max_revoked revocations are kept; past that the oldest is
+        forgotten, leaving that token to the Supabase session check.
+        """
+        key = token_hash(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at = expires_at or entry[1]
+                self._drop(key, entry[2])
+            # Unknown exp: remember for a day, longer than any Supabase access token
+            self._revoked[key] = expires_at or time.time() + 86400
+            self._revoked.move_to_end(key)
+            self._purge_revoked()
+            while len(self._revoked) > self.max_revoked:
+                self._revoked.popitem(last=False)
+
+    def revoke_user(self, user_id: str) -> None:
+        """Drop every cached principal for a user so their next request re-verifies"""
+        with self._lock:
+            for key in self._by_user.pop(user_id, set()):
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "revoked": len(self._revoked),
+                "max_revoked": self.max_revoked,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _drop(self, key: str, user_id: str) -> None:
+        self._entries.pop(key, None)
+        self._forget_user_key(key, user_id)
+
+    def _forget_user_key(self, key: str, user_id: str) -> None:
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def _purge_revoked(self) -> None:
+        now = time.time()
+        for key in [k for k, expires_at in self._revoked.items() if expires_at <= now]:
+            del self._revoked[key]
@@ -32,15 +32,21 @@ const auth = {
   enable2FA: (data) => api.post('/auth/2fa/enable', data),
 };
 
+// fields: array of keys to return, so list and card views only download what they render
+const fieldsParam = (fields) => (fields ? { fields: fields.join(',') } : {});
+
 const agents = {
   createAgent: (agentData) => api.post('/agents', agentData),
-  getAgent: (agentId) => api.get(`/agents/${agentId}`),
-  listAgents: () => api.get('/agents'),
+  getAgent: (agentId, fields) => api.get(`/agents/${agentId}`, { params: fieldsParam(fields) }),
+  getAgents: (agentIds, fields) => api.get('/agents:batch', {
+    params: { ids: agentIds.join(','), ...fieldsParam(fields) }
+  }),
+  listAgents: (params = {}, fields) => api.get('/agents', { params: { ...params, ...fieldsParam(fields) } }),
   runAgent: (agentId, message) => api.post(`/agents/${agentId}/run`, { message }),
 };
 
 const marketplace = {
-  listListings: () => api.get('/marketplace'),
+  listListings: (params = {}, fields) => api.get('/marketplace', { params: { ...params, ...fieldsParam(fields) } }),
   createListing: (listingData) => api.post('/marketplace', listingData),
   rentAgent: (listingId) => api.post(`/marketplace/${listingId}/rent`),
   purchaseAgent: (listingId) => api.post(`/marketplace/${listingId}/purchase`),
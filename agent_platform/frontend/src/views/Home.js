@@ -11,8 +11,8 @@ const Home = () => {
   useEffect(() => {
     const fetchFeaturedAgents = async () => {
       try {
-        const response = await api.agents.listAgents();
-        setFeaturedAgents(response.data.slice(0, 3)); // Get top 3 agents
+        const response = await api.agents.listAgents({ limit: 3 }, ['id', 'name', 'description', 'rating']);
+        setFeaturedAgents(response.data); // Top 3 agents, only the fields the cards show
       } catch (err) {
         setError(err.message);
       } finally {
@@ -3,6 +3,9 @@ import { useNavigate } from 'react-router-dom';
 import api from '../services/api';
 import { toast } from 'react-toastify';
 
+// Everything an agent card renders
+const AGENT_CARD_FIELDS = ['id', 'name', 'description', 'rating', 'price'];
+
 const Profile = () => {
   const navigate = useNavigate();
   const fileInputRef = useRef(null);
@@ -27,10 +30,14 @@ const Profile = () => {
         setIsLoading(true);
         const response = await api.gamification.getUserStats();
         const profileResponse = await api.gamification.getProfile();
+        const createdResponse = await api.agents.listAgents(
+          { owner_id: profileResponse.data.id },
+          AGENT_CARD_FIELDS
+        );
         
         setUserData({
           ...profileResponse.data,
-          createdAgents: response.data.createdAgents || [],
+          createdAgents: createdResponse.data || [],
           purchasedAgents: response.data.purchasedAgents || []
         });
         
@@ -1,25 +1,50 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 import uvicorn
+import asyncio
+import json
+import logging
 import os
 from datetime import datetime
 
 from agent_platform.core.agent_framework import AgentFramework
+from agent_platform.core.execution import AdmissionError
+from agent_platform.core.models.run import RunStatus
 from agent_platform.core.models.marketplace import ListingType, RentalDuration, PricingModel
-from agent_platform.core.models.gamification import AchievementType, BadgeRarity
-from agent_platform.core.auth import get_current_user, router as auth_router
-from agent_platform.core.models.database import Base, engine
+from agent_platform.core.models.gamification import AchievementType, BadgeRarity, LeaderboardEntry, ACHIEVEMENTS
+from agent_platform.core.auth import get_current_user, token_cache, supabase_calls, router as auth_router
+from agent_platform.core.models.database import Base, engine, get_db, get_async_db, pool_metrics
+from agent_platform.core.db_operations import AsyncDBOperations
+from agent_platform.core.marketplace_store import listing_from_row
+from agent_platform.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from agent_platform.core.projection import LISTING_FIELDS, agent_view_for, parse_fields, project
+from agent_platform.core.response_cache import ACHIEVEMENTS_TTL, LEADERBOARD_TTL, MARKETPLACE_TTL
+from agent_platform.core.events import EVENTS_HEARTBEAT, event_filters
+from agent_platform.core.status_registry import STATUS_BULK_MAX
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app and framework
 app = FastAPI(title="Agent Platform API")
 framework = AgentFramework()
 
+# Longest a client may block on GET /api/v1/runs/{run_id}/wait
+MAX_RUN_WAIT_SECONDS = float(os.getenv("MAX_RUN_WAIT_SECONDS", "120"))
+# How often a request waiting on a durably queued run rechecks its status
+RUN_QUEUE_POLL_INTERVAL = float(os.getenv("RUN_QUEUE_POLL_INTERVAL", "0.5"))  # seconds
+# Users allowed to read /api/v1/metrics, which exposes internal load and cache state
+METRICS_USER_IDS = {user_id.strip() for user_id in os.getenv("METRICS_USER_IDS", "").split(",") if user_id.strip()}
+
 # Include auth routes
 app.include_router(auth_router)
 
@@ -35,6 +60,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def load_leaderboard():
+    try:
+        loaded = framework.load_leaderboard()
+        logger.info(f"Loaded {loaded} agents into the leaderboard")
+    except Exception as e:
+        # Boards fill in as agents run; the routes fall back to the database meanwhile
+        logger.warning(f"Could not load leaderboard from database: {str(e)}")
+
+@app.on_event("startup")
+def load_achievements():
+    try:
+        loaded = framework.load_achievements()
+        logger.info(f"Loaded achievement progress for {loaded} users")
+    except Exception as e:
+        # Aggregates then start from zero and only count events from now on
+        logger.warning(f"Could not load achievement progress from database: {str(e)}")
+
+@app.on_event("startup")
+def setup_search():
+    try:
+        framework.search.setup()
+    except Exception as e:
+        # Retried on the first search or agent write
+        logger.warning(f"Could not set up agent search: {str(e)}")
+
+@app.on_event("startup")
+def load_active_rentals():
+    try:
+        loaded = framework.load_active_rentals()
+        logger.info(f"Loaded {loaded} active rentals")
+    except Exception as e:
+        logger.warning(f"Could not load active rentals from database: {str(e)}")
+
+@app.on_event("startup")
+def load_agent_statuses():
+    try:
+        loaded = framework.status.load()
+        logger.info(f"Loaded {loaded} persisted agent statuses")
+    except Exception as e:
+        logger.warning(f"Could not load agent statuses from database: {str(e)}")
+
+@app.on_event("startup")
+async def start_events():
+    await framework.events.start()
+
+@app.on_event("shutdown")
+async def stop_events():
+    await framework.events.stop()
+
+@app.on_event("shutdown")
+def shutdown_engine():
+    framework.engine.shutdown(wait=False)
+    if framework.process_pool:
+        framework.process_pool.shutdown()
+    supabase_calls.shutdown()
+    framework.marketplace.stop()
+    framework.stats_buffer.stop()
+
 # Health check endpoint
 @app.get("/api/v1/health")
 async def health_check():
@@ -47,12 +131,18 @@ class AgentCreate(BaseModel):
     model: str
     tools: List[str] = []
     allowed_imports: List[str] = []
+    max_run_seconds: Optional[float] = Field(None, gt=0)
+    max_steps: Optional[int] = Field(None, ge=1)
+    max_tool_calls: Optional[int] = Field(None, ge=1)
 
 class AgentUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     model: Optional[str] = None
     tools: Optional[List[str]] = None
+    max_run_seconds: Optional[float] = Field(None, gt=0)
+    max_steps: Optional[int] = Field(None, ge=1)
+    max_tool_calls: Optional[int] = Field(None, ge=1)
 
 class ListingCreate(BaseModel):
     agent_id: str
@@ -65,8 +155,12 @@ class ListingCreate(BaseModel):
 class RentalCreate(BaseModel):
     listing_id: str
 
+class RatingCreate(BaseModel):
+    rating: float = Field(..., ge=1, le=5)
+
 class ChatMessage(BaseModel):
     message: str
+    timeout: Optional[float] = Field(None, gt=0)  # seconds; can only tighten the agent's limit
 
 class UserStats(BaseModel):
     achievements: List[str]
@@ -80,54 +174,402 @@ class UserUpdate(BaseModel):
     email: Optional[str] = None
     totp_enabled: Optional[bool] = None
 
+def _agent_view(agent, view: str, fields: Optional[List[str]] = None) -> dict:
+    """Serialize an agent loaded with the matching AGENT_LOAD_PROFILES entry, keeping only fields if given"""
+    if view == "summary":
+        data = agent.to_summary_dict()
+    elif view == "detail":
+        data = agent.to_detail_dict()
+    else:
+        data = agent.to_dict()
+    return project(data, fields)
+
+def _view_for(fields: Optional[str], view: str):
+    try:
+        return agent_view_for(fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Agent routes
 @app.get("/api/v1/agents")
-async def get_agents(user=Depends(get_current_user)):
-    # Return all agents for now, regardless of owner
-    return [agent.to_dict() for agent in framework.agents.values()]
+async def get_agents(
+    response: Response,
+    owner_id: Optional[str] = None,
+    listed: Optional[bool] = None,
+    sort: str = "id",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    view: str = "full",
+    fields: Optional[str] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """One page of agents; view is summary, full or detail, each loaded in a fixed number of queries
+
+    fields=name,price returns only those keys, loaded through the narrowest
+    view that has them all. Other users' agents that aren't listed are left out.
+    """
+    view, names = _view_for(fields, view)
+    try:
+        agents, next_cursor = await AsyncDBOperations.page_agents(
+            db, owner_id=owner_id, listed=listed, sort=sort, cursor=cursor, limit=limit, profile=view,
+            visible_to=None if owner_id == user.id else user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_agent_view(agent, view, names) for agent in agents]
 
 @app.post("/api/v1/agents")
-async def create_agent(agent: AgentCreate, user=Depends(get_current_user)):
+async def create_agent(agent: AgentCreate, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     config = {
         "name": agent.name,
         "description": agent.description,
         "model": agent.model,
         "tools": agent.tools,
         "allowed_imports": agent.allowed_imports,
+        "max_run_seconds": agent.max_run_seconds,
+        "max_steps": agent.max_steps,
+        "max_tool_calls": agent.max_tool_calls,
         "owner_id": user.id
     }
-    created_agent = framework.create_agent(config)
+    created_agent = await framework.create_agent_async(config, db)
     return created_agent.to_dict()
 
+@app.get("/api/v1/agents/status")
+async def get_agent_statuses(ids: str, user=Depends(get_current_user)):
+    """Live status of up to STATUS_BULK_MAX agents, served from memory
+
+    Agents with no recorded transition are idle. Agents known to belong to
+    someone else are left out.
+    """
+    agent_ids = list(dict.fromkeys(agent_id for agent_id in ids.split(",") if agent_id))
+    if not agent_ids:
+        raise HTTPException(status_code=400, detail="No agent ids given")
+    if len(agent_ids) > STATUS_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {STATUS_BULK_MAX} agent ids per request")
+    return {
+        agent_id: status.to_dict()
+        for agent_id, status in framework.status.get_many(agent_ids).items()
+        if status.owner_id in (None, user.id)
+    }
+
+@app.get("/api/v1/agents:batch")
+async def get_agents_batch(
+    ids: str,
+    view: str = "full",
+    fields: Optional[str] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Up to MAX_PAGE_SIZE agents in one query, in the order asked
+
+    Unknown agents, and other users' agents that aren't listed, are left out.
+    """
+    agent_ids = list(dict.fromkeys(agent_id for agent_id in ids.split(",") if agent_id))
+    if not agent_ids:
+        raise HTTPException(status_code=400, detail="No agent ids given")
+    if len(agent_ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} agent ids per request")
+    view, names = _view_for(fields, view)
+    try:
+        rows = await AsyncDBOperations.get_agents_by_ids(db, agent_ids, profile=view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    agents = {agent.id: agent for agent in rows if agent.owner_id == user.id or agent.is_listed}
+    return [_agent_view(agents[agent_id], view, names) for agent_id in agent_ids if agent_id in agents]
+
 @app.get("/api/v1/agents/{agent_id}")
-async def get_agent(agent_id: str, user=Depends(get_current_user)):
-    agent = framework.get_agent(agent_id)
+async def get_agent(
+    agent_id: str,
+    view: str = "full",
+    fields: Optional[str] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    view, names = _view_for(fields, view)
+    try:
+        rows = await AsyncDBOperations.get_agents_by_ids(db, [agent_id], profile=view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    agent = rows[0] if rows else None
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     if agent.owner_id != user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
-    return agent.to_dict()
+    return _agent_view(agent, view, names)
+
+async def _submit_run(agent, message: ChatMessage, user, on_step=None):
+    """Queue a run in the user's priority class, turning load shedding into 429/503 with Retry-After
+
+    With the durable run queue enabled, runs go to the queue for standalone
+    workers; streamed runs still execute here, next to their connection.
+    """
+    priority = await run_in_threadpool(framework.run_priority, agent.id, agent.owner_id, user.id)
+    try:
+        if framework.run_queue is not None and on_step is None:
+            return await run_in_threadpool(
+                framework.run_queue.enqueue, agent.id, message.message, user_id=user.id,
+                owner_id=agent.owner_id, priority=priority, timeout=message.timeout
+            )
+        return framework.engine.submit(
+            agent.id, message.message, user_id=user.id, on_step=on_step,
+            timeout=message.timeout, owner_id=agent.owner_id, priority=priority
+        )
+    except AdmissionError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def _find_run(run_id: str):
+    """A run from this process's engine, or else from the durable queue"""
+    run = framework.engine.get(run_id)
+    if run is None and framework.run_queue is not None:
+        run = await run_in_threadpool(framework.run_queue.get, run_id)
+    return run
+
+async def _wait_run(run, timeout: Optional[float] = None):
+    """Wait for a run to finish or the timeout to elapse, then return it
+
+    Takes the run rather than its id: an engine run can drop out of the
+    engine's history once it finishes.
+    """
+    if framework.run_queue is None or framework.engine.get(run.id) is run:
+        return await framework.engine.wait_async(run, timeout)
+
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    while True:
+        latest = await run_in_threadpool(framework.run_queue.get, run.id)
+        if latest is None:
+            # An engine run that finished and was pruned while we looked
+            return run
+        run = latest
+        if run.status.is_terminal or (deadline is not None and loop.time() >= deadline):
+            return run
+        delay = RUN_QUEUE_POLL_INTERVAL if deadline is None else min(RUN_QUEUE_POLL_INTERVAL, deadline - loop.time())
+        await asyncio.sleep(max(delay, 0))
 
 @app.post("/api/v1/agents/{agent_id}/run")
-async def run_agent(agent_id: str, message: ChatMessage, user=Depends(get_current_user)):
-    agent = framework.get_agent(agent_id)
+async def run_agent(agent_id: str, message: ChatMessage, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    agent = await framework.get_agent_async(agent_id, db)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+        
+    run = await _submit_run(agent, message, user)
+        
+    timeout = None
+    if framework.run_queue is not None:
+        # Nothing here enforces a queued run's deadline until a worker claims it, so bound the wait
+        timeout = min(message.timeout or MAX_RUN_WAIT_SECONDS, MAX_RUN_WAIT_SECONDS)
+    run = await _wait_run(run, timeout)
+    if not run.status.is_terminal:
+        await run_in_threadpool(framework.run_queue.cancel, run.id, "Run did not finish in time")
+        raise HTTPException(status_code=504, detail=f"Run did not finish within {timeout:g}s")
+    if run.status != RunStatus.SUCCEEDED:
+        raise HTTPException(status_code=500, detail=run.error)
+    return {"response": run.result}
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+@app.post("/api/v1/agents/{agent_id}/run/stream")
+async def stream_agent_run(
+    agent_id: str,
+    message: ChatMessage,
+    request: Request,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Run an agent and stream each step as server-sent events
+
+    Emits "run" once the run is queued, a "step" per agent step, "final_answer",
+    and "end" with the finished run. If the client disconnects, the run is
+    cancelled.
+    """
+    agent = await framework.get_agent_async(agent_id, db)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+        
+    loop = asyncio.get_running_loop()
+    updates: asyncio.Queue = asyncio.Queue()
+
+    def on_step(event):
+        # Called from the worker thread between agent steps
+        loop.call_soon_threadsafe(updates.put_nowait, event)
+
+    run = await _submit_run(agent, message, user, on_step=on_step)
+    finished = asyncio.ensure_future(framework.engine.wait_async(run))
+    finished.add_done_callback(lambda _: updates.put_nowait(None))
+
+    async def stream():
+        try:
+            yield _sse("run", run.to_dict())
+            while True:
+                try:
+                    event = await asyncio.wait_for(updates.get(), EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    yield _sse("end", run.to_dict())
+                    break
+                yield _sse(event["type"], event)
+        finally:
+            if not run.status.is_terminal:
+                framework.engine.cancel(run.id, "Client disconnected")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/v1/agents/{agent_id}/runs", status_code=202)
+async def submit_run(agent_id: str, message: ChatMessage, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    agent = await framework.get_agent_async(agent_id, db)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
         
+    run = await _submit_run(agent, message, user)
+    return run.to_dict()
+
+@app.post("/api/v1/agents/{agent_id}/ratings")
+async def rate_agent(agent_id: str, body: RatingCreate, user=Depends(get_current_user)):
     try:
-        result = await framework.run_agent(agent_id, message.message)
-        return {"response": result}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        rating, count = await run_in_threadpool(framework.rate_agent, agent_id, user.id, body.rating)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"agent_id": agent_id, "rating": rating, "rating_count": count}
+
+@app.get("/api/v1/runs/{run_id}")
+async def get_run(run_id: str, user=Depends(get_current_user)):
+    run = await _find_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return run.to_dict()
+
+@app.post("/api/v1/runs/{run_id}/cancel")
+async def cancel_run(run_id: str, user=Depends(get_current_user)):
+    run = await _find_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if framework.engine.get(run_id) is not None:
+        cancelled = framework.engine.cancel(run_id)
+    else:
+        # Queued runs cancel at once; running ones stop at their worker's next heartbeat
+        cancelled = await run_in_threadpool(framework.run_queue.cancel, run_id)
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Run is already {run.status.value}")
+    # Threaded runs stop at their next step; give the common case a moment to settle
+    run = await _wait_run(run, timeout=1.0)
+    return run.to_dict()
+
+@app.get("/api/v1/runs/{run_id}/wait")
+async def wait_for_run(
+    run_id: str,
+    timeout: float = Query(30.0, ge=0, le=MAX_RUN_WAIT_SECONDS),
+    user=Depends(get_current_user)
+):
+    run = await _find_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    run = await _wait_run(run, timeout)
+    return run.to_dict()
+
+@app.patch("/api/v1/agents/{agent_id}")
+async def update_agent(agent_id: str, update: AgentUpdate, user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    agent = await AsyncDBOperations.get_agent(db, agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if agent.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+        
+    update_data = update.dict(exclude_unset=True)
+    updated_agent = await framework.update_agent_async(agent_id, update_data, db)
+    return updated_agent.to_dict()
 
 # Marketplace routes
 @app.get("/api/v1/marketplace")
-async def get_marketplace_listings():
-    return [listing.to_dict() for listing in framework.listings.values()]
+async def get_marketplace_listings(
+    request: Request,
+    type: Optional[ListingType] = None,
+    status: Optional[str] = "active",
+    seller_id: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: str = "newest",
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        names = parse_fields(fields, LISTING_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def build(headers: Dict[str, str]):
+        try:
+            listings, next_cursor = await AsyncDBOperations.page_listings(
+                db,
+                listing_type=type,
+                status=status,
+                seller_id=seller_id,
+                min_price=min_price,
+                max_price=max_price,
+                sort=sort,
+                cursor=cursor,
+                limit=limit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return [project(listing_from_row(listing).to_dict(), names) for listing in listings]
+
+    return await framework.response_cache.respond(request, MARKETPLACE_TTL, ["marketplace"], build)
+
+@app.get("/api/v1/marketplace/search")
+async def search_agents(
+    q: str = Query(..., min_length=1, max_length=200),
+    listed_only: bool = True,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    view: str = "full",
+    fields: Optional[str] = None,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text agent search; listed_only=false adds the caller's own unlisted agents, never anyone else's"""
+    view, names = _view_for(fields, view)
+    owner_id = None if listed_only else user.id
+    hits = await run_in_threadpool(framework.search.search, q, limit, offset, True, owner_id)
+    try:
+        rows = await AsyncDBOperations.get_agents_by_ids(db, [hit.agent_id for hit in hits], profile=view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    agents = {agent.id: agent for agent in rows}
+    return [
+        {**_agent_view(agents[hit.agent_id], view, names), "score": hit.score}
+        for hit in hits
+        if hit.agent_id in agents
+    ]
 
 @app.post("/api/v1/marketplace")
-async def create_listing(listing: ListingCreate, user=Depends(get_current_user)):
-    agent = framework.get_agent(listing.agent_id)
+async def create_listing(listing: ListingCreate, user=Depends(get_current_user), db: Session = Depends(get_db)):
+    agent = framework.get_agent(listing.agent_id, db)
     if not agent or agent.owner_id != user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
         
@@ -141,17 +583,29 @@ async def create_listing(listing: ListingCreate, user=Depends(get_current_user))
     return framework.create_listing(
         agent_id=listing.agent_id,
         listing_type=listing.type,
-        pricing=pricing
+        pricing=pricing,
+        db=db
     ).to_dict()
 
 @app.post("/api/v1/marketplace/{listing_id}/rent")
-async def rent_agent(listing_id: str, user=Depends(get_current_user)):
+async def rent_agent(listing_id: str, user=Depends(get_current_user), db: Session = Depends(get_db)):
     try:
-        rental = framework.create_rental(listing_id, user.id)
+        rental = framework.create_rental(listing_id, user.id, db)
         return rental.to_dict()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/v1/marketplace/rentals/{rental_id}/cancel")
+async def cancel_rental(rental_id: str, user=Depends(get_current_user)):
+    rental = framework.rentals.get(rental_id)
+    if not rental or rental.renter_id != user.id:
+        raise HTTPException(status_code=404, detail="Rental not found")
+        
+    try:
+        return framework.end_rental(rental_id, status="cancelled").to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/v1/marketplace/{listing_id}/purchase")
 async def purchase_agent(listing_id: str, user=Depends(get_current_user)):
     listing = framework.listings.get(listing_id)
@@ -160,10 +614,18 @@ async def purchase_agent(listing_id: str, user=Depends(get_current_user)):
         
     if listing.type != ListingType.SALE:
         raise HTTPException(status_code=400, detail="Listing is not for sale")
+    if listing.status != "active":
+        raise HTTPException(status_code=400, detail="Listing is no longer available")
+        
+    try:
+        sold = await run_in_threadpool(framework.marketplace.sell_listing, listing_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not sold:
+        raise HTTPException(status_code=400, detail="Listing is no longer available")
         
     try:
         framework._record_transaction(listing, user.id)
-        framework.listings.pop(listing_id)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -176,15 +638,153 @@ async def get_user_stats(user=Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="User progress not found")
     return progress.to_dict()
 
-@app.get("/api/v1/leaderboard/{category}")
-async def get_leaderboard(category: str):
-    if category not in framework.leaderboard:
+def _get_board(category: str):
+    board = framework.leaderboard.get(category)
+    if board is None:
         raise HTTPException(status_code=404, detail="Leaderboard category not found")
-    return [entry.to_dict() for entry in framework.leaderboard[category]]
+    return board
+
+@app.get("/api/v1/leaderboard/{category}")
+async def get_leaderboard(
+    request: Request,
+    category: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    board = _get_board(category)
+
+    async def build(headers: Dict[str, str]):
+        if len(board):
+            return [entry.to_dict() for entry in board.page(offset, limit)]
+            
+        # Nothing recorded in this process yet; serve the persisted stats
+        rows = await AsyncDBOperations.get_leaderboard(db, category, limit=limit, offset=offset)
+        return [
+            LeaderboardEntry(agent_id=agent_id, score=score or 0, category=category, rank=offset + position + 1).to_dict()
+            for position, (agent_id, score) in enumerate(rows)
+        ]
+
+    return await framework.response_cache.respond(request, LEADERBOARD_TTL, ["leaderboard"], build)
+
+@app.get("/api/v1/leaderboard/{category}/me")
+async def get_my_rank(
+    category: str,
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    board = _get_board(category)
+    agents = await AsyncDBOperations.list_agents(db, owner_id=user.id, limit=1000, profile="summary")
+    entries = [board.get(agent.id) for agent in agents]
+    return sorted(
+        (entry.to_dict() for entry in entries if entry is not None),
+        key=lambda entry: entry["rank"]
+    )
+
+@app.get("/api/v1/leaderboard/{category}/agents/{agent_id}")
+async def get_agent_rank(category: str, agent_id: str):
+    entry = _get_board(category).get(agent_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Agent has no leaderboard entry")
+    return entry.to_dict()
 
 @app.get("/api/v1/achievements")
-async def get_achievements():
-    return {id: achievement.to_dict() for id, achievement in ACHIEVEMENTS.items()}
+async def get_achievements(request: Request):
+    async def build(headers: Dict[str, str]):
+        return {id: achievement.to_dict() for id, achievement in ACHIEVEMENTS.items()}
+
+    return await framework.response_cache.respond(request, ACHIEVEMENTS_TTL, ["achievements"], build)
+
+# Event routes
+async def _subscribe(topics: str, agents: Optional[str], token: Optional[str]):
+    """Subscribe to the bus; browsers can't set headers on EventSource or WebSocket, so the token is a query param"""
+    user = await get_current_user(token) if token else None
+    try:
+        filters = event_filters(
+            [topic for topic in topics.split(",") if topic],
+            [agent_id for agent_id in agents.split(",") if agent_id] if agents else None,
+            user.id if user else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return framework.events.subscribe(filters)
+
+@app.get("/api/v1/events/stream")
+async def stream_events(
+    request: Request,
+    topics: str = "leaderboard",
+    agents: Optional[str] = None,
+    token: Optional[str] = None
+):
+    """Server-sent events for leaderboard diffs and agent status transitions"""
+    subscription = await _subscribe(topics, agents, token)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=EVENTS_HEARTBEAT)
+                yield event.to_sse() if event is not None else ": keep-alive\n\n"
+        finally:
+            framework.events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/v1/events/ws")
+async def events_websocket(
+    websocket: WebSocket,
+    topics: str = "leaderboard",
+    agents: Optional[str] = None,
+    token: Optional[str] = None
+):
+    """WebSocket push of the same events as /api/v1/events/stream"""
+    try:
+        subscription = await _subscribe(topics, agents, token)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    await websocket.accept()
+
+    async def pump():
+        while True:
+            event = await subscription.get()
+            await websocket.send_json(event.to_dict())
+
+    sender = asyncio.create_task(pump())
+    try:
+        # Clients only need to send to disconnect; anything they send is ignored
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        framework.events.unsubscribe(subscription)
+
+# Metrics routes
+@app.get("/api/v1/metrics")
+async def get_metrics(user=Depends(get_current_user)):
+    if user.id not in METRICS_USER_IDS:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "agent_pool": framework.agent_pool.stats(),
+        "auth_cache": token_cache.stats(),
+        "database": pool_metrics.stats(),
+        "entity_cache": framework.entities.stats(),
+        "events": framework.events.stats(),
+        "execution": framework.engine.stats(),
+        "marketplace": framework.marketplace.stats(),
+        "process_pool": framework.process_pool.stats() if framework.process_pool else None,
+        "response_cache": framework.response_cache.stats(),
+        "run_queue": await run_in_threadpool(framework.run_queue.stats) if framework.run_queue else None,
+        "stats_buffer": framework.stats_buffer.stats(),
+        "status": framework.status.stats(),
+        "supabase": supabase_calls.stats()
+    }
 
 @app.patch("/api/v1/users/me")
 async def update_user_profile(
@@ -19,6 +19,9 @@ class AgentPlatformUI {
         this.userStats = null;
         this.achievements = null;
         this.agents = [];
+        this.leaderboards = [];
+        this.events = null;
+        this.needsResync = false;
         this.availableTools = {
             'search': { name: 'Web Search' },
             'calculator': { name: 'Calculator' },
@@ -27,7 +30,42 @@ class AgentPlatformUI {
         };
         
         this.initEventListeners();
-        this.loadInitialData();
+        this.loadInitialData().then(() => this.subscribeToEvents());
+    }
+
+    subscribeToEvents() {
+        // Leaderboard and agent status changes are pushed instead of polled
+        const params = new URLSearchParams({topics: 'leaderboard,agent_status', token: 'test-token'});
+        this.events = new EventSource(`${API_BASE_URL}/events/stream?${params}`);
+        this.events.addEventListener('leaderboard', (e) => this.applyLeaderboardChange(JSON.parse(e.data).data));
+        this.events.addEventListener('agent_status', (e) => this.applyAgentStatus(JSON.parse(e.data).data));
+        // Sent when we fell behind, and implied after a reconnect, so start over from the API
+        this.events.addEventListener('resync', () => this.loadLeaderboards());
+        this.events.addEventListener('error', () => { this.needsResync = true; });
+        this.events.addEventListener('open', () => {
+            if (this.needsResync) {
+                this.needsResync = false;
+                this.loadLeaderboards();
+                this.loadAgents();
+            }
+        });
+    }
+
+    applyLeaderboardChange({category, agent_id, score, rank}) {
+        const board = this.leaderboards.find(b => b.category === category);
+        if (!board) return;
+        board.entries = board.entries.filter(entry => entry.agent_id !== agent_id);
+        if (rank !== null && rank <= board.entries.length + 1) {
+            board.entries.splice(rank - 1, 0, {agent_id, score, category, rank});
+        }
+        this.updateLeaderboardsDisplay(this.leaderboards);
+    }
+
+    applyAgentStatus({agent_id, status}) {
+        const agent = this.agents.find(a => a.id === agent_id);
+        if (!agent) return;
+        agent.status = status;
+        this.renderAgents(this.agents);
     }
 
     async loadAgents() {
@@ -133,7 +171,8 @@ class AgentPlatformUI {
                     return null;
                 })
             );
-            this.updateLeaderboardsDisplay(leaderboards.filter(Boolean));
+            this.leaderboards = leaderboards.filter(Boolean);
+            this.updateLeaderboardsDisplay(this.leaderboards);
         } catch (error) {
             console.error('Error loading leaderboards:', error);
         }
@@ -0,0 +1,15 @@
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Denormalize the rented agent onto rentals so active-rental lookups skip the listings join
+    op.add_column('rentals', sa.Column('agent_id', sa.String(), sa.ForeignKey('agents.id'), nullable=True))
+    op.execute(
+        "UPDATE rentals SET agent_id = "
+        "(SELECT listings.agent_id FROM listings WHERE listings.id = rentals.listing_id)"
+    )
+    op.create_index('ix_rentals_agent_id_status', 'rentals', ['agent_id', 'status'])
+
+def downgrade():
+    op.drop_index('ix_rentals_agent_id_status', table_name='rentals')
+    op.drop_column('rentals', 'agent_id')
@@ -0,0 +1,12 @@
+from alembic import op
+
+def upgrade():
+    # Composite indexes backing the keyset-paginated agent and listing endpoints
+    op.create_index('ix_agents_owner_id_is_listed', 'agents', ['owner_id', 'is_listed'])
+    op.create_index('ix_listings_type_status_base_price', 'listings', ['type', 'status', 'base_price'])
+    op.create_index('ix_listings_status_created_at', 'listings', ['status', 'created_at'])
+
+def downgrade():
+    op.drop_index('ix_listings_status_created_at', table_name='listings')
+    op.drop_index('ix_listings_type_status_base_price', table_name='listings')
+    op.drop_index('ix_agents_owner_id_is_listed', table_name='agents')
@@ -0,0 +1,17 @@
+from alembic import op
+
+def upgrade():
+    # Postgres only; on SQLite the FTS5 tables are created by AgentSearch at startup
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS agent_search ("
+        "agent_id VARCHAR PRIMARY KEY REFERENCES agents(id) ON DELETE CASCADE, "
+        "document TSVECTOR NOT NULL)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_agent_search_document ON agent_search USING GIN (document)")
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP TABLE IF EXISTS agent_search")
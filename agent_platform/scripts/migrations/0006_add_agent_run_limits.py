@@ -0,0 +1,13 @@
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Per-agent run limits; NULL means the engine defaults apply
+    op.add_column('agents', sa.Column('max_run_seconds', sa.Float(), nullable=True))
+    op.add_column('agents', sa.Column('max_steps', sa.Integer(), nullable=True))
+    op.add_column('agents', sa.Column('max_tool_calls', sa.Integer(), nullable=True))
+
+def downgrade():
+    op.drop_column('agents', 'max_tool_calls')
+    op.drop_column('agents', 'max_steps')
+    op.drop_column('agents', 'max_run_seconds')
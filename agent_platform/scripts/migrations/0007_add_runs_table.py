@@ -0,0 +1,38 @@
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Durable run queue claimed by standalone workers
+    op.create_table(
+        'runs',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('agent_id', sa.String(), sa.ForeignKey('agents.id'), nullable=False),
+        sa.Column('owner_id', sa.String(), nullable=True),
+        sa.Column('user_id', sa.String(), nullable=True),
+        sa.Column('task', sa.Text(), nullable=False),
+        sa.Column('priority', sa.String(), nullable=False, server_default='public'),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('timeout', sa.Float(), nullable=True),
+        sa.Column('steps', sa.Integer(), server_default='0'),
+        sa.Column('tool_calls', sa.Integer(), server_default='0'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('cancel_requested', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('lease_owner', sa.String(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('submitted_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_runs_status_available_at', 'runs', ['status', 'available_at'])
+    op.create_index('ix_runs_status_lease_expires_at', 'runs', ['status', 'lease_expires_at'])
+    op.create_index('ix_runs_agent_id_status', 'runs', ['agent_id', 'status'])
+
+def downgrade():
+    op.drop_index('ix_runs_agent_id_status', table_name='runs')
+    op.drop_index('ix_runs_status_lease_expires_at', table_name='runs')
+    op.drop_index('ix_runs_status_available_at', table_name='runs')
+    op.drop_table('runs')
@@ -0,0 +1,9 @@
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Ratings behind agent_stats.rating, so a new one can be folded into the average
+    op.add_column('agent_stats', sa.Column('rating_count', sa.Integer(), nullable=True, server_default='0'))
+
+def downgrade():
+    op.drop_column('agent_stats', 'rating_count')
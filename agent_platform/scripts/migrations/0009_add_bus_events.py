@@ -0,0 +1,18 @@
+from alembic import op
+import sqlalchemy as sa
+
+def upgrade():
+    # Event relay between workers where the database has no LISTEN/NOTIFY
+    op.create_table(
+        'bus_events',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('topic', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('origin', sa.String(), nullable=False),
+        sa.Column('timestamp', sa.Float(), nullable=False),
+    )
+    op.create_index('ix_bus_events_timestamp', 'bus_events', ['timestamp'])
+
+def downgrade():
+    op.drop_index('ix_bus_events_timestamp', table_name='bus_events')
+    op.drop_table('bus_events')
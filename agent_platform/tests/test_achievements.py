@@ -0,0 +1,46 @@
+import pytest
+from agent_platform.core.achievements import AchievementTracker
+from agent_platform.core.models.gamification import Achievement, AchievementType, UserProgress
+
+@pytest.fixture
+def tracker():
+    achievements = {
+        "first_sale": Achievement("first_sale", "First Sale", "", AchievementType.EARNINGS, 1, "💰", 100),
+        "top_seller": Achievement("top_seller", "Top Seller", "", AchievementType.EARNINGS, 1000, "🏆", 500),
+        "five_star": Achievement("five_star", "Five Star", "", AchievementType.RATING, 5.0, "⭐", 1000),
+    }
+    return AchievementTracker(achievements)
+
+@pytest.fixture
+def progress():
+    return UserProgress(user_id="user1", achievements=set(), badges=[], total_points=0, level=1, stats={})
+
+def test_sales_accumulate_and_award_in_threshold_order(tracker, progress):
+    assert [a.id for a in tracker.record_sale(progress, 10)] == ["first_sale"]
+    assert tracker.record_sale(progress, 10) == []
+    assert [a.id for a in tracker.record_sale(progress, 980)] == ["top_seller"]
+
+    assert progress.stats["earnings"] == 1000
+    assert progress.achievements == {"first_sale", "top_seller"}
+    assert progress.total_points == 600
+
+def test_achievement_awarded_once(tracker, progress):
+    progress.achievements.add("first_sale")
+    tracker.record_sale(progress, 5)
+
+    assert progress.total_points == 0
+    assert progress.badges == []
+
+def test_rating_uses_running_average(tracker, progress):
+    assert tracker.record_rating(progress, 5.0)[0].id == "five_star"
+    assert progress.level == 2
+
+    other = UserProgress(user_id="user2", achievements=set(), badges=[], total_points=0, level=1, stats={})
+    tracker.record_rating(other, 5.0)
+    tracker.record_rating(other, 4.0)
+    assert "five_star" in other.achievements
+
+def test_evaluate_uses_loaded_aggregates(tracker, progress):
+    progress.stats["earnings"] = 2000
+    assert {a.id for a in tracker.evaluate(progress)} == {"first_sale", "top_seller"}
+    assert progress.to_dict()["achievements"] == ["first_sale", "top_seller"]
@@ -0,0 +1,71 @@
+import pytest
+from agent_platform.core.admission import AdmissionController, EngineBusyError, RateLimitedError
+
+@pytest.fixture
+def admission():
+    return AdmissionController(
+        max_inflight=4, max_pending=8, agent_limit=1, owner_limit=2, agent_queue_size=2, owner_queue_size=3
+    )
+
+def test_agent_limit_queues_in_order(admission):
+    assert admission.admit("r1", "a1")
+    assert not admission.admit("r2", "a1")
+    assert not admission.admit("r3", "a1")
+    assert admission.release("r1") == ["r2"]
+    assert admission.release("r2") == ["r3"]
+    assert admission.stats()["queue_wait_ms"]["samples"] == 3
+
+def test_busy_agent_does_not_block_others(admission):
+    assert admission.admit("r1", "a1")
+    assert not admission.admit("r2", "a1")
+    assert admission.admit("r3", "a2")
+
+def test_full_agent_queue_is_rate_limited(admission):
+    admission.admit("r1", "a1")
+    admission.admit("r2", "a1")
+    admission.admit("r3", "a1")
+    with pytest.raises(RateLimitedError) as excinfo:
+        admission.admit("r4", "a1")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after >= 1
+    assert admission.stats()["rate_limited"] == 1
+
+def test_owner_limit_spans_agents(admission):
+    assert admission.admit("r1", "a1", owner_id="u1")
+    assert admission.admit("r2", "a2", owner_id="u1")
+    assert not admission.admit("r3", "a3", owner_id="u1")
+    assert admission.admit("r4", "a4", owner_id="u2")
+    assert admission.release("r1") == ["r3"]
+
+def test_owner_queue_is_rate_limited(admission):
+    admission.admit("r1", "a1", owner_id="u1")
+    admission.admit("r2", "a2", owner_id="u1")
+    for i in range(3):
+        admission.admit(f"q{i}", f"b{i}", owner_id="u1")
+    with pytest.raises(RateLimitedError):
+        admission.admit("q3", "b3", owner_id="u1")
+
+def test_global_limit_sheds_with_503():
+    admission = AdmissionController(max_inflight=1, max_pending=2, agent_limit=0, owner_limit=0)
+    assert admission.admit("r1", "a1")
+    assert not admission.admit("r2", "a2")
+    with pytest.raises(EngineBusyError) as excinfo:
+        admission.admit("r3", "a3")
+    assert excinfo.value.status_code == 503
+    assert admission.stats()["overloaded"] == 1
+
+def test_release_skips_runs_still_over_their_limit(admission):
+    admission.admit("r1", "a1")
+    admission.admit("r2", "a2")
+    assert not admission.admit("r3", "a1")
+    assert not admission.admit("r4", "a2")
+    assert admission.release("r2") == ["r4"]
+    assert admission.stats()["queued"] == 1
+
+def test_discard_waiting(admission):
+    admission.admit("r1", "a1")
+    admission.admit("r2", "a1")
+    assert admission.discard("r2")
+    assert not admission.discard("r1")
+    assert admission.release("r1") == []
+    assert admission.stats()["inflight"] == 0
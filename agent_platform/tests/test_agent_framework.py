@@ -1,4 +1,5 @@
 import pytest
+from contextlib import contextmanager
 from unittest.mock import MagicMock, patch, Mock
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
@@ -17,17 +18,15 @@ def mock_db_session():
     return session
 
 @pytest.fixture
-def mock_get_db(mock_db_session):
-    def get_db():
-        try:
-            yield mock_db_session
-        finally:
-            pass
-    return get_db
+def mock_session_scope(mock_db_session):
+    @contextmanager
+    def session_scope():
+        yield mock_db_session
+    return session_scope
 
 @pytest.fixture
-def agent_framework(mock_get_db):
-    with patch('agent_platform.core.agent_framework.get_db', mock_get_db):
+def agent_framework(mock_session_scope):
+    with patch('agent_platform.core.agent_framework.session_scope', mock_session_scope):
         framework = AgentFramework()
         # Register duckduckgo tool
         mock_tool = MagicMock()
@@ -36,35 +35,7 @@ def agent_framework(mock_get_db):
         framework.available_tools = {"duckduckgo": mock_tool}
         framework.agents = {}  # Add agents dictionary
         yield framework
-
-def test_create_agent(agent_framework, mock_db_session):
-    config = {
-        "name": "test_agent",
-        "description": "test description",
-        "tools": ["duckduckgo"],
-        "model": "gpt-4",
-        "owner_id": "user1",
-        "allowed_imports": ["datetime"]
-    }
-    
-    # Test successful creation
-    with patch('agent_platform.core.db_operations.AgentState') as mock_state:
-        mock_state.return_value = MagicMock(
-            status="idle",
-            last_updated=datetime.now()
-        )
-        with patch('agent_platform.core.db_operations.Agent') as mock_agent:
-            mock_agent.return_value = MagicMock(
-                id=str(uuid.uuid4()),
-                created_at=datetime.now(),
-                updated_at=datetime.now(),
-                state=mock_state.return_value
-            )
-            result = agent_framework.create_agent(config)
-            assert isinstance(result, Agent)
-            mock_db_session.add.assert_called()
-            mock_db_session.commit.assert_called()
-            mock_db_session.refresh.assert_called()
+        framework.marketplace.stop()
 
 def test_get_agent(agent_framework, mock_db_session):
     # Setup mock agent
@@ -132,23 +103,6 @@ def test_record_transaction(agent_framework, mock_db_session):
     assert len(agent_framework.transactions) == 1
     assert agent_framework.transactions[0].amount == 10.0
 
-def test_check_achievements(agent_framework, mock_db_session):
-    # Setup user progress
-    agent_framework.user_progress["user1"] = {
-        "tasks_completed": 5,
-        "transactions": 3,
-        "earnings": 100.0
-    }
-    
-    # Setup mock achievements
-    mock_achievement = MagicMock()
-    mock_db_session.query.return_value.filter.return_value.all.return_value = [mock_achievement]
-    
-    # Test achievement checking
-    agent_framework._check_achievements("user1")
-    mock_db_session.commit.assert_called()
-    mock_db_session.add.assert_called()
-
 def test_update_leaderboard(agent_framework, mock_db_session):
     # Create an agent first
     config = {
@@ -166,3 +120,251 @@ def test_update_leaderboard(agent_framework, mock_db_session):
     assert len(agent_framework.leaderboard["earnings"]) > 0
     assert len(agent_framework.leaderboard["rating"]) > 0
     assert len(agent_framework.leaderboard["tasks"]) > 0
+
+def test_each_call_uses_its_own_session(agent_framework):
+    sessions = []
+
+    @contextmanager
+    def session_scope():
+        session = MagicMock(spec=Session)
+        sessions.append(session)
+        yield session
+
+    with patch('agent_platform.core.agent_framework.session_scope', session_scope), \
+            patch.object(DBOperations, 'get_agent', return_value=MagicMock()) as mock_get:
+        agent_framework.get_agent("agent1")
+        agent_framework.entities.invalidate("agent", "agent1")
+        agent_framework.get_agent("agent1")
+
+    assert len(sessions) == 2
+    assert [call.args[0] for call in mock_get.call_args_list] == sessions
+
+def test_repeated_lookups_hit_the_entity_cache(agent_framework):
+    with patch.object(DBOperations, 'get_agent', return_value=MagicMock()) as mock_get, \
+            patch.object(DBOperations, 'update_agent'):
+        first = agent_framework.get_agent("agent1")
+        assert agent_framework.get_agent("agent1") is first
+        agent_framework.update_agent("agent1", {"description": "changed"})
+        agent_framework.get_agent("agent1")
+
+    assert mock_get.call_count == 2
+
+def test_caller_session_is_reused(agent_framework, mock_db_session):
+    request_session = MagicMock(spec=Session)
+
+    with patch.object(DBOperations, 'get_agent', return_value=MagicMock()) as mock_get:
+        agent_framework.get_agent("agent1", request_session)
+
+    mock_get.assert_called_once_with(request_session, "agent1")
+
+def test_active_rental_index(agent_framework):
+    from agent_platform.core.models.marketplace import MarketplaceListing, ListingType, PricingModel
+
+    listing = MarketplaceListing(
+        id="listing_0",
+        agent_id="agent1",
+        seller_id="user1",
+        type=ListingType.RENT,
+        pricing=PricingModel(base_price=10.0)
+    )
+    agent_framework.listings[listing.id] = listing
+
+    with patch.object(agent_framework, '_record_transaction'):
+        rental = agent_framework.create_rental(listing.id, "user2")
+
+    assert agent_framework._get_active_rental("agent1") is rental
+    assert agent_framework._get_active_rental("agent2") is None
+
+    agent_framework.end_rental(rental.id)
+    assert rental.status == "cancelled"
+    assert agent_framework._get_active_rental("agent1") is None
+
+def test_elapsed_rental_expires_on_lookup(agent_framework):
+    from agent_platform.core.models.marketplace import Rental
+
+    rental = Rental(
+        id="rental_0",
+        listing_id="listing_0",
+        renter_id="user2",
+        start_time=datetime.now() - timedelta(days=2),
+        end_time=datetime.now() - timedelta(days=1),
+        agent_id="agent1"
+    )
+    agent_framework.rentals[rental.id] = rental
+    agent_framework._active_rentals["agent1"] = {rental.id: rental}
+
+    assert agent_framework._get_active_rental("agent1") is None
+    assert rental.status == "expired"
+    assert "agent1" not in agent_framework._active_rentals
+
+def test_leaderboard_changes_are_published(agent_framework):
+    agent = MagicMock()
+    agent.stats.earnings = 10.0
+    agent.stats.rating = 4.5
+    agent.stats.tasks_completed = 3
+    agent_framework.events.publish = MagicMock()
+
+    with patch.object(agent_framework, '_get_agent', return_value=agent):
+        agent_framework._update_leaderboard("agent1")
+        assert agent_framework.events.publish.call_count == 4
+        topic, data = agent_framework.events.publish.call_args_list[0].args
+        assert topic == "leaderboard"
+        assert data == {"category": "earnings", "agent_id": "agent1", "score": 10.0, "rank": 1, "previous_rank": None}
+
+        # Unchanged stats produce no diffs
+        agent_framework.events.publish.reset_mock()
+        agent_framework._update_leaderboard("agent1")
+        agent_framework.events.publish.assert_not_called()
+
+def test_status_transitions_are_published(agent_framework, mock_db_session):
+    agent = MagicMock()
+    agent.id = "agent1"
+    agent.owner_id = "user1"
+    agent_framework.events.publish = MagicMock()
+
+    agent_framework._set_status(agent, "busy")
+    agent_framework._set_status(agent, "busy")
+
+    agent_framework.events.publish.assert_called_once_with("agent_status", {
+        "agent_id": "agent1",
+        "owner_id": "user1",
+        "status": "busy",
+        "previous_status": "idle"
+    })
+    # Busy is not durable, so nothing was written
+    mock_db_session.commit.assert_not_called()
+    assert agent_framework.status.get("agent1").status == "busy"
+
+@pytest.fixture
+def agent_db(tmp_path):
+    from sqlalchemy import create_engine
+    from agent_platform.core.models.base import Base
+    from agent_platform.core.models.agent import DBAgent, DBAgentStats
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'agents.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(DBAgent(id="agent1", name="first", owner_id="user1", model="gpt-4", tools=["duckduckgo"],
+                       created_at=datetime.now(), updated_at=datetime.now()))
+        db.add(DBAgentStats(agent_id="agent1", tasks_completed=3, earnings=2.0, rating=4.5))
+        db.commit()
+
+    @contextmanager
+    def session_scope():
+        with Session(engine) as session:
+            yield session
+
+    with patch('agent_platform.core.agent_framework.session_scope', session_scope):
+        yield engine
+
+def test_cached_agent_is_loaded_with_its_stats(agent_framework, agent_db):
+    agent = agent_framework.get_agent("agent1")
+    assert agent.config.tools == ["duckduckgo"]
+
+    # Served from the cache, detached from the session that loaded it
+    agent_framework._update_leaderboard("agent1")
+    assert agent_framework.leaderboard["tasks"].get("agent1").score == 3
+    assert agent_framework.get_agent("agent1") is agent
+    assert not hasattr(agent, "instance")
+
+def test_async_lookup_uses_the_same_cache(agent_framework, agent_db, tmp_path):
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async def lookup():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'agents.db'}")
+        try:
+            async with AsyncSession(engine) as db:
+                return await agent_framework.get_agent_async("agent1", db)
+        finally:
+            await engine.dispose()
+
+    agent = asyncio.run(lookup())
+    assert agent.stats.rating == 4.5
+    assert agent_framework.get_agent("agent1") is agent
+
+def test_rating_updates_average_leaderboard_and_achievements(agent_framework, agent_db):
+    agent_framework.rate_agent("agent1", "user2", 5.0)
+    average, count = agent_framework.rate_agent("agent1", "user3", 4.0)
+
+    assert (average, count) == (4.5, 2)
+    assert agent_framework.get_agent("agent1").stats.rating == 4.5
+    assert agent_framework.leaderboard["rating"].get("agent1").score == 4.5
+    assert agent_framework.user_progress["user1"].stats["rating_count"] == 2
+    assert "five_star" in agent_framework.user_progress["user1"].achievements
+
+def test_rating_is_validated(agent_framework, agent_db):
+    with pytest.raises(ValueError):
+        agent_framework.rate_agent("agent1", "user2", 6)
+    with pytest.raises(ValueError):
+        agent_framework.rate_agent("agent1", "user1", 5)
+
+def test_achievement_progress_is_seeded_from_the_database(agent_framework, agent_db):
+    assert agent_framework.load_achievements() == 1
+
+    progress = agent_framework.user_progress["user1"]
+    assert progress.stats["tasks_completed"] == 3
+    assert progress.stats["earnings"] == 2.0
+    assert "first_sale" in progress.achievements
+
+    # Later events add to the seeded totals
+    agent_framework.achievements.record_task(progress)
+    assert progress.stats["tasks_completed"] == 4
+
+def test_rental_missing_from_the_index_is_loaded_from_the_database(agent_framework, agent_db):
+    from agent_platform.core.models.marketplace import DBRental
+
+    with Session(agent_db) as db:
+        db.add(DBRental(id="rental_9", listing_id="listing_9", agent_id="agent1", renter_id="user2",
+                        start_time=datetime.now(), status="active"))
+        db.commit()
+
+    rental = agent_framework._get_active_rental("agent1")
+    assert rental.id == "rental_9"
+    assert agent_framework._active_rentals["agent1"] == {"rental_9": rental}
+
+    # Ended here but not flushed yet: the stale row mustn't bring it back
+    agent_framework.end_rental("rental_9")
+    assert agent_framework._get_active_rental("agent1") is None
+
+def test_create_agent(agent_framework, agent_db):
+    from agent_platform.core.models.agent import DBAgentState
+
+    agent = agent_framework.create_agent({
+        "name": "test_agent",
+        "description": "test description",
+        "tools": ["duckduckgo"],
+        "model": "gpt-4",
+        "owner_id": "user1",
+        "allowed_imports": ["datetime"]
+    })
+
+    stored = agent_framework.get_agent(agent.id)
+    assert stored.config.allowed_imports == ["datetime"]
+    assert stored.stats.tasks_completed == 0
+    assert stored.created_at == stored.updated_at
+    with Session(agent_db) as db:
+        assert db.query(DBAgentState).filter_by(agent_id=agent.id).one().status == "idle"
+    assert len(agent_framework.agent_pool) == 1
+
+def test_update_agent(agent_framework, agent_db):
+    before = agent_framework.get_agent("agent1").updated_at
+
+    agent = agent_framework.update_agent("agent1", {"description": "changed", "max_steps": 4})
+
+    assert agent.description == "changed"
+    stored = agent_framework.get_agent("agent1")
+    assert (stored.description, stored.max_steps) == ("changed", 4)
+    assert stored.updated_at > before
+    with pytest.raises(ValueError):
+        agent_framework.update_agent("missing", {"description": "changed"})
+
+def test_delete_agent_removes_its_rows(agent_framework, agent_db):
+    from agent_platform.core.models.agent import DBAgent, DBAgentStats
+
+    agent_framework.delete_agent("agent1")
+
+    with Session(agent_db) as db:
+        assert db.query(DBAgent).count() == 0
+        assert db.query(DBAgentStats).count() == 0
+    assert agent_framework.get_agent("agent1") is None
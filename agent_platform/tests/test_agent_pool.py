@@ -0,0 +1,130 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from agent_platform.core.agent_pool import AgentInstancePool, config_version
+from agent_platform.core.execution import RunCancelledError, RunControl
+from agent_platform.core.models.agent import AgentConfig
+
+@pytest.fixture
+def pool():
+    return AgentInstancePool(max_size=2, ttl=60, max_per_agent=2)
+
+def test_released_instance_is_reused(pool):
+    factory = MagicMock(side_effect=lambda: object())
+
+    with pool.lease("agent1", "v1", factory) as first:
+        pass
+    with pool.lease("agent1", "v1", factory) as second:
+        pass
+
+    assert first is second
+    assert factory.call_count == 1
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+
+def test_concurrent_leases_get_distinct_instances(pool):
+    with pool.lease("agent1", "v1", object) as first:
+        with pool.lease("agent1", "v1", object) as second:
+            assert first is not second
+            assert pool.stats()["leased"] == 2
+    assert len(pool) == 2
+
+def test_acquire_waits_at_per_agent_cap():
+    pool = AgentInstancePool(max_size=4, ttl=60, max_per_agent=1)
+    first = pool.acquire("agent1", "v1", object)
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire("agent1", "v1", object)))
+    waiter.start()
+    waiter.join(0.2)
+
+    assert waiter.is_alive()
+    assert pool.stats()["waits"] >= 1
+
+    pool.release(first)
+    waiter.join(2)
+    assert acquired == [first]
+
+def test_waiting_run_gives_up_when_cancelled(monkeypatch):
+    monkeypatch.setattr("agent_platform.core.agent_pool.POOL_WAIT_SLICE", 0.01)
+    pool = AgentInstancePool(max_size=4, ttl=60, max_per_agent=1)
+    pool.acquire("agent1", "v1", object)
+    control = RunControl()
+    errors = []
+
+    def wait():
+        try:
+            pool.acquire("agent1", "v1", object, control)
+        except RunCancelledError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    control.cancel(RunCancelledError("Agent stopped"))
+    waiter.join(2)
+
+    assert not waiter.is_alive()
+    assert [str(e) for e in errors] == ["Agent stopped"]
+    assert pool.stats()["waits"] == 1
+
+def test_failed_build_frees_its_slot():
+    pool = AgentInstancePool(max_size=2, ttl=60, max_per_agent=1)
+    with pytest.raises(RuntimeError):
+        pool.acquire("agent1", "v1", MagicMock(side_effect=RuntimeError("no model")))
+
+    assert pool.acquire("agent1", "v1", object) is not None
+
+def test_version_change_rebuilds(pool):
+    with pool.lease("agent1", "v1", object) as first:
+        pass
+    with pool.lease("agent1", "v2", object) as second:
+        pass
+
+    assert first is not second
+    assert pool.stats()["evictions"] == 1
+
+def test_lru_eviction(pool):
+    pool.put("agent1", "v1", "a1")
+    pool.put("agent2", "v1", "a2")
+    pool.release(pool.acquire("agent1", "v1", object))
+    pool.put("agent3", "v1", "a3")
+
+    assert pool.acquire("agent2", "v1", lambda: "built") == "built"
+    assert pool.acquire("agent1", "v1", object) == "a1"
+
+def test_ttl_expiry():
+    pool = AgentInstancePool(max_size=2, ttl=10)
+    with patch("agent_platform.core.agent_pool.time.monotonic", return_value=100.0):
+        pool.put("agent1", "v1", "a1")
+    with patch("agent_platform.core.agent_pool.time.monotonic", return_value=111.0):
+        assert pool.acquire("agent1", "v1", lambda: "built") == "built"
+    assert pool.stats()["evictions"] == 1
+
+def test_invalidate(pool):
+    pool.put("agent1", "v1", "a1")
+    pool.invalidate("agent1")
+
+    assert pool.acquire("agent1", "v1", lambda: "built") == "built"
+
+def test_instance_leased_across_invalidate_is_dropped(pool):
+    instance = pool.acquire("agent1", "v1", object)
+    pool.invalidate("agent1")
+    pool.release(instance)
+
+    assert len(pool) == 0
+    assert pool._generations == {}
+
+def test_invalidating_idle_agents_keeps_no_state(pool):
+    for n in range(100):
+        pool.invalidate(f"agent{n}")
+    pool.put("agent1", "v1", "a1")
+    pool.clear()
+
+    assert pool._generations == {}
+
+def test_config_version_tracks_instance_fields():
+    base = AgentConfig(name="a", model="gpt-4", tools=["search"])
+    renamed = AgentConfig(name="b", description="other", model="gpt-4", tools=["search"])
+    retooled = AgentConfig(name="a", model="gpt-4", tools=["search", "text_to_speech"])
+
+    assert config_version(base) == config_version(renamed)
+    assert config_version(base) != config_version(retooled)
@@ -0,0 +1,77 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+from agent_platform.core.db_operations import DBOperations
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.agent import DBAgent, DBAgentStats
+from agent_platform.core.models.marketplace import DBListing, DBRental, ListingType
+from agent_platform.core.models.user import DBUser
+
+AGENTS = 1000
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    now = datetime.now()
+    with Session(engine) as db:
+        db.add(DBUser(id="user1", username="owner", email="owner@example.com", hashed_password="x"))
+        for i in range(AGENTS):
+            agent_id = f"agent_{i:04d}"
+            db.add(DBAgent(id=agent_id, name=f"Agent {i}", owner_id="user1", model="gpt-4",
+                           tools=["duckduckgo"], agent_metadata={"i": i}, created_at=now, updated_at=now))
+            db.add(DBAgentStats(agent_id=agent_id, tasks_completed=i, rating=4.5))
+            if i % 10 == 0:
+                db.add(DBListing(id=f"listing_{i}", agent_id=agent_id, seller_id="user1",
+                                 type=ListingType.RENT, base_price=1.0))
+                db.add(DBRental(id=f"rental_{i}", listing_id=f"listing_{i}", agent_id=agent_id,
+                                renter_id="user1", start_time=now, status="active"))
+        db.commit()
+    return engine
+
+@pytest.fixture
+def count_queries(engine):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    yield statements
+    event.remove(engine, "before_cursor_execute", listener)
+
+@pytest.mark.parametrize("profile, serialize, queries", [
+    ("summary", DBAgent.to_summary_dict, 1),
+    ("full", DBAgent.to_dict, 1),
+    # selectinload batches its IN lists 500 ids at a time
+    ("detail", DBAgent.to_detail_dict, 1 + 2 * 2),
+])
+def test_serializing_a_list_takes_constant_queries(engine, count_queries, profile, serialize, queries):
+    with Session(engine) as db:
+        agents = DBOperations.list_agents(db, limit=AGENTS, profile=profile)
+        rows = [serialize(agent) for agent in agents]
+    assert len(rows) == AGENTS
+    assert len(count_queries) == queries
+
+def test_summary_defers_json_columns(engine):
+    with Session(engine) as db:
+        agent = DBOperations.list_agents(db, limit=1, profile="summary")[0]
+        assert "tools" not in agent.__dict__
+        assert agent.to_summary_dict()["tasks_completed"] == 0
+
+def test_detail_includes_relationships(engine):
+    with Session(engine) as db:
+        agent = DBOperations.list_agents(db, limit=1, profile="detail")[0]
+        detail = agent.to_detail_dict()
+    assert detail["owner"] == "owner"
+    assert detail["listing_ids"] == ["listing_0"]
+    assert detail["active_rentals"] == 1
+
+def test_unloaded_relationships_raise_instead_of_querying(engine):
+    with Session(engine) as db:
+        agent = DBOperations.list_agents(db, limit=1, profile="full")[0]
+        with pytest.raises(InvalidRequestError):
+            agent.listings
+
+def test_unknown_profile_is_rejected(engine):
+    with Session(engine) as db, pytest.raises(ValueError):
+        DBOperations.list_agents(db, profile="everything")
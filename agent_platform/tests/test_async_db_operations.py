@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from agent_platform.core.db_operations import AsyncDBOperations
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.agent import AgentConfig, DBAgent, DBAgentStats
+from agent_platform.core.models.user import DBUser
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def db_url(tmp_path):
+    path = tmp_path / "agents.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    now = datetime.now()
+    with Session(engine) as db:
+        db.add(DBUser(id="user1", username="owner", email="owner@example.com", hashed_password="x"))
+        db.add(DBAgent(id="agent1", name="Agent 1", owner_id="user1", model="gpt-4", tools=["duckduckgo"],
+                       max_steps=5, created_at=now, updated_at=now))
+        db.add(DBAgentStats(agent_id="agent1", tasks_completed=3, rating=4.5))
+        db.commit()
+    engine.dispose()
+    return f"sqlite+aiosqlite:///{path}"
+
+def in_session(db_url, work):
+    async def main():
+        engine = create_async_engine(db_url)
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                return await work(db)
+        finally:
+            await engine.dispose()
+    return run(main())
+
+def test_get_agent_loads_stats(db_url):
+    async def work(db):
+        agent = await AsyncDBOperations.get_agent(db, "agent1")
+        db.expunge(agent)
+        return agent
+
+    agent = in_session(db_url, work)
+
+    assert isinstance(agent, DBAgent)
+    # Loaded up front, so reading it needs no session
+    assert agent.stats.tasks_completed == 3
+
+def test_get_agent_missing_returns_none(db_url):
+    assert in_session(db_url, lambda db: AsyncDBOperations.get_agent(db, "missing")) is None
+
+def test_agent_config_comes_from_columns(db_url):
+    agent = in_session(db_url, lambda db: AsyncDBOperations.get_agent(db, "agent1"))
+
+    assert agent.config == AgentConfig(name="Agent 1", model="gpt-4", tools=["duckduckgo"], max_steps=5)
+
+def test_create_agent(db_url):
+    agent = in_session(db_url, lambda db: AsyncDBOperations.create_agent(db, {
+        "id": "agent2", "name": "Agent 2", "owner_id": "user1", "model": "gpt-4", "tools": ["duckduckgo"]
+    }))
+
+    assert agent.to_dict()["created_at"] == agent.to_dict()["updated_at"]
+    stored = in_session(db_url, lambda db: AsyncDBOperations.get_agent(db, "agent2"))
+    assert stored.config.tools == ["duckduckgo"]
+    assert stored.stats.tasks_completed == 0
+
+def test_create_agent_requires_an_owner(db_url):
+    with pytest.raises(ValueError):
+        in_session(db_url, lambda db: AsyncDBOperations.create_agent(db, {"id": "agent2", "name": "x",
+                                                                          "model": "gpt-4"}))
+
+def test_update_agent(db_url):
+    in_session(db_url, lambda db: AsyncDBOperations.update_agent(db, "agent1", {"name": "Renamed"}))
+
+    agent = in_session(db_url, lambda db: AsyncDBOperations.get_agent(db, "agent1"))
+    assert agent.name == "Renamed"
+
+def test_update_missing_agent_raises(db_url):
+    with pytest.raises(ValueError):
+        in_session(db_url, lambda db: AsyncDBOperations.update_agent(db, "missing", {"name": "x"}))
+
+def test_get_agents_by_ids(db_url):
+    agents = in_session(db_url, lambda db: AsyncDBOperations.get_agents_by_ids(db, ["agent1", "missing"],
+                                                                              profile="summary"))
+
+    assert [agent.to_summary_dict()["tasks_completed"] for agent in agents] == [3]
+
+def test_page_agents_hides_other_users_unlisted_agents(db_url):
+    def page(**kwargs):
+        agents, _ = in_session(db_url, lambda db: AsyncDBOperations.page_agents(db, **kwargs))
+        return [agent.id for agent in agents]
+
+    assert page(owner_id="user1", visible_to="user2") == []
+    assert page(listed=False, visible_to="user2") == []
+    assert page(owner_id="user1", visible_to="user1") == ["agent1"]
+    assert page(owner_id="user1") == ["agent1"]
@@ -0,0 +1,30 @@
+import pytest
+from agent_platform.core.models.database import _async_url, PoolMetrics
+
+@pytest.mark.parametrize("sync_url,async_driver", [
+    ("sqlite:///./agent_platform.db", "sqlite+aiosqlite"),
+    ("postgresql://user:pw@db:5432/postgres", "postgresql+asyncpg"),
+    ("postgresql+psycopg2://user:pw@db:5432/postgres", "postgresql+asyncpg"),
+])
+def test_async_url_swaps_driver(sync_url, async_driver):
+    assert _async_url(sync_url).drivername == async_driver
+
+def test_async_url_keeps_credentials():
+    url = _async_url("postgresql://user:pw@db:5432/postgres")
+    assert (url.username, url.password, url.host, url.port) == ("user", "pw", "db", 5432)
+
+def test_async_url_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        _async_url("mysql://user:pw@db/app")
+
+def test_pool_metrics_saturation():
+    metrics = PoolMetrics()
+    metrics.capacity = 4
+    metrics.on_checkout()
+    metrics.on_checkout()
+    metrics.on_checkin()
+
+    stats = metrics.stats()
+    assert stats["checked_out"] == 1
+    assert stats["peak_checked_out"] == 2
+    assert stats["saturation"] == 0.25
@@ -0,0 +1,103 @@
+import time
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from agent_platform.core.entity_cache import EntityCache, INVALIDATE_TOPIC
+from agent_platform.core.events import Event, EventBus
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.agent import DBAgent
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'entities.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(DBAgent(id="agent1", name="first", owner_id="user1", model="gpt-4",
+                       created_at=datetime.now(), updated_at=datetime.now()))
+        db.commit()
+    return engine
+
+class CountingLoader:
+    def __init__(self, db, agent_id="agent1"):
+        self.db = db
+        self.agent_id = agent_id
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.db.get(DBAgent, self.agent_id)
+
+def test_repeated_lookups_load_once(engine):
+    cache = EntityCache()
+    with Session(engine) as db:
+        loader = CountingLoader(db)
+        first = cache.load(db, "agent", "agent1", loader)
+        assert cache.load(db, "agent", "agent1", loader) is first
+    with Session(engine) as db:
+        assert cache.load(db, "agent", "agent1", CountingLoader(db)) is first
+    assert loader.calls == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["session_hits"], stats["hits"]) == (1, 1, 1)
+    # Detached with its columns loaded, so usable after its session closed
+    assert first.name == "first"
+
+def test_invalidate_reloads(engine):
+    cache = EntityCache()
+    with Session(engine) as db:
+        cache.load(db, "agent", "agent1", CountingLoader(db))
+        db.get(DBAgent, "agent1").name = "renamed"
+        db.commit()
+    cache.invalidate("agent", "agent1")
+    with Session(engine) as db:
+        assert cache.load(db, "agent", "agent1", CountingLoader(db)).name == "renamed"
+
+def test_load_racing_an_invalidation_is_not_cached(engine):
+    cache = EntityCache()
+    with Session(engine) as db:
+        def loader():
+            row = db.get(DBAgent, "agent1")
+            cache.invalidate("agent", "agent1")
+            return row
+        assert cache.load(db, "agent", "agent1", loader).name == "first"
+    assert cache.stats()["stale_loads"] == 1
+    assert cache.stats()["size"] == 0
+
+def test_missing_entities_are_not_cached(engine):
+    cache = EntityCache()
+    with Session(engine) as db:
+        loader = CountingLoader(db, "missing")
+        assert cache.load(db, "agent", "missing", loader) is None
+    with Session(engine) as db:
+        cache.load(db, "agent", "missing", loader)
+    assert loader.calls == 2
+
+def test_ttl_and_size_bound_entries():
+    cache = EntityCache(max_size=2, ttl=0.05)
+    for key in ("a", "b", "c"):
+        cache.load(None, "agent", key, lambda: object())
+    assert cache.stats()["size"] == 2
+    time.sleep(0.1)
+    calls = []
+    cache.load(None, "agent", "c", lambda: calls.append(1) or object())
+    assert calls == [1]
+
+def test_invalidations_are_relayed_between_workers():
+    bus = EventBus(backend="memory")
+    cache = EntityCache(events=bus)
+    cache.load(None, "agent", "agent1", lambda: object())
+
+    bus._receive(Event(INVALIDATE_TOPIC, {"kind": "agent", "key": "agent1"}, origin="other-worker"))
+    assert cache.stats()["size"] == 0
+
+def test_load_async_uses_the_same_entries():
+    import asyncio
+
+    cache = EntityCache()
+    value = object()
+
+    async def loader():
+        return value
+
+    assert asyncio.run(cache.load_async(None, "agent", "agent1", loader)) is value
+    assert cache.load(None, "agent", "agent1", lambda: None) is value
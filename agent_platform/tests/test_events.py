@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import pytest
+from agent_platform.core.events import Event, EventBus, Subscription, RESYNC, event_filters
+
+def _run(coro):
+    return asyncio.run(coro)
+
+def test_subscription_filters_by_topic_and_fields():
+    async def scenario():
+        subscription = Subscription({"leaderboard": {"agent_id": frozenset({"a1"})}, "agent_status": {"owner_id": "u1"}})
+        assert subscription.matches(Event("leaderboard", {"agent_id": "a1"}))
+        assert not subscription.matches(Event("leaderboard", {"agent_id": "a2"}))
+        assert subscription.matches(Event("agent_status", {"agent_id": "a9", "owner_id": "u1"}))
+        assert not subscription.matches(Event("agent_status", {"agent_id": "a9", "owner_id": "u2"}))
+        assert not subscription.matches(Event("other", {}))
+    _run(scenario())
+
+def test_full_queue_is_replaced_by_resync():
+    async def scenario():
+        subscription = Subscription({"leaderboard": {}}, queue_size=2)
+        for rank in range(3):
+            subscription.offer(Event("leaderboard", {"rank": rank}))
+        event = await subscription.get(timeout=1)
+        assert event.topic == RESYNC
+        assert await subscription.get(timeout=0.01) is None
+        assert subscription.resyncs == 1
+    _run(scenario())
+
+def test_publish_from_worker_thread_reaches_subscriber():
+    async def scenario():
+        bus = EventBus(backend="memory")
+        await bus.start()
+        subscription = bus.subscribe({"agent_status": {}})
+        thread = threading.Thread(target=bus.publish, args=("agent_status", {"agent_id": "a1", "status": "busy"}))
+        thread.start()
+        thread.join()
+        event = await subscription.get(timeout=1)
+        assert event.data == {"agent_id": "a1", "status": "busy"}
+        assert bus.stats()["subscribers"] == 1
+        bus.unsubscribe(subscription)
+        await bus.stop()
+    _run(scenario())
+
+def test_publish_before_start_is_dropped():
+    bus = EventBus(backend="memory")
+    bus.publish("leaderboard", {"agent_id": "a1"})
+    assert bus.stats()["published"] == 0
+
+def test_relayed_events_skip_own_origin():
+    async def scenario():
+        bus = EventBus(backend="memory")
+        await bus.start()
+        subscription = bus.subscribe({"leaderboard": {}})
+        bus._receive(Event("leaderboard", {"agent_id": "mine"}, origin=bus.origin))
+        bus._receive(Event("leaderboard", {"agent_id": "theirs"}, origin="other-worker"))
+        event = await subscription.get(timeout=1)
+        assert event.data["agent_id"] == "theirs"
+        assert await subscription.get(timeout=0.01) is None
+        assert bus.stats()["relayed"] == 1
+    _run(scenario())
+
+def test_event_filters():
+    assert event_filters(["leaderboard"]) == {"leaderboard": {}}
+    filters = event_filters(["leaderboard", "agent_status"], ["a1"], owner_id="u1")
+    assert filters["agent_status"] == {"agent_id": frozenset({"a1"}), "owner_id": "u1"}
+    with pytest.raises(ValueError):
+        event_filters(["agent_status"])
+    with pytest.raises(ValueError):
+        event_filters(["nope"])
+
+def test_to_sse_names_the_event():
+    message = Event("leaderboard", {"rank": 1}).to_sse()
+    assert message.startswith("event: leaderboard\ndata: {")
+    assert message.endswith("\n\n")
+
+def test_database_bridge_relays_between_buses(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    from agent_platform.core.models import database
+
+    monkeypatch.setattr(database, "engine", create_engine(f"sqlite:///{tmp_path / 'events.db'}"))
+
+    async def scenario():
+        api, worker = EventBus(backend="database"), EventBus(backend="database")
+        await api.start()
+        await worker.start()
+        api._bridge.poll_interval = worker._bridge.poll_interval = 0.05
+        relayed = []
+        api.listen("agent_status", relayed.append)
+        subscription = api.subscribe({"agent_status": {}})
+
+        worker.publish("agent_status", {"agent_id": "a1", "status": "busy"})
+        event = await subscription.get(timeout=2)
+
+        assert event.data == {"agent_id": "a1", "status": "busy"}
+        assert [event.origin for event in relayed] == [worker.origin]
+        assert api.stats()["backend"] == "database"
+        # Nothing of its own comes back to the publisher
+        await asyncio.sleep(0.2)
+        assert worker.stats()["relayed"] == 0
+        await api.stop()
+        await worker.stop()
+    _run(scenario())
@@ -0,0 +1,286 @@
+import asyncio
+import threading
+import pytest
+from agent_platform.core.execution import (
+    ExecutionEngine, EngineBusyError, BudgetExceededError, RunCancelledError, RunControl, RunTimeoutError,
+    count_tool_calls, step_event, stream_steps
+)
+from agent_platform.core.admission import AdmissionController
+from agent_platform.core.models.run import RunStatus
+
+@pytest.fixture
+def engine():
+    engine = ExecutionEngine(lambda agent_id, task, control=None: f"{agent_id}:{task}", max_workers=2)
+    yield engine
+    engine.shutdown()
+
+def test_submit_returns_immediately_and_completes(engine):
+    run = engine.submit("agent1", "task", user_id="user1")
+    assert run.id.startswith("run_")
+
+    finished = engine.wait(run.id, timeout=5)
+    assert finished.status == RunStatus.SUCCEEDED
+    assert finished.result == "agent1:task"
+    assert finished.to_dict()["status"] == "succeeded"
+
+def test_failed_run_records_error():
+    def runner(agent_id, task, control=None):
+        raise ValueError("boom")
+
+    engine = ExecutionEngine(runner, max_workers=1)
+    run = engine.wait(engine.submit("agent1", "task").id, timeout=5)
+    engine.shutdown()
+
+    assert run.status == RunStatus.FAILED
+    assert run.error == "boom"
+
+def test_wait_timeout_leaves_run_going():
+    release = threading.Event()
+    engine = ExecutionEngine(lambda agent_id, task, control=None: release.wait(5), max_workers=1)
+    run = engine.submit("agent1", "task")
+
+    assert engine.wait(run.id, timeout=0.05).status != RunStatus.SUCCEEDED
+    release.set()
+    assert engine.wait(run.id, timeout=5).status == RunStatus.SUCCEEDED
+    engine.shutdown()
+
+def test_wait_async(engine):
+    run = engine.submit("agent1", "task")
+    finished = asyncio.run(engine.wait_async(run.id, timeout=5))
+    assert finished.status == RunStatus.SUCCEEDED
+
+def test_finished_run_can_be_awaited_after_it_is_pruned():
+    engine = ExecutionEngine(lambda agent_id, task, control=None: task, max_workers=1, history_size=1)
+    run = engine.submit("agent1", "first")
+    engine.wait(run, timeout=5)
+    engine.wait(engine.submit("agent1", "second"), timeout=5)
+    engine.submit("agent1", "third")
+
+    assert engine.get(run.id) is None
+    assert asyncio.run(engine.wait_async(run, timeout=5)).result == "first"
+    seen = []
+    engine.add_done_callback(run, seen.append)
+    assert seen == [run]
+    with pytest.raises(ValueError):
+        engine.wait(run.id)
+    engine.shutdown()
+
+def test_max_pending_rejects():
+    release = threading.Event()
+    engine = ExecutionEngine(lambda agent_id, task, control=None: release.wait(5), max_workers=1, max_pending=1)
+    engine.submit("agent1", "task")
+
+    with pytest.raises(EngineBusyError):
+        engine.submit("agent1", "task")
+    release.set()
+    engine.shutdown()
+
+def test_unknown_run(engine):
+    assert engine.get("missing") is None
+    with pytest.raises(ValueError):
+        engine.wait("missing")
+
+class _StreamingAgent:
+    def __init__(self, steps, answer):
+        self.steps = steps
+        self.answer = answer
+        self.closed = False
+
+    def run(self, task, stream=False):
+        assert stream
+        try:
+            for step in self.steps:
+                yield step
+            yield self.answer
+        finally:
+            self.closed = True
+
+def _step(iteration):
+    from smolagents.agents import ActionStep, ToolCall
+
+    return ActionStep(
+        iteration=iteration,
+        llm_output="thinking",
+        tool_call=ToolCall(name="python_interpreter", arguments="print(1)", id="call_0"),
+        observations="1",
+        duration=0.5
+    )
+
+def test_step_event():
+    event = step_event(_step(0))
+    assert event == {
+        "type": "step",
+        "step": 0,
+        "thought": "thinking",
+        "code": "print(1)",
+        "tool_call": {"name": "python_interpreter", "arguments": "print(1)"},
+        "tool_calls": 0,
+        "observation": "1",
+        "error": None,
+        "duration": 0.5
+    }
+
+def test_stream_steps_reports_each_step_then_the_answer():
+    events = []
+    answer = stream_steps(_StreamingAgent([_step(0), _step(1)], "42"), "task", events.append)
+    assert answer == "42"
+    assert [event["type"] for event in events] == ["step", "step", "final_answer"]
+    assert events[-1]["answer"] == "42"
+
+def test_stream_steps_stops_when_on_step_raises():
+    agent = _StreamingAgent([_step(0), _step(1)], "42")
+
+    def on_step(event):
+        raise RunCancelledError("stop")
+
+    with pytest.raises(RunCancelledError):
+        stream_steps(agent, "task", on_step)
+    assert agent.closed
+
+def test_on_step_is_passed_to_runner():
+    def runner(agent_id, task, control=None):
+        control.report({"type": "step", "step": 0})
+        return "done"
+
+    events = []
+    engine = ExecutionEngine(runner, max_workers=1)
+    run = engine.wait(engine.submit("agent1", "task", on_step=events.append).id, timeout=5)
+    engine.shutdown()
+
+    assert run.status == RunStatus.SUCCEEDED
+    assert events == [{"type": "step", "step": 0}]
+
+def test_cancelled_run():
+    def runner(agent_id, task, control=None):
+        raise RunCancelledError("Client disconnected")
+
+    engine = ExecutionEngine(runner, max_workers=1)
+    run = engine.wait(engine.submit("agent1", "task", on_step=lambda event: None).id, timeout=5)
+    engine.shutdown()
+
+    assert run.status == RunStatus.CANCELLED
+    assert run.error == "Client disconnected"
+
+def test_count_tool_calls():
+    from smolagents.agents import ToolCall
+
+    code = ToolCall(name="python_interpreter", arguments="a = web_search(q)\nb = web_search (q2)\nprint(a)", id="0")
+    assert count_tool_calls(code, ["web_search", "print"]) == 3
+    assert count_tool_calls(ToolCall(name="web_search", arguments={}, id="1"), []) == 1
+    assert count_tool_calls(None, ["web_search"]) == 0
+
+def test_control_limits_only_tighten():
+    control = RunControl(timeout=10, max_steps=5)
+    control.limit(timeout=60, max_steps=3, max_tool_calls=4)
+    assert control.timeout == 10
+    assert control.max_steps == 3
+    assert control.max_tool_calls == 4
+
+def test_step_budget():
+    control = RunControl(max_steps=1)
+    control.report({"type": "step", "step": 0, "tool_calls": 0})
+    with pytest.raises(BudgetExceededError):
+        control.report({"type": "step", "step": 1, "tool_calls": 0})
+
+def test_tool_call_budget():
+    control = RunControl(max_tool_calls=2)
+    control.report({"type": "step", "step": 0, "tool_calls": 2})
+    with pytest.raises(BudgetExceededError):
+        control.report({"type": "step", "step": 1, "tool_calls": 1})
+
+def test_cancel_runs_kill_hooks_once():
+    control = RunControl()
+    killed = []
+    with control.kill_hook(lambda: killed.append(True)):
+        assert control.cancel()
+        assert not control.cancel()
+    assert killed == [True]
+    with pytest.raises(RunCancelledError):
+        control.check()
+
+def test_watchdog_times_out_running_run():
+    def runner(agent_id, task, control=None):
+        # A step that ignores the deadline until the watchdog kills it
+        killed = threading.Event()
+        with control.kill_hook(killed.set):
+            killed.wait(5)
+        control.check()
+
+    engine = ExecutionEngine(runner, max_workers=1, default_timeout=0.1, watchdog_interval=0.02)
+    run = engine.wait(engine.submit("agent1", "task").id, timeout=5)
+    engine.shutdown()
+
+    assert run.status == RunStatus.TIMED_OUT
+    assert "deadline" in run.error
+    assert engine.stats()["timed_out"] == 1
+
+def test_request_timeout_tightens_default(engine):
+    run = engine.submit("agent1", "task", timeout=30)
+    assert run.timeout == 30
+    assert engine.submit("agent1", "task", timeout=10_000).timeout == engine.default_timeout
+
+def test_cancel_queued_run():
+    release = threading.Event()
+    engine = ExecutionEngine(lambda agent_id, task, control=None: release.wait(5), max_workers=1)
+    first = engine.submit("agent1", "first")
+    queued = engine.submit("agent1", "second")
+
+    assert engine.cancel(queued.id)
+    release.set()
+    assert engine.wait(queued.id, timeout=5).status == RunStatus.CANCELLED
+    assert engine.wait(first.id, timeout=5).status == RunStatus.SUCCEEDED
+    assert not engine.cancel(first.id)
+    engine.shutdown()
+
+def test_cancel_agent():
+    release = threading.Event()
+
+    def runner(agent_id, task, control=None):
+        release.wait(5)
+        control.check()
+
+    engine = ExecutionEngine(runner, max_workers=2)
+    runs = [engine.submit("agent1", "a"), engine.submit("agent1", "b"), engine.submit("agent2", "c")]
+    assert engine.cancel_agent("agent1") == 2
+    release.set()
+    statuses = [engine.wait(run.id, timeout=5).status for run in runs]
+    engine.shutdown()
+    assert statuses == [RunStatus.CANCELLED, RunStatus.CANCELLED, RunStatus.SUCCEEDED]
+
+def test_agent_limit_holds_runs_without_taking_workers():
+    release = threading.Event()
+    started = []
+
+    def runner(agent_id, task, control=None):
+        started.append(task)
+        if agent_id == "hot":
+            release.wait(5)
+        return task
+
+    engine = ExecutionEngine(runner, max_workers=2,
+                             admission=AdmissionController(max_inflight=2, max_pending=8, agent_limit=1))
+    first = engine.submit("hot", "h1")
+    second = engine.submit("hot", "h2")
+    other = engine.submit("cold", "c1")
+
+    assert engine.wait(other.id, timeout=5).status == RunStatus.SUCCEEDED
+    assert "h2" not in started
+    assert engine.get(second.id).status == RunStatus.QUEUED
+    release.set()
+    assert engine.wait(second.id, timeout=5).status == RunStatus.SUCCEEDED
+    assert engine.get(first.id).status == RunStatus.SUCCEEDED
+    assert engine.stats()["admission"]["queue_wait_ms"]["samples"] == 3
+    engine.shutdown()
+
+def test_cancel_queued_run_frees_its_place():
+    release = threading.Event()
+    engine = ExecutionEngine(lambda agent_id, task, control=None: release.wait(5), max_workers=1,
+                             admission=AdmissionController(max_inflight=1, max_pending=8, agent_limit=1))
+    engine.submit("agent1", "running")
+    queued = engine.submit("agent1", "waiting")
+
+    assert engine.cancel(queued.id)
+    assert engine.wait(queued.id, timeout=1).status == RunStatus.CANCELLED
+    assert engine.stats()["admission"]["queued"] == 0
+    release.set()
+    engine.shutdown()
@@ -0,0 +1,58 @@
+import random
+from agent_platform.core.leaderboard import Leaderboard, LeaderboardRegistry
+
+def test_upsert_keeps_one_entry_per_agent():
+    board = Leaderboard("earnings")
+    board.upsert("agent1", 10)
+    board.upsert("agent1", 30)
+    board.upsert("agent2", 20)
+
+    assert len(board) == 2
+    assert [entry.agent_id for entry in board.page()] == ["agent1", "agent2"]
+    assert board.get("agent1").score == 30
+
+def test_rank_and_ties():
+    board = Leaderboard("tasks")
+    assert board.upsert("b", 5) == 1
+    assert board.upsert("a", 5) == 1
+    assert board.upsert("c", 7) == 1
+
+    assert board.rank("c") == 1
+    assert board.rank("a") == 2
+    assert board.rank("b") == 3
+    assert board.rank("missing") is None
+
+def test_page_offsets():
+    board = Leaderboard("rating")
+    for i in range(10):
+        board.upsert(f"agent{i}", i)
+
+    page = board.page(offset=3, limit=2)
+    assert [(entry.agent_id, entry.rank) for entry in page] == [("agent6", 4), ("agent5", 5)]
+    assert board.page(offset=20) == []
+
+def test_matches_sorted_order_under_random_updates():
+    board = Leaderboard("earnings")
+    scores = {}
+    rng = random.Random(7)
+    for _ in range(2000):
+        agent_id = f"agent{rng.randrange(300)}"
+        if rng.random() < 0.1:
+            board.remove(agent_id)
+            scores.pop(agent_id, None)
+        else:
+            scores[agent_id] = rng.randrange(50)
+            board.upsert(agent_id, scores[agent_id])
+
+    expected = sorted(scores, key=lambda agent_id: (-scores[agent_id], agent_id))
+    assert [entry.agent_id for entry in board.page(0, len(scores))] == expected
+    for rank, agent_id in enumerate(expected, start=1):
+        assert board.rank(agent_id) == rank
+
+def test_registry_removes_agent_from_every_category():
+    registry = LeaderboardRegistry()
+    ranks = registry.upsert("agent1", {"earnings": 5, "rating": 4.5, "tasks": 3, "performance": 3})
+    assert ranks == {"earnings": 1, "rating": 1, "tasks": 1, "performance": 1}
+
+    registry.remove_agent("agent1")
+    assert all(rank is None for rank in registry.ranks("agent1").values())
@@ -0,0 +1,36 @@
+import time
+import pytest
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+from jose import jwt
+from agent_platform.main import app
+from agent_platform.core import auth
+from agent_platform.core.token_cache import VerifiedTokenCache
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = VerifiedTokenCache()
+    monkeypatch.setattr(auth, "token_cache", cache)
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", "secret")
+    monkeypatch.setattr(auth.supabase_calls, "call", AsyncMock())
+    return cache
+
+def _token(**claims):
+    return jwt.encode({"sub": "user1", "aud": "authenticated", "exp": int(time.time()) + 60, **claims},
+                      "secret", algorithm="HS256")
+
+def test_logout_revokes_a_verified_token(cache):
+    token = _token()
+
+    response = TestClient(app).post("/auth/logout", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert cache.is_revoked(token)
+
+def test_logout_ignores_tokens_it_cannot_verify(cache):
+    client = TestClient(app)
+    forged = jwt.encode({"sub": "user1", "aud": "authenticated"}, "other", algorithm="HS256")
+
+    for token in ("not-a-jwt", forged):
+        assert client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert cache.stats()["revoked"] == 0
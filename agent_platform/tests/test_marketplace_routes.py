@@ -0,0 +1,146 @@
+import pytest
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from agent_platform.main import app, framework, get_current_user
+from agent_platform.core.marketplace_store import MarketplaceStore
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.marketplace import MarketplaceListing, ListingType, PricingModel
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'marketplace.db'}")
+    Base.metadata.create_all(engine)
+
+    @contextmanager
+    def session_factory():
+        with Session(engine) as session:
+            yield session
+    return session_factory
+
+@pytest.fixture
+def store(monkeypatch, session_factory):
+    store = MarketplaceStore(session_factory, flush_interval=60)
+    monkeypatch.setattr(framework, "marketplace", store)
+    monkeypatch.setattr(framework, "listings", store.listings)
+    monkeypatch.setattr(framework, "transactions", store.transactions)
+    monkeypatch.setattr(framework, "stats_buffer", MagicMock())
+    yield store
+    store.stop()
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id="buyer")
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_current_user, None)
+
+def _listing(listing_type=ListingType.SALE):
+    return MarketplaceListing(id="listing_1", agent_id="agent1", seller_id="seller", type=listing_type,
+                              pricing=PricingModel(base_price=25.0))
+
+def test_purchase_records_the_sale_and_closes_the_listing(client, store):
+    store.listings.add(_listing())
+
+    response = client.post("/api/v1/marketplace/listing_1/purchase")
+
+    assert response.status_code == 200
+    transactions = store.transactions.values()
+    assert [(tx.buyer_id, tx.seller_id, tx.amount) for tx in transactions] == [("buyer", "seller", 25.0)]
+    framework.stats_buffer.record.assert_called_once_with("agent1", earnings=25.0)
+    assert store.listings.get("listing_1").status == "sold"
+
+def test_sold_listing_cannot_be_bought_again(client, store):
+    store.listings.add(_listing())
+    client.post("/api/v1/marketplace/listing_1/purchase")
+
+    response = client.post("/api/v1/marketplace/listing_1/purchase")
+
+    assert response.status_code == 400
+    assert len(store.transactions.values()) == 1
+
+def test_listing_is_sold_once_across_processes(client, store, session_factory):
+    store.listings.add(_listing())
+    store.flush()
+    # Another worker has the listing cached as active too
+    other = MarketplaceStore(session_factory, flush_interval=60)
+    assert other.listings.get("listing_1").status == "active"
+
+    assert client.post("/api/v1/marketplace/listing_1/purchase").status_code == 200
+    assert other.sell_listing("listing_1") is False
+    assert other.listings.get("listing_1").status == "sold"
+    other.stop()
+    assert len(store.transactions.values()) == 1
+
+def test_only_sale_listings_can_be_bought(client, store):
+    store.listings.add(_listing(ListingType.RENT))
+
+    assert client.post("/api/v1/marketplace/listing_1/purchase").status_code == 400
+
+def test_purchase_of_unknown_listing(client, store):
+    assert client.post("/api/v1/marketplace/missing/purchase").status_code == 404
+
+def test_search_requires_auth():
+    assert TestClient(app).get("/api/v1/marketplace/search?q=weather").status_code == 401
+
+def test_unlisted_search_hits_are_limited_to_the_caller(client, monkeypatch):
+    search = MagicMock(return_value=[])
+    monkeypatch.setattr(framework.search, "search", search)
+
+    client.get("/api/v1/marketplace/search?q=weather")
+    client.get("/api/v1/marketplace/search?q=weather&listed_only=false")
+
+    assert [call.args[3:] for call in search.call_args_list] == [(True, None), (True, "buyer")]
+
+def test_agent_list_only_shows_the_callers_unlisted_agents(client, monkeypatch):
+    from agent_platform import main
+
+    page_agents = AsyncMock(return_value=([], None))
+    monkeypatch.setattr(main.AsyncDBOperations, "page_agents", page_agents)
+
+    client.get("/api/v1/agents?owner_id=seller&listed=false")
+    client.get("/api/v1/agents?owner_id=buyer&listed=false")
+    client.get("/api/v1/agents")
+
+    assert [call.kwargs["visible_to"] for call in page_agents.call_args_list] == ["buyer", None, "buyer"]
+
+def test_queued_run_wait_gives_up_and_cancels(client, monkeypatch, tmp_path):
+    from agent_platform import main
+    from agent_platform.core.models.run import DBRun, RunStatus
+    from agent_platform.core.run_queue import RunQueue
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'runs.db'}")
+    Base.metadata.create_all(engine)
+
+    @contextmanager
+    def session_factory():
+        with Session(engine) as session:
+            yield session
+
+    run_queue = RunQueue(session_factory)
+    monkeypatch.setattr(framework, "run_queue", run_queue)
+    monkeypatch.setattr(framework, "get_agent_async", AsyncMock(return_value=SimpleNamespace(id="agent1",
+                                                                                                 owner_id="seller")))
+    monkeypatch.setattr(framework, "run_priority", lambda *args: "renter")
+    monkeypatch.setattr(main, "RUN_QUEUE_POLL_INTERVAL", 0.01)
+
+    # No worker is running, so the run never leaves the queue
+    response = client.post("/api/v1/agents/agent1/run", json={"message": "hi", "timeout": 0.1})
+
+    assert response.status_code == 504
+    with Session(engine) as db:
+        (run,) = db.query(DBRun).all()
+        assert run.status == RunStatus.CANCELLED.value
+
+def test_metrics_require_auth():
+    assert TestClient(app).get("/api/v1/metrics").status_code == 401
+
+def test_metrics_are_limited_to_listed_users(client, monkeypatch):
+    from agent_platform import main
+
+    assert client.get("/api/v1/metrics").status_code == 403
+
+    monkeypatch.setattr(main, "METRICS_USER_IDS", {"buyer"})
+    assert "agent_pool" in client.get("/api/v1/metrics").json()
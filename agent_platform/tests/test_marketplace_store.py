@@ -0,0 +1,168 @@
+import pytest
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock
+from sqlalchemy.orm import Session
+from agent_platform.core.marketplace_store import MarketplaceStore
+from agent_platform.core.models.marketplace import (
+    MarketplaceListing, Rental, Transaction, ListingType, PricingModel, DBListing, DBRental
+)
+
+@pytest.fixture
+def sessions():
+    return []
+
+@pytest.fixture
+def store(sessions):
+    @contextmanager
+    def session_factory():
+        session = MagicMock(spec=Session)
+        session.query.return_value.filter.return_value.first.return_value = None
+        sessions.append(session)
+        yield session
+
+    store = MarketplaceStore(session_factory, flush_interval=60)
+    yield store
+    store.stop()
+
+def _listing(listing_id="listing_1"):
+    return MarketplaceListing(
+        id=listing_id,
+        agent_id="agent1",
+        seller_id="user1",
+        type=ListingType.RENT,
+        pricing=PricingModel(base_price=10.0)
+    )
+
+def test_writes_are_buffered_and_flushed_in_one_batch(store, sessions):
+    store.listings.add(_listing("listing_1"))
+    store.listings.add(_listing("listing_2"))
+    assert sessions == []
+
+    assert store.flush() == 2
+    assert len(sessions) == 1
+    sessions[0].bulk_insert_mappings.assert_called_once()
+    model, rows = sessions[0].bulk_insert_mappings.call_args.args
+    assert model is DBListing
+    assert [row["id"] for row in rows] == ["listing_1", "listing_2"]
+    sessions[0].commit.assert_called_once()
+
+def test_update_before_flush_stays_an_insert(store, sessions):
+    rental = Rental(id="rental_1", listing_id="listing_1", renter_id="user2",
+                    start_time=datetime.now(), agent_id="agent1")
+    store.rentals.add(rental)
+    rental.usage_count += 1
+    store.rentals.save(rental)
+
+    store.flush()
+    model, rows = sessions[0].bulk_insert_mappings.call_args.args
+    assert model is DBRental
+    assert rows[0]["usage_count"] == 1
+    sessions[0].bulk_update_mappings.assert_not_called()
+
+def test_reads_served_from_buffer_and_cache(store, sessions):
+    listing = _listing()
+    store.listings.add(listing)
+    assert store.listings.get(listing.id) is listing
+
+    store.flush()
+    assert store.listings.get(listing.id) is listing
+    assert len(sessions) == 1
+
+def test_read_through_on_miss(store, sessions):
+    assert store.listings.get("missing") is None
+    assert len(sessions) == 1
+
+def test_failing_row_is_dropped_without_blocking_batch(sessions):
+    @contextmanager
+    def session_factory():
+        session = MagicMock(spec=Session)
+        def insert(model, rows):
+            if any(row["id"] == "bad" for row in rows):
+                raise ValueError("constraint violation")
+        session.bulk_insert_mappings.side_effect = insert
+        sessions.append(session)
+        yield session
+
+    store = MarketplaceStore(session_factory, flush_interval=60)
+    store.listings.add(_listing("good"))
+    store.listings.add(_listing("bad"))
+
+    assert store.flush() == 1
+    assert store.stats()["dropped"] == 1
+    assert store.stats()["flush_errors"] == 1
+
+def test_update_changes_and_buffers_a_row(store, sessions):
+    listing = _listing()
+    store.listings.add(listing)
+    store.flush()
+
+    assert store.listings.update(listing.id, status="sold").status == "sold"
+    assert store.listings.get(listing.id).status == "sold"
+    store.flush()
+    model, rows = sessions[-1].bulk_update_mappings.call_args.args
+    assert rows[0]["status"] == "sold"
+
+def test_update_of_missing_row_raises(store):
+    with pytest.raises(KeyError):
+        store.listings.update("missing", status="sold")
+    store.listings.add(_listing())
+    with pytest.raises(ValueError):
+        store.listings.update("listing_1", colour="red")
+
+def test_failed_transactions_are_requeued(sessions):
+    failing = [True]
+
+    @contextmanager
+    def session_factory():
+        session = MagicMock(spec=Session)
+        def insert(model, rows):
+            if failing[0]:
+                raise ValueError("database unavailable")
+        session.bulk_insert_mappings.side_effect = insert
+        sessions.append(session)
+        yield session
+
+    store = MarketplaceStore(session_factory, flush_interval=60)
+    store.transactions.add(Transaction(id="tx_1", listing_id="listing_1", buyer_id="user2", seller_id="user1",
+                                       amount=10.0, type=ListingType.SALE))
+
+    assert store.flush() == 0
+    assert store.stats()["requeued"] == 1
+    assert store.stats()["dropped"] == 0
+    assert store.transactions.get("tx_1").amount == 10.0
+
+    failing[0] = False
+    assert store.flush() == 1
+    assert store.stats()["collections"]["transactions"]["pending"] == 0
+
+def test_values_come_from_buffer_and_cache(store, sessions):
+    store.listings.add(_listing("listing_1"))
+    store.flush()
+    store.listings.add(_listing("listing_2"))
+    sessions.clear()
+
+    assert sorted(listing.id for listing in store.listings.values()) == ["listing_1", "listing_2"]
+    assert len(store.listings) == 2
+    assert sessions == []
+
+def test_requeued_rows_are_abandoned_after_max_retries(sessions, caplog):
+    @contextmanager
+    def session_factory():
+        session = MagicMock(spec=Session)
+        session.bulk_insert_mappings.side_effect = ValueError("listing row is gone")
+        sessions.append(session)
+        yield session
+
+    store = MarketplaceStore(session_factory, flush_interval=60, max_retries=2)
+    store.transactions.add(Transaction(id="tx_1", listing_id="listing_1", buyer_id="user2", seller_id="user1",
+                                       amount=10.0, type=ListingType.SALE))
+
+    for _ in range(3):
+        store.flush()
+
+    stats = store.stats()
+    assert (stats["requeued"], stats["abandoned"]) == (2, 1)
+    assert stats["collections"]["transactions"]["pending"] == 0
+    assert store.transactions.values() == []
+    assert "Abandoning transactions row tx_1" in caplog.text
@@ -0,0 +1,26 @@
+from agent_platform.core.metrics import LatencyHistogram
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    assert histogram.snapshot()["count"] == 0
+
+def test_percentiles_use_bucket_bounds():
+    histogram = LatencyHistogram(buckets_ms=(10, 100, 1000))
+    for _ in range(90):
+        histogram.observe(0.005)
+    for _ in range(10):
+        histogram.observe(0.5)
+
+    assert histogram.percentile(50) == 10
+    assert histogram.percentile(95) == 1000
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["buckets"]["le_10ms"] == 90
+    assert snapshot["buckets"]["le_1000ms"] == 10
+
+def test_overflow_bucket_reports_max():
+    histogram = LatencyHistogram(buckets_ms=(10,))
+    histogram.observe(2.0)
+    assert histogram.percentile(99) == 2000
+    assert histogram.snapshot()["buckets"]["inf"] == 1
@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.marketplace import DBListing, ListingType
+from agent_platform.core.pagination import encode_cursor, decode_cursor, keyset_page, split_page
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        now = datetime(2024, 1, 1)
+        for i in range(25):
+            session.add(DBListing(
+                id=f"listing_{i:02d}",
+                agent_id="agent1",
+                seller_id="user1",
+                type=ListingType.RENT if i % 2 else ListingType.SALE,
+                base_price=float(i % 5),
+                created_at=now + timedelta(minutes=i),
+                status="active"
+            ))
+        session.commit()
+        yield session
+
+def _walk(db, column, descending, limit, sort):
+    seen, cursor = [], None
+    while True:
+        after = decode_cursor(cursor, sort) if cursor else None
+        statement = keyset_page(select(DBListing), DBListing.id, column, descending, after, limit)
+        rows, cursor = split_page(db.execute(statement).scalars().all(), sort, column.key, limit)
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            return seen
+
+def test_cursor_round_trip():
+    created = datetime(2024, 1, 1, 12, 30)
+    assert decode_cursor(encode_cursor("newest", created, "listing_1"), "newest") == (created, "listing_1")
+    assert decode_cursor(encode_cursor("price_asc", 9.5, "listing_1"), "price_asc") == (9.5, "listing_1")
+
+def test_cursor_rejects_other_sort_and_garbage():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("newest", 1, "a"), "price_asc")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "newest")
+
+def test_pages_cover_all_rows_with_ties(db):
+    # base_price repeats every five rows, so pages must break ties on id
+    seen = _walk(db, DBListing.base_price, False, 4, "price_asc")
+    expected = [row.id for row in db.execute(
+        select(DBListing).order_by(DBListing.base_price, DBListing.id)
+    ).scalars()]
+    assert seen == expected
+
+def test_descending_pages(db):
+    seen = _walk(db, DBListing.created_at, True, 10, "newest")
+    assert seen == [f"listing_{i:02d}" for i in reversed(range(25))]
+
+@pytest.mark.parametrize("descending, sort", [(False, "price_asc"), (True, "price_desc")])
+def test_null_sort_values_page_last(db, descending, sort):
+    for row in db.execute(select(DBListing).where(DBListing.id.in_(["listing_03", "listing_07", "listing_11"]))).scalars():
+        row.base_price = None
+    db.commit()
+
+    seen = _walk(db, DBListing.base_price, descending, 4, sort)
+
+    assert len(seen) == len(set(seen)) == 25
+    assert seen[-3:] == (["listing_11", "listing_07", "listing_03"] if descending
+                         else ["listing_03", "listing_07", "listing_11"])
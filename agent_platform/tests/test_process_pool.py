@@ -0,0 +1,111 @@
+import time
+import pytest
+from agent_platform.core import process_pool
+from agent_platform.core.execution import RunCancelledError, RunControl
+from agent_platform.core.process_pool import AgentProcessPool
+
+def _echo_worker(conn, cache_size):
+    """Stand-in worker loop that echoes tasks and reports a fixed RSS"""
+    while True:
+        spec = conn.recv()
+        if spec is None:
+            break
+        if spec["task"] == "fail":
+            conn.send(("error", "RuntimeError: boom", 10.0))
+        elif spec["task"] == "crash":
+            break
+        elif spec["task"] == "hang":
+            time.sleep(30)
+        elif spec.get("stream"):
+            cancelled = False
+            for step in range(2):
+                conn.send(("step", {"type": "step", "step": step}, None))
+                if not conn.recv():
+                    cancelled = True
+                    break
+            if cancelled:
+                conn.send(("cancelled", "Run cancelled", 10.0))
+            else:
+                conn.send(("ok", spec["task"], 10.0))
+        else:
+            conn.send(("ok", f"{spec['agent_id']}:{spec['task']}", float(len(spec["task"]))))
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    monkeypatch.setattr(process_pool, "_worker_main", _echo_worker)
+    pools = []
+
+    def _make(**kwargs):
+        kwargs.setdefault("start_method", "fork")
+        pool = AgentProcessPool(**kwargs)
+        pools.append(pool)
+        return pool
+
+    yield _make
+    for pool in pools:
+        pool.shutdown()
+
+def test_run_returns_worker_result(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=None)
+    assert pool.run("agent1", "v1", [], [], "task") == "agent1:task"
+    assert pool.stats()["runs"] == 1
+
+def test_worker_error_raises(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=None)
+    with pytest.raises(RuntimeError, match="boom"):
+        pool.run("agent1", "v1", [], [], "fail")
+
+def test_recycles_after_max_runs(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=2, max_rss_mb=None)
+    first_pid = pool._workers[0].process.pid
+    pool.run("agent1", "v1", [], [], "a")
+    pool.run("agent1", "v1", [], [], "b")
+
+    assert pool.stats()["recycled"] == 1
+    assert pool._workers[0].process.pid != first_pid
+
+def test_recycles_above_rss_limit(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=3)
+    pool.run("agent1", "v1", [], [], "long task")
+    assert pool.stats()["recycled"] == 1
+
+def test_crashed_worker_is_replaced(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=None)
+    with pytest.raises(RuntimeError):
+        pool.run("agent1", "v1", [], [], "crash")
+
+    assert pool.stats()["crashed"] == 1
+    assert pool.run("agent1", "v1", [], [], "task") == "agent1:task"
+
+def test_streamed_steps_are_relayed(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=None)
+    events = []
+    assert pool.run("agent1", "v1", [], [], "task", control=RunControl(on_step=events.append)) == "task"
+    assert [event["step"] for event in events] == [0, 1]
+
+def test_on_step_error_cancels_worker_run(make_pool):
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=None)
+
+    def on_step(event):
+        raise RunCancelledError("Client disconnected")
+
+    with pytest.raises(RunCancelledError, match="Client disconnected"):
+        pool.run("agent1", "v1", [], [], "task", control=RunControl(on_step=on_step))
+    # The worker is back in the pool and still usable
+    assert pool.run("agent1", "v1", [], [], "next") == "agent1:next"
+
+def test_cancel_kills_worker_mid_step(make_pool):
+    import threading
+
+    pool = make_pool(workers=1, max_runs_per_worker=0, max_rss_mb=None)
+    control = RunControl()
+    first_pid = pool._workers[0].process.pid
+    threading.Timer(0.2, control.cancel).start()
+
+    started = time.monotonic()
+    with pytest.raises(RunCancelledError):
+        pool.run("agent1", "v1", [], [], "hang", control=control)
+    assert time.monotonic() - started < 5
+    assert pool.stats()["killed"] == 1
+    assert pool._workers[0].process.pid != first_pid
+    assert pool.run("agent1", "v1", [], [], "next") == "agent1:next"
@@ -0,0 +1,45 @@
+import pytest
+from datetime import datetime
+from agent_platform.core.models.agent import DBAgent, DBAgentStats
+from agent_platform.core.models.marketplace import MarketplaceListing, ListingType, PricingModel
+from agent_platform.core.models.user import DBUser
+from agent_platform.core.projection import (
+    AGENT_DETAIL_FIELDS, AGENT_FULL_FIELDS, AGENT_SUMMARY_FIELDS, LISTING_FIELDS,
+    agent_view_for, parse_fields, project
+)
+
+def _agent():
+    now = datetime.now()
+    agent = DBAgent(id="agent1", name="Agent", owner_id="user1", model="gpt-4", created_at=now, updated_at=now)
+    agent.stats = DBAgentStats(agent_id="agent1", tasks_completed=2, earnings=1.0, rating=4.0)
+    agent.owner = DBUser(id="user1", username="owner", email="o@example.com", hashed_password="x")
+    return agent
+
+def test_field_sets_match_serializers():
+    agent = _agent()
+    assert set(agent.to_summary_dict()) == AGENT_SUMMARY_FIELDS
+    assert set(agent.to_dict()) == AGENT_FULL_FIELDS
+    assert set(agent.to_detail_dict()) == AGENT_DETAIL_FIELDS
+    listing = MarketplaceListing(id="listing1", agent_id="agent1", seller_id="user1", type=ListingType.RENT,
+                                 pricing=PricingModel(base_price=1.0))
+    assert set(listing.to_dict()) == LISTING_FIELDS
+
+def test_parse_fields():
+    assert parse_fields(None, LISTING_FIELDS) is None
+    assert parse_fields("id, status,id", LISTING_FIELDS) == ["id", "status"]
+    with pytest.raises(ValueError):
+        parse_fields(",", LISTING_FIELDS)
+    with pytest.raises(ValueError):
+        parse_fields("id,secret", LISTING_FIELDS)
+
+def test_fields_pick_the_narrowest_view():
+    assert agent_view_for(None, "detail") == ("detail", None)
+    assert agent_view_for("id,name,rating", "full") == ("summary", ["id", "name", "rating"])
+    assert agent_view_for("id,tools", "summary") == ("full", ["id", "tools"])
+    assert agent_view_for("id,stats", "summary") == ("detail", ["id", "stats"])
+    with pytest.raises(ValueError):
+        agent_view_for("rating,tools")
+
+def test_project_keeps_requested_order():
+    assert project({"a": 1, "b": 2, "c": 3}, ["c", "a"]) == {"c": 3, "a": 1}
+    assert project({"a": 1}, None) == {"a": 1}
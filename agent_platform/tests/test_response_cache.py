@@ -0,0 +1,89 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from agent_platform.core.response_cache import ResponseCache
+
+@pytest.fixture
+def cache():
+    return ResponseCache(max_entries=2)
+
+@pytest.fixture
+def client(cache):
+    app = FastAPI()
+    app.state.builds = 0
+
+    @app.get("/board")
+    async def board(request: Request):
+        async def build(headers):
+            app.state.builds += 1
+            headers["X-Next-Cursor"] = "abc"
+            return [{"agent_id": "agent1", "score": app.state.builds}]
+        return await cache.respond(request, 60, ["leaderboard"], build)
+
+    client = TestClient(app)
+    client.app_state = app.state
+    return client
+
+def test_put_and_get(cache):
+    entry = cache.put("key", {"a": 1}, ttl=60, tags=["t"])
+    assert entry.body == b'{"a":1}'
+    assert entry.etag.startswith('"') and entry.etag.endswith('"')
+    assert cache.get("key") is entry
+    assert cache.stats()["hits"] == 1
+
+def test_expired_entries_miss(cache):
+    cache.put("key", {"a": 1}, ttl=0)
+    assert cache.get("key") is None
+    assert cache.stats()["size"] == 0
+
+def test_invalidate_drops_only_tagged_entries(cache):
+    cache.put("board", [1], ttl=60, tags=["leaderboard"])
+    cache.put("listings", [2], ttl=60, tags=["marketplace"])
+    cache.invalidate("leaderboard")
+    assert cache.get("board") is None
+    assert cache.get("listings") is not None
+
+def test_lru_eviction(cache):
+    cache.put("a", 1, ttl=60)
+    cache.put("b", 2, ttl=60)
+    cache.get("a")
+    cache.put("c", 3, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+def test_same_payload_same_etag(cache):
+    assert cache.put("a", {"x": 1}, ttl=60).etag == cache.put("b", {"x": 1}, ttl=60).etag
+    assert cache.put("c", {"x": 2}, ttl=60).etag != cache.put("a", {"x": 1}, ttl=60).etag
+
+def test_respond_serves_from_cache(client):
+    first = client.get("/board")
+    second = client.get("/board")
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert first.headers["etag"] == second.headers["etag"]
+    assert second.headers["x-next-cursor"] == "abc"
+    assert client.app_state.builds == 1
+
+def test_query_order_does_not_split_cache(client):
+    client.get("/board?a=1&b=2")
+    client.get("/board?b=2&a=1")
+    assert client.app_state.builds == 1
+
+def test_if_none_match_returns_304(client, cache):
+    etag = client.get("/board").headers["etag"]
+    response = client.get("/board", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert cache.stats()["not_modified"] == 1
+
+    weak = client.get("/board", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert weak.status_code == 304
+
+def test_invalidation_changes_etag(client, cache):
+    etag = client.get("/board").headers["etag"]
+    cache.invalidate("leaderboard")
+    response = client.get("/board", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert client.app_state.builds == 2
@@ -0,0 +1,155 @@
+import time
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from agent_platform.core.admission import RateLimitedError
+from agent_platform.core.execution import ExecutionEngine
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.run import DBRun, RunStatus
+from agent_platform.core.run_queue import RunQueue
+from agent_platform.worker import RunWorker
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'runs.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+@pytest.fixture
+def run_queue(engine):
+    @contextmanager
+    def session_factory():
+        with Session(engine) as db:
+            yield db
+
+    return RunQueue(session_factory, lease=30, max_attempts=2, backoff=60, agent_queue_size=3)
+
+def _expire_lease(engine, run_id):
+    with Session(engine) as db:
+        db.get(DBRun, run_id).lease_expires_at = datetime.now() - timedelta(seconds=1)
+        db.commit()
+
+def test_claim_leases_each_run_once(run_queue):
+    run = run_queue.enqueue("agent1", "task", user_id="user1", owner_id="owner1", priority="renter")
+    assert run.status == RunStatus.QUEUED
+
+    claimed = run_queue.claim("worker-a", limit=5)
+    assert [c.id for c in claimed] == [run.id]
+    assert claimed[0].status == RunStatus.RUNNING
+    assert claimed[0].attempts == 1
+    assert claimed[0].owner_id == "owner1"
+    assert claimed[0].priority == "renter"
+    assert run_queue.claim("worker-b", limit=5) == []
+
+def test_finish_stores_result(run_queue):
+    run = run_queue.enqueue("agent1", "task")
+    run_queue.claim("worker-a")
+    assert run_queue.finish(run.id, "worker-a", RunStatus.SUCCEEDED, result={"answer": 42}, steps=2) == RunStatus.SUCCEEDED
+
+    stored = run_queue.get(run.id)
+    assert stored.result == {"answer": 42}
+    assert stored.steps == 2
+    assert stored.finished_at is not None
+
+def test_failures_retry_with_backoff_then_fail(run_queue, engine):
+    run = run_queue.enqueue("agent1", "task")
+    run_queue.claim("worker-a")
+    assert run_queue.finish(run.id, "worker-a", RunStatus.FAILED, error="flaky") == RunStatus.QUEUED
+    # Backed off, so not claimable yet
+    assert run_queue.claim("worker-a") == []
+
+    with Session(engine) as db:
+        db.get(DBRun, run.id).available_at = datetime.now()
+        db.commit()
+    assert run_queue.claim("worker-a")[0].attempts == 2
+    assert run_queue.finish(run.id, "worker-a", RunStatus.FAILED, error="flaky") == RunStatus.FAILED
+    assert run_queue.stats()["retried"] == 1
+
+def test_outcome_from_worker_without_lease_is_discarded(run_queue):
+    run = run_queue.enqueue("agent1", "task")
+    run_queue.claim("worker-a")
+    assert run_queue.finish(run.id, "worker-b", RunStatus.SUCCEEDED, result="stolen") is None
+    assert run_queue.get(run.id).status == RunStatus.RUNNING
+
+def test_expired_lease_is_reclaimed(run_queue, engine):
+    run = run_queue.enqueue("agent1", "task")
+    run_queue.claim("worker-a")
+    _expire_lease(engine, run.id)
+
+    claimed = run_queue.claim("worker-b")
+    assert [c.id for c in claimed] == [run.id]
+    assert run_queue.heartbeat("worker-a", [run.id]) == [run.id]
+
+    _expire_lease(engine, run.id)
+    assert run_queue.reap() == 1
+    assert run_queue.get(run.id).status == RunStatus.FAILED
+
+def test_heartbeat_extends_lease_and_reports_cancellation(run_queue, engine):
+    run = run_queue.enqueue("agent1", "task")
+    run_queue.claim("worker-a")
+    assert run_queue.heartbeat("worker-a", [run.id]) == []
+
+    assert run_queue.cancel(run.id)
+    assert run_queue.heartbeat("worker-a", [run.id]) == [run.id]
+    run_queue.finish(run.id, "worker-a", RunStatus.CANCELLED, error="Run cancelled")
+    assert run_queue.get(run.id).status == RunStatus.CANCELLED
+    assert not run_queue.cancel(run.id)
+
+def test_cancel_queued_run(run_queue):
+    run = run_queue.enqueue("agent1", "task")
+    assert run_queue.cancel(run.id)
+    assert run_queue.get(run.id).status == RunStatus.CANCELLED
+    assert run_queue.claim("worker-a") == []
+    assert not run_queue.cancel("missing")
+
+def test_queued_run_past_its_deadline_times_out(run_queue):
+    overdue = run_queue.enqueue("agent1", "task", timeout=5)
+    waiting = run_queue.enqueue("agent1", "task", timeout=60)
+
+    assert run_queue.reap(datetime.now() + timedelta(seconds=10)) == 1
+    assert run_queue.get(overdue.id).status == RunStatus.TIMED_OUT
+    assert run_queue.get(waiting.id).status == RunStatus.QUEUED
+    assert run_queue.stats()["timed_out"] == 1
+
+def test_release_does_not_count_attempt(run_queue):
+    run = run_queue.enqueue("agent1", "task")
+    run_queue.claim("worker-a")
+    assert run_queue.release([run.id], "worker-a") == 1
+    assert run_queue.claim("worker-b")[0].attempts == 1
+
+def test_full_agent_queue_is_rate_limited(run_queue):
+    for _ in range(3):
+        run_queue.enqueue("agent1", "task")
+    with pytest.raises(RateLimitedError):
+        run_queue.enqueue("agent1", "task")
+    run_queue.enqueue("agent2", "task")
+
+def test_worker_executes_and_reports(run_queue):
+    engine = ExecutionEngine(lambda agent_id, task, control=None: f"{agent_id}:{task}", max_workers=2)
+    worker = RunWorker(run_queue, engine, worker_id="worker-a", concurrency=2)
+    first = run_queue.enqueue("agent1", "one")
+    second = run_queue.enqueue("agent2", "two")
+
+    assert worker.poll_once() == 2
+    deadline = time.monotonic() + 5
+    while worker.stats()["active"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+        worker.poll_once()
+
+    assert run_queue.get(first.id).result == "agent1:one"
+    assert run_queue.get(second.id).status == RunStatus.SUCCEEDED
+    engine.shutdown()
+
+def test_worker_drain_hands_back_unfinished_runs(run_queue):
+    engine = ExecutionEngine(lambda agent_id, task, control=None: time.sleep(0.5), max_workers=1)
+    worker = RunWorker(run_queue, engine, worker_id="worker-a", concurrency=1)
+    run = run_queue.enqueue("agent1", "slow")
+    worker.poll_once()
+
+    worker.drain(timeout=0)
+    stored = run_queue.get(run.id)
+    assert stored.status == RunStatus.QUEUED
+    assert stored.attempts == 0
+    engine.shutdown(wait=False)
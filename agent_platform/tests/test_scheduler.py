@@ -0,0 +1,71 @@
+import pytest
+from agent_platform.core.admission import AdmissionController, Ticket
+from agent_platform.core.scheduler import FairScheduler, parse_weights
+
+def _ticket(key, user_id, priority="public", enqueued_at=0.0, agent_id="a1"):
+    return Ticket(key, agent_id, None, enqueued_at, user_id=user_id, priority=priority)
+
+def _order(scheduler, tickets, now=0.0):
+    waiting = list(tickets)
+    order = []
+    while waiting:
+        ticket = scheduler.pick(waiting, now)
+        waiting.remove(ticket)
+        scheduler.started(ticket, now)
+        order.append(ticket.key)
+    return order
+
+def test_parse_weights():
+    weights = parse_weights("owner=5, renter=2")
+    assert weights == {"owner": 5.0, "subscriber": 1.0, "renter": 2.0, "public": 1.0}
+    with pytest.raises(ValueError):
+        parse_weights("vip=3")
+    with pytest.raises(ValueError):
+        parse_weights("owner=0")
+
+def test_heavy_user_does_not_starve_light_user():
+    scheduler = FairScheduler(weights=parse_weights(""), aging_seconds=0)
+    tickets = [_ticket(f"heavy{i}", "heavy") for i in range(5)] + [_ticket("light", "light")]
+    for ticket in tickets:
+        scheduler.enqueue(ticket)
+    assert _order(scheduler, tickets).index("light") <= 1
+
+def test_weights_share_capacity_by_class():
+    scheduler = FairScheduler(weights=parse_weights("owner=3,public=1"), aging_seconds=0)
+    tickets = [_ticket(f"o{i}", "owner1", "owner") for i in range(6)] + [_ticket(f"p{i}", "user1") for i in range(6)]
+    for ticket in tickets:
+        scheduler.enqueue(ticket)
+    first_four = _order(scheduler, tickets)[:4]
+    assert sum(key.startswith("o") for key in first_four) == 3
+
+def test_aging_lets_old_runs_overtake():
+    scheduler = FairScheduler(weights=parse_weights("owner=100"), aging_seconds=1)
+    old = _ticket("old", "user1", enqueued_at=0.0)
+    scheduler.enqueue(old)
+    fresh = [_ticket(f"o{i}", "owner1", "owner", enqueued_at=100.0) for i in range(3)]
+    for ticket in fresh:
+        scheduler.enqueue(ticket)
+    # Far behind in virtual time, but it has waited 100 aging periods
+    old.start_tag += 50
+    assert scheduler.pick([old] + fresh, now=100.0) is old
+    scheduler.aging_seconds = 0
+    assert scheduler.pick([old] + fresh, now=100.0) is not old
+
+def test_unknown_priority_falls_back_to_public():
+    scheduler = FairScheduler(weights=parse_weights(""))
+    ticket = _ticket("r1", "user1", priority="vip")
+    scheduler.enqueue(ticket)
+    assert ticket.priority == "public"
+
+def test_admission_releases_in_fair_order():
+    admission = AdmissionController(max_inflight=1, max_pending=16, agent_limit=0, owner_limit=0,
+                                    scheduler=FairScheduler(weights=parse_weights(""), aging_seconds=0))
+    assert admission.admit("first", "a1", user_id="heavy")
+    for i in range(3):
+        admission.admit(f"heavy{i}", "a1", user_id="heavy")
+    admission.admit("light", "a2", user_id="light", priority="renter")
+    assert admission.release("first") == ["light"]
+
+    stats = admission.stats()["scheduler"]["classes"]
+    assert stats["public"]["scheduled"] == 1
+    assert stats["renter"]["wait_ms"]["samples"] == 1
@@ -0,0 +1,90 @@
+import sqlite3
+import pytest
+from unittest.mock import MagicMock
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from agent_platform.core.models import database
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.agent import DBAgent
+from agent_platform.core.search import InMemorySearchIndex, SQLiteSearchIndex, AgentSearch
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "engine", engine)
+    _add_agent(engine, "weather-1", "Weather Reporter", "Daily forecasts for any city", ["duckduckgo"], listed=1)
+    _add_agent(engine, "speech-1", "Voice Assistant", "Reads weather aloud", ["text_to_speech"], listed=0)
+    _add_agent(engine, "stock-1", "Stock Watcher", "Tracks market prices", ["duckduckgo"], listed=1)
+    return engine
+
+def _add_agent(engine, agent_id, name, description, tools, listed=1, owner_id="user1"):
+    with Session(engine) as db:
+        db.add(DBAgent(id=agent_id, name=name, description=description, owner_id=owner_id, tools=tools,
+                       model="gpt-4", is_listed=listed, created_at=datetime.now(), updated_at=datetime.now()))
+        db.commit()
+
+@pytest.fixture(params=[InMemorySearchIndex, SQLiteSearchIndex])
+def index(request, engine):
+    index = request.param()
+    index.setup()
+    return index
+
+def test_name_match_ranks_above_description_match(index):
+    hits = index.search("weather", limit=10)
+    assert [hit.agent_id for hit in hits] == ["weather-1", "speech-1"]
+
+def test_all_terms_must_match(index):
+    assert [hit.agent_id for hit in index.search("weather daily", limit=10)] == ["weather-1"]
+    assert index.search("weather bananas", limit=10) == []
+
+def test_tool_names_and_listed_filter(index):
+    assert {hit.agent_id for hit in index.search("duckduckgo", limit=10)} == {"weather-1", "stock-1"}
+    assert [hit.agent_id for hit in index.search("weather", limit=10, listed_only=True)] == ["weather-1"]
+
+def test_incremental_refresh_and_remove(index, engine):
+    _add_agent(engine, "poet-1", "Weather Poet", "Haiku about rain", [])
+    index.refresh("poet-1")
+    assert "poet-1" in {hit.agent_id for hit in index.search("haiku", limit=10)}
+
+    index.remove("poet-1")
+    assert index.search("haiku", limit=10) == []
+
+def test_query_syntax_is_not_interpreted(index):
+    assert index.search('weather" OR "stock', limit=10) == []
+
+def test_pagination(index):
+    first = index.search("duckduckgo", limit=1)
+    second = index.search("duckduckgo", limit=1, offset=1)
+    assert len(first) == len(second) == 1
+    assert first[0].agent_id != second[0].agent_id
+
+def _sqlite_has_fts5():
+    with sqlite3.connect(":memory:") as conn:
+        return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+@pytest.mark.skipif(not _sqlite_has_fts5(), reason="SQLite built without FTS5")
+def test_auto_backend_uses_fts5_on_sqlite(engine):
+    assert AgentSearch().setup() == "sqlite_fts5"
+
+def test_auto_backend_falls_back_to_memory_without_fts5(engine, monkeypatch):
+    monkeypatch.setattr("agent_platform.core.search._sqlite_has_fts5", lambda: False)
+    assert AgentSearch().setup() == "memory"
+
+def test_failed_setup_is_retried(engine, monkeypatch):
+    search = AgentSearch(backend="memory")
+    monkeypatch.setattr(InMemorySearchIndex, "setup", MagicMock(side_effect=[RuntimeError("database down"), None]))
+
+    with pytest.raises(RuntimeError):
+        search.setup()
+    assert search.setup() == "memory"
+
+def test_owner_sees_own_unlisted_agents(index, engine):
+    _add_agent(engine, "weather-2", "Weather Diary", "Someone else's notes", [], listed=0, owner_id="user2")
+    index.refresh("weather-2")
+
+    visible = {hit.agent_id for hit in index.search("weather", limit=10, listed_only=True, owner_id="user1")}
+    assert visible == {"weather-1", "speech-1"}
+    visible = {hit.agent_id for hit in index.search("weather", limit=10, listed_only=True, owner_id="user2")}
+    assert visible == {"weather-1", "weather-2"}
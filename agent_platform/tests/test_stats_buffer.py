@@ -0,0 +1,119 @@
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.agent import DBAgent, DBAgentStats
+from agent_platform.core.stats_buffer import StatsBuffer
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        for agent_id in ("agent1", "agent2"):
+            db.add(DBAgent(id=agent_id, name=agent_id, owner_id="user1", model="gpt-4",
+                           created_at=datetime.now(), updated_at=datetime.now()))
+            db.add(DBAgentStats(agent_id=agent_id, tasks_completed=5, earnings=1.0))
+        db.commit()
+    return engine
+
+@pytest.fixture
+def buffer(engine):
+    @contextmanager
+    def session_factory():
+        with Session(engine) as db:
+            yield db
+
+    buffer = StatsBuffer(session_factory, flush_interval=60)
+    yield buffer
+    buffer.stop()
+
+def _row(engine, agent_id):
+    with Session(engine) as db:
+        stats = db.query(DBAgentStats).filter(DBAgentStats.agent_id == agent_id).one()
+        agent = db.get(DBAgent, agent_id)
+        return stats.tasks_completed, stats.earnings, stats.last_active, agent.usage_count
+
+def test_record_does_not_write_until_flush(buffer, engine):
+    buffer.record("agent1", tasks_completed=1, usage_count=1)
+    assert _row(engine, "agent1")[0] == 5
+    assert buffer.pending("agent1").tasks_completed == 1
+
+def test_flush_applies_increments(buffer, engine):
+    now = datetime.now()
+    for _ in range(3):
+        buffer.record("agent1", usage_count=1, last_active=now - timedelta(minutes=1))
+        buffer.record("agent1", tasks_completed=1, last_active=now)
+    buffer.record("agent2", earnings=2.5)
+
+    assert buffer.flush() == 2
+    tasks, earnings, last_active, usage = _row(engine, "agent1")
+    assert (tasks, earnings, last_active, usage) == (8, 1.0, now, 3)
+    assert _row(engine, "agent2")[:2] == (5, 3.5)
+    assert buffer.pending("agent1").tasks_completed == 0
+    assert buffer.flush() == 0
+
+def test_increments_from_two_buffers_both_land(engine):
+    @contextmanager
+    def session_factory():
+        with Session(engine) as db:
+            yield db
+
+    first, second = StatsBuffer(session_factory), StatsBuffer(session_factory)
+    first.record("agent1", tasks_completed=2)
+    second.record("agent1", tasks_completed=3)
+    first.stop()
+    second.stop()
+    assert _row(engine, "agent1")[0] == 10
+
+def test_failed_flush_keeps_deltas():
+    session = MagicMock(spec=Session)
+    session.execute.side_effect = RuntimeError("database down")
+
+    @contextmanager
+    def session_factory():
+        yield session
+
+    buffer = StatsBuffer(session_factory, flush_interval=60)
+    buffer.record("agent1", tasks_completed=1)
+    assert buffer.flush() == 0
+    buffer.record("agent1", tasks_completed=1)
+    assert buffer.pending("agent1").tasks_completed == 2
+    assert buffer.stats()["flush_errors"] == 1
+
+def test_stop_flushes(buffer, engine):
+    buffer.record("agent1", earnings=4.0)
+    buffer.stop()
+    assert _row(engine, "agent1")[1] == 5.0
+
+def test_flush_reports_written_agents(engine):
+    @contextmanager
+    def session_factory():
+        with Session(engine) as db:
+            yield db
+
+    flushed = []
+    buffer = StatsBuffer(session_factory, on_flush=flushed.append)
+    buffer.record("agent1", tasks_completed=1)
+    buffer.record("agent2", usage_count=1)
+    buffer.stop()
+    assert sorted(flushed[0]) == ["agent1", "agent2"]
+
+def test_flushed_deltas_stay_pending_until_callers_are_told(engine):
+    @contextmanager
+    def session_factory():
+        with Session(engine) as db:
+            yield db
+
+    seen = []
+    buffer = StatsBuffer(session_factory, on_flush=lambda agent_ids: seen.append(buffer.pending("agent1").earnings))
+    buffer.record("agent1", earnings=2.0)
+    buffer.flush()
+
+    # A reader of the not yet invalidated cached row still adds the deltas
+    assert seen == [2.0]
+    assert buffer.pending("agent1").earnings == 0
+    buffer.stop()
@@ -0,0 +1,137 @@
+import time
+import pytest
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from agent_platform.core.events import Event, EventBus
+from agent_platform.core.models.base import Base
+from agent_platform.core.models.agent import DBAgent, DBAgentState
+from agent_platform.core.status_registry import StatusRegistry
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'status.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(DBAgent(id="agent1", name="agent1", owner_id="user1", model="gpt-4",
+                       created_at=datetime.now(), updated_at=datetime.now()))
+        db.commit()
+    return engine
+
+@pytest.fixture
+def session_factory(engine):
+    @contextmanager
+    def session_factory():
+        with Session(engine) as db:
+            yield db
+    return session_factory
+
+def _persisted(engine, agent_id):
+    with Session(engine) as db:
+        row = db.query(DBAgentState).filter(DBAgentState.agent_id == agent_id).first()
+        return row.status if row else None
+
+def test_unknown_agents_are_idle(session_factory):
+    registry = StatusRegistry(session_factory)
+    statuses = registry.get_many(["agent1", "agent2"])
+    assert [status.status for status in statuses.values()] == ["idle", "idle"]
+    assert statuses["agent1"].updated_at is None
+
+def test_only_durable_transitions_are_persisted(session_factory, engine):
+    registry = StatusRegistry(session_factory)
+    assert registry.set("agent1", "busy", "user1") == "idle"
+    assert registry.set("agent1", "idle") == "busy"
+    assert _persisted(engine, "agent1") is None
+
+    registry.set("agent1", "error")
+    assert _persisted(engine, "agent1") == "error"
+    registry.set("agent1", "busy")
+    assert _persisted(engine, "agent1") == "idle"
+    registry.set("agent1", "idle")
+    assert registry.stats()["persisted"] == 2
+    assert registry.get("agent1").owner_id == "user1"
+
+def test_load_restores_errors(session_factory):
+    StatusRegistry(session_factory).set("agent1", "error", "user1")
+    registry = StatusRegistry(session_factory)
+    assert registry.load() == 1
+    status = registry.get("agent1")
+    assert (status.status, status.owner_id) == ("error", "user1")
+
+def test_unknown_status_is_rejected(session_factory):
+    with pytest.raises(ValueError):
+        StatusRegistry(session_factory).set("agent1", "sleeping")
+
+def test_transitions_are_published_once():
+    events = MagicMock()
+    registry = StatusRegistry(MagicMock(), events)
+    registry.set("agent1", "busy", "user1")
+    registry.set("agent1", "busy", "user1")
+    events.publish.assert_called_once_with("agent_status", {
+        "agent_id": "agent1", "owner_id": "user1", "status": "busy", "previous_status": "idle"
+    })
+
+def test_relayed_transitions_update_other_registries():
+    bus = EventBus(backend="memory")
+    session_factory = MagicMock()
+    registry = StatusRegistry(session_factory, bus)
+
+    bus._receive(Event("agent_status", {"agent_id": "agent1", "owner_id": "user1", "status": "busy"},
+                       origin="other-worker"))
+    assert registry.get("agent1").status == "busy"
+
+    # An older transition arriving late does not win
+    bus._receive(Event("agent_status", {"agent_id": "agent1", "owner_id": "user1", "status": "idle"},
+                       origin="other-worker", timestamp=time.time() - 60))
+    assert registry.get("agent1").status == "busy"
+    assert registry.stats()["relayed"] == 1
+    # The publishing worker already persisted the transition
+    session_factory.assert_not_called()
+
+def test_agent_stays_busy_while_another_worker_runs_it():
+    bus = EventBus(backend="memory")
+    bus.publish = MagicMock()
+    registry = StatusRegistry(MagicMock(), bus)
+
+    registry.run_started("agent1", "user1")
+    # The other worker started a run of its own and then hears that ours ended
+    bus._receive(Event("agent_runs", {"agent_id": "agent1", "runs": 1}, origin="other-worker"))
+    registry.run_finished("agent1", "user1")
+
+    assert registry.get("agent1").status == "busy"
+    assert registry.running("agent1") == 1
+
+    bus._receive(Event("agent_runs", {"agent_id": "agent1", "runs": 0}, origin="other-worker"))
+    bus._receive(Event("agent_status", {"agent_id": "agent1", "owner_id": "user1", "status": "idle"},
+                       origin="other-worker"))
+    assert registry.get("agent1").status == "idle"
+    assert registry.running("agent1") == 0
+
+def test_concurrent_local_runs_keep_the_agent_busy():
+    registry = StatusRegistry(MagicMock())
+    registry.run_started("agent1", "user1")
+    registry.run_started("agent1", "user1")
+
+    registry.run_finished("agent1", "user1")
+    assert registry.get("agent1").status == "busy"
+    registry.run_finished("agent1", "user1")
+    assert registry.get("agent1").status == "idle"
+
+def test_late_idle_from_another_worker_does_not_hide_a_local_run():
+    bus = EventBus(backend="memory")
+    registry = StatusRegistry(MagicMock(), bus)
+    registry.run_started("agent1", "user1")
+
+    bus._receive(Event("agent_status", {"agent_id": "agent1", "owner_id": "user1", "status": "idle"},
+                       origin="other-worker", timestamp=time.time() + 1))
+    assert registry.get("agent1").status == "busy"
+
+def test_stale_run_counts_from_other_workers_expire():
+    bus = EventBus(backend="memory")
+    registry = StatusRegistry(MagicMock(), bus, run_ttl=60)
+    bus._receive(Event("agent_runs", {"agent_id": "agent1", "runs": 2}, origin="crashed-worker",
+                       timestamp=time.time() - 120))
+
+    assert registry.running("agent1") == 0
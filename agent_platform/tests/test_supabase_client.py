@@ -0,0 +1,33 @@
+import asyncio
+import time
+import pytest
+from agent_platform.core.supabase_client import SupabaseExecutor, SupabaseTimeoutError
+
+@pytest.fixture
+def executor():
+    calls = SupabaseExecutor(max_workers=2, timeout=1)
+    yield calls
+    calls.shutdown()
+
+def test_call_returns_result_and_records_latency(executor):
+    result = asyncio.run(executor.call("get_user", lambda token: {"token": token}, "abc"))
+
+    assert result == {"token": "abc"}
+    stats = executor.stats()["operations"]["get_user"]
+    assert stats["latency"]["count"] == 1
+    assert stats["errors"] == 0
+
+def test_call_timeout(executor):
+    with pytest.raises(SupabaseTimeoutError):
+        asyncio.run(executor.call("sign_in", time.sleep, 0.5, timeout=0.05))
+
+    assert executor.stats()["operations"]["sign_in"]["timeouts"] == 1
+
+def test_call_error_is_counted_and_reraised(executor):
+    def fail():
+        raise ValueError("Invalid login credentials")
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.call("sign_in", fail))
+
+    assert executor.stats()["operations"]["sign_in"]["errors"] == 1
@@ -0,0 +1,66 @@
+import time
+from agent_platform.core.token_cache import VerifiedTokenCache
+
+def test_hit_until_expiry():
+    cache = VerifiedTokenCache()
+    cache.put("token", "principal", "user1", time.time() + 60)
+
+    assert cache.get("token") == "principal"
+    assert cache.stats()["hits"] == 1
+
+def test_expired_token_is_a_miss():
+    cache = VerifiedTokenCache()
+    cache.put("token", "principal", "user1", time.time() - 1)
+
+    assert cache.get("token") is None
+    assert cache.stats()["misses"] == 1
+
+def test_token_without_exp_is_not_cached():
+    cache = VerifiedTokenCache()
+    cache.put("token", "principal", "user1", None)
+    assert cache.get("token") is None
+
+def test_revoke_blocks_token():
+    cache = VerifiedTokenCache()
+    cache.put("token", "principal", "user1", time.time() + 60)
+    cache.revoke("token")
+
+    assert cache.get("token") is None
+    assert cache.is_revoked("token")
+    cache.put("token", "principal", "user1", time.time() + 60)
+    assert cache.get("token") is None
+
+def test_revoke_user_drops_all_sessions():
+    cache = VerifiedTokenCache()
+    cache.put("token1", "principal", "user1", time.time() + 60)
+    cache.put("token2", "principal", "user1", time.time() + 60)
+    cache.put("token3", "other", "user2", time.time() + 60)
+    cache.revoke_user("user1")
+
+    assert cache.get("token1") is None
+    assert cache.get("token2") is None
+    assert cache.get("token3") == "other"
+    assert not cache.is_revoked("token1")
+
+def test_bounded_size():
+    cache = VerifiedTokenCache(max_entries=2)
+    for i in range(3):
+        cache.put(f"token{i}", i, "user1", time.time() + 60)
+
+    assert cache.stats()["size"] == 2
+    assert cache.get("token0") is None
+    assert cache.get("token2") == 2
+
+def test_raw_token_not_stored():
+    cache = VerifiedTokenCache()
+    cache.put("secret-token", "principal", "user1", time.time() + 60)
+    assert "secret-token" not in cache._entries
+
+def test_revocations_are_bounded():
+    cache = VerifiedTokenCache(max_entries=10, max_revoked=2)
+    for token in ("token1", "token2", "token3"):
+        cache.revoke(token, time.time() + 60)
+
+    assert not cache.is_revoked("token1")
+    assert cache.is_revoked("token2") and cache.is_revoked("token3")
+    assert cache.stats()["revoked"] == 2
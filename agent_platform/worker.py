@@ -0,0 +1,189 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import logging
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from agent_platform.core.execution import AdmissionError, ExecutionEngine
+from agent_platform.core.models.run import AgentRun, RunStatus
+from agent_platform.core.run_queue import RunQueue
+
+logger = logging.getLogger(__name__)
+
+# Runs one worker process executes at once; claims stop once this many are active
+RUN_WORKER_CONCURRENCY = int(os.getenv("RUN_WORKER_CONCURRENCY", "8"))
+RUN_WORKER_POLL_INTERVAL = float(os.getenv("RUN_WORKER_POLL_INTERVAL", "1"))  # seconds between claims when idle
+# Seconds a stopping worker waits for active runs before handing them back to the queue
+RUN_WORKER_DRAIN_TIMEOUT = float(os.getenv("RUN_WORKER_DRAIN_TIMEOUT", "30"))
+
+
+class RunWorker:
+    """Claims runs from the durable queue and executes them on a local engine
+
+    Runs go through the engine's admission control, scheduler and deadline
+    watchdog exactly as they would in the API process. The worker renews its
+    leases every heartbeat_interval (a third of the lease by default) and
+    cancels any run whose lease it lost or whose client asked to cancel it.
+    """
+
+    def __init__(
+        self,
+        run_queue: RunQueue,
+        engine: ExecutionEngine,
+        worker_id: Optional[str] = None,
+        concurrency: int = RUN_WORKER_CONCURRENCY,
+        poll_interval: float = RUN_WORKER_POLL_INTERVAL,
+        heartbeat_interval: Optional[float] = None
+    ):
+        self.queue = run_queue
+        self.engine = engine
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval or run_queue.lease / 3
+        # durable run id -> local engine run id
+        self._active: Dict[str, str] = {}
+        self._finished: "queue.Queue[tuple]" = queue.Queue()
+        self._stopping = threading.Event()
+        self._last_heartbeat = 0.0
+        self.completed = 0
+
+    def poll_once(self) -> int:
+        """Report finished runs, renew leases and claim more work; returns runs claimed"""
+        self._report_finished()
+        if self._active and time.monotonic() - self._last_heartbeat >= self.heartbeat_interval:
+            self._heartbeat()
+        if self._stopping.is_set():
+            return 0
+
+        claimed = self.queue.claim(self.worker_id, self.concurrency - len(self._active))
+        for run in claimed:
+            self._start(run)
+        return len(claimed)
+
+    def run_forever(self) -> None:
+        logger.info(f"Run worker {self.worker_id} started with concurrency {self.concurrency}")
+        while not self._stopping.is_set():
+            try:
+                claimed = self.poll_once()
+            except Exception as e:
+                logger.error(f"Run worker poll failed: {str(e)}")
+                claimed = 0
+            # Keep claiming without a pause while there is a backlog
+            if not claimed:
+                self._stopping.wait(self.poll_interval)
+        self.drain()
+
+    def stop(self) -> None:
+        """Stop claiming; run_forever drains active runs and returns"""
+        self._stopping.set()
+
+    def drain(self, timeout: float = RUN_WORKER_DRAIN_TIMEOUT) -> None:
+        """Wait for active runs, then cancel and hand back any still going"""
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        while self._active and time.monotonic() < deadline:
+            self.poll_once()
+            time.sleep(min(self.poll_interval, 0.1))
+
+        leftover = dict(self._active)
+        if leftover:
+            # Release first so cancellation outcomes arriving later are discarded
+            released = self.queue.release(leftover, self.worker_id)
+            for local_id in leftover.values():
+                self.engine.cancel(local_id, "Worker shutting down")
+            self._active.clear()
+            logger.info(f"Handed {released} unfinished runs back to the queue")
+
+    def stats(self) -> Dict[str, object]:
+        return {"worker_id": self.worker_id, "active": len(self._active), "completed": self.completed}
+
+    def _start(self, run: AgentRun) -> None:
+        timeout = None
+        if run.timeout:
+            # Deadlines count from submission, not from when this worker claimed the run
+            timeout = run.timeout - (datetime.now() - run.submitted_at).total_seconds()
+            if timeout <= 0:
+                self.queue.finish(run.id, self.worker_id, RunStatus.TIMED_OUT,
+                                  error=f"Run exceeded its {run.timeout:g}s deadline while queued")
+                return
+        try:
+            local = self.engine.submit(
+                run.agent_id, run.task, user_id=run.user_id, timeout=timeout,
+                owner_id=run.owner_id, priority=run.priority
+            )
+        except AdmissionError as e:
+            # Over a limit on this node; let another worker or a later poll take it
+            self.queue.release([run.id], self.worker_id, delay=e.retry_after)
+            return
+        self._active[run.id] = local.id
+        self.engine.add_done_callback(local, lambda outcome, run_id=run.id: self._finished.put((run_id, outcome)))
+
+    def _report_finished(self) -> None:
+        while True:
+            try:
+                run_id, outcome = self._finished.get_nowait()
+            except queue.Empty:
+                return
+            if self._active.pop(run_id, None) is None:
+                continue
+            stored = self.queue.finish(
+                run_id, self.worker_id, outcome.status, result=outcome.result, error=outcome.error,
+                steps=outcome.steps, tool_calls=outcome.tool_calls
+            )
+            self.completed += 1
+            logger.info(f"Run {run_id} finished as {stored.value if stored else 'discarded'}")
+
+    def _heartbeat(self) -> None:
+        self._last_heartbeat = time.monotonic()
+        for run_id in self.queue.heartbeat(self.worker_id, list(self._active)):
+            local_id = self._active.get(run_id)
+            if local_id is not None:
+                self.engine.cancel(local_id, "Run cancelled")
+
+
+def main() -> None:
+    from agent_platform.core.agent_framework import AgentFramework
+    from agent_platform.core.models.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    framework = AgentFramework()
+    # Rental usage is counted per run
+    framework.load_active_rentals()
+    framework.status.load()
+    # The bus needs a loop; it relays this worker's status transitions and run counts to the API
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="event-bus", daemon=True).start()
+    asyncio.run_coroutine_threadsafe(framework.events.start(), loop).result()
+    run_queue = framework.run_queue or RunQueue()
+    worker = RunWorker(run_queue, framework.engine)
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, draining")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    try:
+        worker.run_forever()
+    finally:
+        framework.engine.shutdown(wait=False)
+        if framework.process_pool:
+            framework.process_pool.shutdown()
+        framework.stats_buffer.stop()
+        framework.marketplace.stop()
+        asyncio.run_coroutine_threadsafe(framework.events.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()